@@ -0,0 +1,188 @@
+import hashlib
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Sequence
+
+# magic, version, number of programs, offset of the index
+ARCHIVE_HEADER = struct.Struct("<4sHIQ")
+ARCHIVE_MAGIC = b"HPAK"
+ARCHIVE_VERSION = 1
+
+# offset and length in words of the image, its SHA-256, length of the name;
+# the UTF-8 name follows each entry
+ARCHIVE_ENTRY = struct.Struct("<QI32sH")
+
+BLOCK_SIZE = 1 << 20
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+class ArchiveEntry(NamedTuple):
+    name: str
+    offset: int
+    words: int
+    digest: bytes
+
+
+def _image(words: Sequence[int]) -> bytes:
+    # Images are little-endian, so on most hosts a view of the file is the ROM
+    image = array("H", words)
+    if sys.byteorder == "big":
+        image.byteswap()
+    return image.tobytes()
+
+
+class ArchiveWriter:
+    __slots__ = "__pth", "__tmp", "__file", "__buffer", "__block_size", "__entries"
+
+    def __init__(self, pth: Path, block_size: int = BLOCK_SIZE):
+        # Written next to the target and moved over it once complete, so
+        # readers never see half an archive
+        self.__pth = pth
+        self.__tmp = pth.with_name(f"{pth.name}.tmp")
+        self.__file = self.__tmp.open("wb")
+        self.__buffer = bytearray(ARCHIVE_HEADER.size)
+        self.__block_size = block_size
+        self.__entries: Dict[str, ArchiveEntry] = {}
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, kind, *_) -> None:
+        if kind is None:
+            self.close()
+        else:
+            self.discard()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def add(self, name: str, words: Sequence[int]) -> None:
+        if name in self.__entries:
+            raise ArchiveError(f"Duplicate program: {name}")
+
+        data = _image(words)
+        offset = self.__file.tell() + len(self.__buffer)
+        digest = hashlib.sha256(data).digest()
+        self.__entries[name] = ArchiveEntry(name, offset, len(data) // 2, digest)
+        self.__buffer += data
+        if len(self.__buffer) >= self.__block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.__file.write(self.__buffer)
+        self.__buffer.clear()
+
+    def close(self) -> None:
+        if self.__file.closed:
+            return
+
+        index = self.__file.tell() + len(self.__buffer)
+        for entry in self.__entries.values():
+            name = entry.name.encode()
+            self.__buffer += ARCHIVE_ENTRY.pack(
+                entry.offset, entry.words, entry.digest, len(name)
+            )
+            self.__buffer += name
+        self.flush()
+
+        self.__file.seek(0)
+        self.__file.write(
+            ARCHIVE_HEADER.pack(
+                ARCHIVE_MAGIC, ARCHIVE_VERSION, len(self.__entries), index
+            )
+        )
+        self.__file.close()
+        self.__tmp.replace(self.__pth)
+
+    def discard(self) -> None:
+        if not self.__file.closed:
+            self.__file.close()
+            self.__tmp.unlink()
+
+
+class Archive:
+    __slots__ = "__file", "__map", "__entries"
+
+    def __init__(self, pth: Path):
+        self.__file = pth.open("rb")
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.__file.close()
+            raise ArchiveError(f"Not a program archive: {pth}")
+
+        try:
+            self.__entries = self.__read_index()
+        except (ArchiveError, struct.error, UnicodeDecodeError):
+            self.close()
+            raise ArchiveError(f"Not a program archive: {pth}")
+
+    def __read_index(self) -> Dict[str, ArchiveEntry]:
+        data = self.__map
+        magic, version, count, offset = ARCHIVE_HEADER.unpack_from(data)
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            raise ArchiveError("Unknown header")
+
+        entries = {}
+        for _ in range(count):
+            start, words, digest, size = ARCHIVE_ENTRY.unpack_from(data, offset)
+            offset += ARCHIVE_ENTRY.size
+            name = data[offset : offset + size].decode()
+            offset += size
+            if start + 2 * words > len(data):
+                raise ArchiveError(f"Truncated image: {name}")
+            entries[name] = ArchiveEntry(name, start, words, digest)
+
+        return entries
+
+    def __enter__(self) -> "Archive":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.__entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__entries)
+
+    @property
+    def entries(self) -> List[ArchiveEntry]:
+        return list(self.__entries.values())
+
+    def entry(self, name: str) -> ArchiveEntry:
+        try:
+            return self.__entries[name]
+        except KeyError:
+            raise ArchiveError(f"No program named {name}")
+
+    def view(self, name: str) -> memoryview:
+        # The image bytes in place; release the view before closing
+        entry = self.entry(name)
+        return memoryview(self.__map)[entry.offset : entry.offset + 2 * entry.words]
+
+    def __getitem__(self, name: str) -> array:
+        words = array("H")
+        with self.view(name) as image:
+            words.frombytes(image)
+        if sys.byteorder == "big":
+            words.byteswap()
+        return words
+
+    def verify(self, name: str) -> bool:
+        with self.view(name) as image:
+            return hashlib.sha256(image).digest() == self.entry(name).digest
+
+    def close(self) -> None:
+        self.__map.close()
+        self.__file.close()
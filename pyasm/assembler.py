@@ -1,65 +1,230 @@
-from typing import List
+from array import array
+from typing import Dict, List, Optional
 
-from pyasm.coder import Coder, SymbolTable
-from pyasm.parser import CommandType, Parser
+from pyasm.cfg import ControlFlowGraph
+from pyasm.coder import Coder, InvalidMnemonicError, SymbolInterner
+from pyasm.linker import ObjectModule
+from pyasm.parser import CommandType, Diagnostic, Instruction, Parser
+from pyasm.sourcemap import SourceMap
 
 
 class AddressOutOfRange(Exception):
     def __init__(self, line: int, command: str):
         msg = f"Address out of range at line : {line}\tCommand: {command}"
         super(AddressOutOfRange, self).__init__(msg)
+        self.line = line
 
 
 class Assembler:
     __MAX_ADDR = 24576
-    __slots__ = "__parser", "__sym_table"
+    __slots__ = (
+        "__parser",
+        "__interner",
+        "__addresses",
+        "__variable",
+        "__symbol_ids",
+        "__labels",
+        "__source_lines",
+        "__instructions",
+    )
 
-    def __init__(self, parser: Parser):
+    def __init__(self, parser: Optional[Parser] = None):
         self.__parser = parser
-        self.__sym_table = SymbolTable()
+        # Symbols resolve by interned ID, so each string is hashed once per pass
+        self.__interner = SymbolInterner()
+        self.__addresses = self.__interner.addresses()
+        self.__variable = 16
+        self.__symbol_ids = array("i")
+        self.__labels: Dict[str, int] = {}
+        self.__source_lines = array("I")
+        self.__instructions: List[Instruction] = []
 
-    def assemble(self) -> List[str]:
-        buffer = []
-        parser = self.__parser
-        table = self.__sym_table
+    @property
+    def labels(self) -> Dict[str, int]:
+        return self.__labels
 
-        # Read symbols and update sym_table
-        while parser.has_more_commands():
-            command = parser.current_command
-            command_type = parser.command_type(command)
-            if command_type is CommandType.L_COMMAND:
-                symbol = parser.symbol
-                if table.get(symbol) is None:
-                    table[symbol] = parser.line_idx
-
-            parser.advance()
-
-        parser.reset()
-
-        # Decode commands using Coder and sym_table
-        while parser.has_more_commands():
-            command = parser.current_command
-            command_type = parser.command_type(command)
-            if command_type is CommandType.C_COMMAND:
-                dest = Coder.translate_dest(parser.dest)
-                comp = Coder.translate_comp(parser.comp)
-                jmp = Coder.translate_jmp(parser.jmp)
-
-                buffer.append(f"111{comp}{dest}{jmp}")
-            elif command_type is CommandType.A_COMMAND:
-                symbol = parser.symbol
+    @property
+    def interner(self) -> SymbolInterner:
+        return self.__interner
+
+    @property
+    def symbol_ids(self) -> array:
+        # Parallel to the instructions last read, -1 where there is no symbol
+        return self.__symbol_ids
+
+    @property
+    def source_map(self) -> SourceMap:
+        return SourceMap(self.__source_lines, self.__labels)
+
+    @property
+    def control_flow_graph(self) -> ControlFlowGraph:
+        return ControlFlowGraph(self.__instructions, self.__labels)
+
+    def __read(self, instructions: Optional[List[Instruction]]) -> List[Instruction]:
+        if instructions is None:
+            if self.__parser is None:
+                raise ValueError("Nothing to assemble")
+            instructions = self.__parser.instructions()
+
+        self.__instructions = instructions
+        interner = self.__interner
+        known = interner.ids
+        addresses = self.__addresses
+        labels = self.__labels
+        ids = self.__symbol_ids = array("i")
+        append = ids.append
+        c_command, l_command = CommandType.C_COMMAND, CommandType.L_COMMAND
+
+        # Intern symbols and resolve labels
+        address = 0
+        for instruction in instructions:
+            command_type = instruction.command_type
+            if command_type is c_command:
+                append(-1)
+                address += 1
+                continue
+
+            symbol = instruction.symbol
+            idx = known.get(symbol)
+            if idx is None:
                 if symbol.isnumeric():
-                    n = int(symbol)
-                    if n > Assembler.__MAX_ADDR:
-                        raise AddressOutOfRange(parser.counter + 1, command)
-                    buffer.append("{:0>16b}".format(n))
-                else:
-                    addr = table.get(symbol)
-                    if addr is None:
-                        table.add_variable(symbol)
-                    else:
-                        buffer.append("{:0>16b}".format(addr))
-
-            parser.advance()
+                    append(-1)
+                    address += 1
+                    continue
+                idx = interner.intern(symbol)
+                if idx == len(addresses):
+                    addresses.append(-1)
+
+            append(idx)
+            if command_type is l_command:
+                if addresses[idx] < 0:
+                    addresses[idx] = address
+                    labels[symbol] = address
+            else:
+                address += 1
+
+        del self.__source_lines[:]
+        return instructions
+
+    @staticmethod
+    def __encode(instruction: Instruction) -> str:
+        dest = Coder.translate_dest(instruction.dest)
+        comp = Coder.translate_comp(instruction.comp)
+        jmp = Coder.translate_jmp(instruction.jmp)
+
+        return f"111{comp}{dest}{jmp}"
+
+    @staticmethod
+    def __constant(instruction: Instruction) -> int:
+        n = int(instruction.symbol)
+        if n > Assembler.__MAX_ADDR:
+            raise AddressOutOfRange(instruction.line, str(instruction))
+
+        return n
+
+    def assemble(
+        self,
+        instructions: Optional[List[Instruction]] = None,
+        errors: Optional[List[Diagnostic]] = None,
+    ) -> List[str]:
+        instructions = self.__read(instructions)
+        buffer = []
+        source_lines = self.__source_lines
+
+        # Decode commands using Coder and the resolved symbols
+        addresses = self.__addresses
+        l_command = CommandType.L_COMMAND
+        binary = "{:0>16b}".format
+        for instruction, idx in zip(instructions, self.__symbol_ids):
+            if instruction.command_type is l_command:
+                continue
+
+            if idx < 0:
+                buffer.append(Assembler.__word(instruction, errors))
+            else:
+                addr = addresses[idx]
+                if addr < 0:
+                    addr = addresses[idx] = self.__variable
+                    self.__variable += 1
+                buffer.append(binary(addr))
+            source_lines.append(instruction.line)
 
         return buffer
+
+    @staticmethod
+    def __word(instruction: Instruction, errors: Optional[List[Diagnostic]]) -> str:
+        # With an errors list, bad instructions are recorded and encoded as 0
+        try:
+            if instruction.command_type is CommandType.C_COMMAND:
+                return Assembler.__encode(instruction)
+            return "{:0>16b}".format(Assembler.__constant(instruction))
+        except (InvalidMnemonicError, AddressOutOfRange) as err:
+            if errors is None:
+                raise
+            message = str(err)
+            if isinstance(err, AddressOutOfRange):
+                message = f"Address out of range: {instruction.symbol}"
+            errors.append(Diagnostic(instruction.line, message))
+            return "0" * 16
+
+    def check(
+        self,
+        instructions: Optional[List[Instruction]] = None,
+        errors: Optional[List[Diagnostic]] = None,
+    ) -> None:
+        # Validates what assemble would encode without building any words;
+        # only failing instructions go through the encoder, for its errors
+        instructions = self.__read(instructions)
+        dest, comp = Coder.get_dest_table(), Coder.get_comp_table()
+        jmp = Coder.get_jmp_table()
+        c_command, a_command = CommandType.C_COMMAND, CommandType.A_COMMAND
+        max_addr = Assembler.__MAX_ADDR
+        for instruction, idx in zip(instructions, self.__symbol_ids):
+            command_type = instruction.command_type
+            if idx >= 0:
+                continue
+            if command_type is c_command:
+                if (
+                    instruction.dest.upper() in dest
+                    and instruction.comp.upper() in comp
+                    and instruction.jmp.upper() in jmp
+                ):
+                    continue
+            elif command_type is not a_command or int(instruction.symbol) <= max_addr:
+                continue
+            Assembler.__word(instruction, errors)
+
+    def compile(
+        self,
+        name: str,
+        instructions: Optional[List[Instruction]] = None,
+        errors: Optional[List[Diagnostic]] = None,
+    ) -> ObjectModule:
+        # Like assemble, but label and variable references are left for the linker
+        instructions = self.__read(instructions)
+        labels = self.__labels
+        source_lines = self.__source_lines
+        words = array("H")
+        local = []
+        externs = []
+
+        for instruction, idx in zip(instructions, self.__symbol_ids):
+            command_type = instruction.command_type
+            symbol = instruction.symbol
+            if command_type is CommandType.L_COMMAND:
+                continue
+
+            if idx < 0:
+                words.append(int(Assembler.__word(instruction, errors), 2))
+            elif symbol in labels:
+                local.append(len(words))
+                words.append(labels[symbol])
+            elif idx < SymbolInterner.RESERVED:
+                words.append(self.__addresses[idx])
+            else:
+                externs.append((len(words), symbol))
+                words.append(0)
+
+            source_lines.append(instruction.line)
+
+        return ObjectModule(name, words, labels, local, externs)
@@ -0,0 +1,290 @@
+import io
+import tarfile
+import zipfile
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from pyasm import optimizer
+from pyasm.assembler import Assembler
+from pyasm.check import asm_files, error_report, load_report
+from pyasm.disassembler import read_words
+from pyasm.parser import Diagnostic, Parser
+from pyasm.preprocessor import Source, preprocess, preprocess_text
+from pyasm.superopt import Rule
+
+TarMode = Literal["w", "w:gz", "w:bz2", "w:xz"]
+TAR_MODES: Dict[str, TarMode] = {
+    ".tar": "w",
+    ".tar.gz": "w:gz",
+    ".tgz": "w:gz",
+    ".tar.bz2": "w:bz2",
+    ".tar.xz": "w:xz",
+}
+ARCHIVE_SUFFIXES = (".zip", *TAR_MODES)
+LOAD_ERRORS = (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError, zlib.error)
+CHUNKS_PER_JOB = 4
+# Members of a compressed tar read in one go before they are handed out
+STREAM_CHUNK = 256
+
+
+class Program(NamedTuple):
+    name: str
+    words: Optional[array]
+    report: dict
+
+
+class Member(NamedTuple):
+    name: str
+    offset: int
+    size: int
+    info: Optional[zipfile.ZipInfo] = None
+    # Why the member cannot be assembled, reported as a load error
+    error: str = ""
+
+
+Loader = Callable[[], Source]
+
+
+def archive_suffix(pth: Path) -> str:
+    name = pth.name.lower()
+    return next((suffix for suffix in ARCHIVE_SUFFIXES if name.endswith(suffix)), "")
+
+
+def member_name(name: str) -> Optional[str]:
+    # A member name that stays inside the output, None for absolute or `..`
+    parts = [part for part in name.replace("\\", "/").split("/") if part != "."]
+    if not parts or not parts[0] or parts[0].endswith(":") or ".." in parts:
+        return None
+    return "/".join(part for part in parts if part)
+
+
+def _checked(member: Member, seen: Set[str]) -> Member:
+    name = member_name(member.name)
+    if name is None:
+        return member._replace(error=f"Unsafe member name: {member.name}")
+    if name in seen:
+        return member._replace(name=name, error=f"Duplicate member: {name}")
+    seen.add(name)
+    return member._replace(name=name)
+
+
+def members(pth: Path) -> List[Member]:
+    # The `.asm` members of a zip or an uncompressed tar, in file order
+    if archive_suffix(pth) == ".zip":
+        with zipfile.ZipFile(pth) as archive:
+            found = [
+                Member(info.filename, info.header_offset, info.file_size, info)
+                for info in archive.infolist()
+                if not info.is_dir() and info.filename.endswith(".asm")
+            ]
+    else:
+        with tarfile.open(pth) as archive:
+            found = [
+                Member(info.name, info.offset_data, info.size)
+                for info in archive
+                if info.isfile() and info.name.endswith(".asm")
+            ]
+
+    seen: Set[str] = set()
+    found = [_checked(member, seen) for member in found]
+    return sorted(found, key=lambda member: member.offset)
+
+
+def assemble_source(
+    name: str,
+    load: Loader,
+    pth: Path,
+    rule_set: Optional[List[Rule]] = None,
+    limit: int = 0,
+) -> Program:
+    try:
+        source = load()
+        parser = Parser(source.text)
+    except LOAD_ERRORS as err:
+        return Program(name, None, load_report(pth, err))
+
+    errors: List[Diagnostic] = []
+    instructions = parser.instructions(errors)
+    if rule_set is not None and not errors:
+        instructions = optimizer.optimize(instructions, rule_set)
+    words = Assembler().assemble(instructions, errors)
+    report = error_report(pth, errors, source, limit)
+    return Program(name, None if errors else read_words(words), report)
+
+
+def _rejected(error: str) -> Loader:
+    def load() -> Source:
+        raise ValueError(error)
+
+    return load
+
+
+def _sources(pth: Path, chunk: Sequence) -> Iterator[Tuple[str, Path, Loader]]:
+    # The name of each file of the chunk, where it is reported and how it is
+    # read; members resolve `#include` next to the archive
+    suffix = archive_suffix(pth)
+    if not suffix:
+        root = pth if pth.is_dir() else pth.parent
+        for name in chunk:
+            yield name, root.joinpath(name), partial(preprocess, root.joinpath(name))
+        return
+
+    def loader(member: Member, read: Callable[[], bytes]) -> Tuple[str, Path, Loader]:
+        origin = Path(f"{pth}/{member.name}")
+        if member.error:
+            return member.name, origin, _rejected(member.error)
+        load = lambda: preprocess_text(read().decode(), str(origin), pth.parent)
+        return member.name, origin, load
+
+    if suffix == ".zip":
+        with zipfile.ZipFile(pth) as archive:
+            for member in chunk:
+                yield loader(member, partial(archive.read, member.info))
+    elif suffix == ".tar":
+        with pth.open("rb") as f:
+
+            def read_at(member: Member) -> bytes:
+                f.seek(member.offset)
+                return f.read(member.size)
+
+            for member in chunk:
+                yield loader(member, partial(read_at, member))
+    else:
+        for member, data in chunk:
+            yield loader(member, partial(bytes, data))
+
+
+def _assemble_chunk(
+    pth: Path, chunk: Sequence, rule_set: Optional[List[Rule]], limit: int
+) -> List[Program]:
+    # Programs are named by their path in the directory or archive
+    return [
+        assemble_source(name[: -len(".asm")], load, origin, rule_set, limit)
+        for name, origin, load in _sources(pth, chunk)
+    ]
+
+
+def _split(items: Sequence, parts: int) -> List[Sequence]:
+    size = max(-(-len(items) // parts), 1)
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+def _stream(pth: Path) -> Iterator[List[Tuple[Member, bytes]]]:
+    # Compressed tars cannot be read at an offset, so they are read once, here
+    chunk: List[Tuple[Member, bytes]] = []
+    seen: Set[str] = set()
+    with tarfile.open(pth, "r|*") as archive:
+        for info in archive:
+            if info.isfile() and info.name.endswith(".asm"):
+                data = archive.extractfile(info)
+                if data is None:
+                    continue
+                member = _checked(Member(info.name, info.offset_data, info.size), seen)
+                chunk.append((member, data.read()))
+                if len(chunk) == STREAM_CHUNK:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+def _chunks(pth: Path, jobs: int) -> Iterator[Sequence]:
+    # Contiguous runs, so every worker reads one region of an archive
+    suffix = archive_suffix(pth)
+    parts = jobs * CHUNKS_PER_JOB if jobs > 1 else 1
+    if suffix in (".zip", ".tar"):
+        yield from _split(members(pth), parts)
+    elif suffix:
+        yield from _stream(pth)
+    else:
+        root = pth if pth.is_dir() else pth.parent
+        names = [asm.relative_to(root).as_posix() for asm in asm_files(pth)]
+        yield from _split(names, parts)
+
+
+def assemble_batch(
+    pth: Path,
+    rule_set: Optional[List[Rule]] = None,
+    limit: int = 0,
+    jobs: int = 1,
+) -> Iterator[Program]:
+    # Every `.asm` file of a directory, zip or tar, read without extracting
+    chunks = _chunks(pth, jobs)
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            args = repeat(pth), chunks, repeat(rule_set), repeat(limit)
+            for programs in pool.map(_assemble_chunk, *args):
+                yield from programs
+        return
+
+    for chunk in chunks:
+        yield from _assemble_chunk(pth, chunk, rule_set, limit)
+
+
+class MemberWriter:
+    __slots__ = "__pth", "__tmp", "__archive", "__count"
+
+    def __init__(self, pth: Path):
+        # A zip or tar of `.hack` files, moved into place once complete
+        suffix = archive_suffix(pth)
+        if not suffix:
+            raise ValueError(f"Unknown archive type: {pth.name}")
+
+        self.__pth = pth
+        self.__tmp = pth.with_name(f"{pth.name}.tmp")
+        self.__archive: Union[zipfile.ZipFile, tarfile.TarFile]
+        if suffix == ".zip":
+            self.__archive = zipfile.ZipFile(self.__tmp, "w", zipfile.ZIP_DEFLATED)
+        else:
+            self.__archive = tarfile.open(self.__tmp, TAR_MODES[suffix])
+        self.__count = 0
+
+    def __enter__(self) -> "MemberWriter":
+        return self
+
+    def __exit__(self, kind, *_) -> None:
+        if kind is None:
+            self.close()
+        else:
+            self.discard()
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def add(self, name: str, words: Sequence[int]) -> None:
+        data = "".join(f"{word:016b}\n" for word in words).encode()
+        member = f"{name}.hack"
+        if isinstance(self.__archive, zipfile.ZipFile):
+            self.__archive.writestr(member, data)
+        else:
+            info = tarfile.TarInfo(member)
+            info.size = len(data)
+            self.__archive.addfile(info, io.BytesIO(data))
+        self.__count += 1
+
+    def close(self) -> None:
+        if self.__tmp.exists():
+            self.__archive.close()
+            self.__tmp.replace(self.__pth)
+
+    def discard(self) -> None:
+        if self.__tmp.exists():
+            self.__archive.close()
+            self.__tmp.unlink()
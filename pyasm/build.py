@@ -0,0 +1,266 @@
+import hashlib
+import json
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pyasm.assembler import AddressOutOfRange, Assembler
+from pyasm.linker import ObjectModule, link
+from pyasm.parser import InvalidCommandException, Parser
+from pyasm.preprocessor import Preprocessor, preprocess
+
+STATE_FILE = ".pyasm-state.json"
+COMPILE = "compile"
+LINK = "link"
+
+BUILD_ERRORS = (
+    ValueError,
+    LookupError,
+    InvalidCommandException,
+    AddressOutOfRange,
+    OSError,
+)
+
+
+class BuildError(ValueError):
+    pass
+
+
+class Node(NamedTuple):
+    kind: str
+    output: Path
+    inputs: Tuple[Path, ...]
+    deps: Tuple[Path, ...]
+
+
+class BuildResult(NamedTuple):
+    built: List[Path]
+    up_to_date: List[Path]
+    failed: Dict[Path, str]
+
+
+def _compile(source: str, output: str) -> None:
+    pth = Path(source)
+    module = Assembler(Parser(preprocess(pth).text)).compile(pth.stem)
+    Path(output).write_text(module.dump())
+
+
+def _link(objects: List[str], output: str) -> None:
+    modules = [ObjectModule.load(Path(pth).read_text()) for pth in objects]
+    Path(output).write_text("".join(word + "\n" for word in link(modules)))
+
+
+def _digest(pth: Path) -> str:
+    return hashlib.sha256(pth.read_bytes()).hexdigest()
+
+
+def _valid_entry(entry: object) -> bool:
+    # [mtime, digest] for every input of a node
+    return isinstance(entry, dict) and all(
+        isinstance(value, list) and len(value) == 2 for value in entry.values()
+    )
+
+
+class Project:
+    __slots__ = "__root", "__build_dir", "__programs", "__nodes", "__state"
+
+    def __init__(self, manifest: Path):
+        try:
+            data = json.loads(manifest.read_text())
+            programs = data["programs"]
+            build_dir = data.get("build_dir", "build")
+        except (ValueError, KeyError, TypeError, AttributeError) as err:
+            raise BuildError(f"Invalid manifest {manifest}: {err}")
+        if not isinstance(programs, dict):
+            raise BuildError(f"Invalid manifest {manifest}: programs is not an object")
+        if not isinstance(build_dir, str):
+            raise BuildError(f"Invalid manifest {manifest}: build_dir is not a path")
+
+        self.__root = manifest.parent
+        self.__build_dir = self.__root.joinpath(build_dir)
+        self.__programs: Dict[str, Path] = {}
+        self.__nodes: Dict[Path, Node] = {}
+
+        # One compile node per source, shared by every program that uses it;
+        # included files are inputs of the node as well
+        preprocessor = Preprocessor()
+        for name, sources in programs.items():
+            if not isinstance(sources, list) or not all(
+                isinstance(source, str) for source in sources
+            ):
+                raise BuildError(f"Program {name} is not a list of sources")
+            if not sources:
+                raise BuildError(f"Program {name} has no sources")
+
+            objects = []
+            for source in sources:
+                src = self.__root.joinpath(source)
+                obj = self.__build_dir.joinpath(source).with_suffix(".hobj")
+                if obj not in self.__nodes:
+                    inputs: Tuple[Path, ...] = (src,)
+                    if src.is_file():
+                        inputs += tuple(preprocessor.dependencies(src))
+                    self.__nodes[obj] = Node(COMPILE, obj, inputs, ())
+                objects.append(obj)
+
+            out = self.__build_dir.joinpath(f"{name}.hack")
+            self.__nodes[out] = Node(LINK, out, tuple(objects), tuple(objects))
+            self.__programs[name] = out
+
+        state_pth = self.__build_dir.joinpath(STATE_FILE)
+        self.__state: Dict[str, Dict[str, list]] = {}
+        if state_pth.exists():
+            # A damaged state file only means everything looks stale
+            try:
+                state = json.loads(state_pth.read_text())
+            except ValueError:
+                state = {}
+            if isinstance(state, dict):
+                self.__state = {
+                    output: entry
+                    for output, entry in state.items()
+                    if _valid_entry(entry)
+                }
+
+    @property
+    def programs(self) -> Dict[str, Path]:
+        return self.__programs
+
+    @property
+    def nodes(self) -> Dict[Path, Node]:
+        return self.__nodes
+
+    def __save_state(self) -> None:
+        self.__build_dir.mkdir(parents=True, exist_ok=True)
+        pth = self.__build_dir.joinpath(STATE_FILE)
+        pth.write_text(json.dumps(self.__state, indent=1, sort_keys=True))
+
+    def __fingerprint(self, node: Node) -> Optional[Dict[str, list]]:
+        # mtime and hash of every input; the hash is reused while mtime holds
+        recorded = self.__state.get(str(node.output), {})
+        result = {}
+        for pth in node.inputs:
+            if not pth.exists():
+                return None
+            mtime = pth.stat().st_mtime_ns
+            previous = recorded.get(str(pth))
+            if previous is not None and previous[0] == mtime:
+                result[str(pth)] = previous
+            else:
+                result[str(pth)] = [mtime, _digest(pth)]
+
+        return result
+
+    def is_stale(self, node: Node) -> bool:
+        if not node.output.exists():
+            return True
+
+        recorded = self.__state.get(str(node.output))
+        fingerprint = self.__fingerprint(node)
+        if recorded is None or fingerprint is None:
+            return True
+
+        # Inputs that were only touched keep their hash, so nothing is rebuilt
+        hashes = {pth: digest for pth, (_, digest) in recorded.items()}
+        stale = hashes != {pth: digest for pth, (_, digest) in fingerprint.items()}
+        if not stale:
+            self.__state[str(node.output)] = fingerprint
+        return stale
+
+    def stale(self) -> List[Path]:
+        # Outputs that a build would run, following the graph downstream
+        result = []
+        changed: Set[Path] = set()
+        for node in self.__ordered():
+            if self.is_stale(node) or changed.intersection(node.deps):
+                changed.add(node.output)
+                result.append(node.output)
+
+        return result
+
+    def __ordered(self) -> List[Node]:
+        order = []
+        done: Set[Path] = set()
+        for output in self.__nodes:
+            stack = [(output, False)]
+            while stack:
+                pth, expanded = stack.pop()
+                if pth in done:
+                    continue
+                if expanded:
+                    done.add(pth)
+                    order.append(self.__nodes[pth])
+                    continue
+                stack.append((pth, True))
+                stack.extend((dep, False) for dep in self.__nodes[pth].deps)
+
+        return order
+
+    def build(self, jobs: int = 1, force: bool = False) -> BuildResult:
+        result = BuildResult([], [], {})
+        pending = {node.output: set(node.deps) for node in self.__nodes.values()}
+        running: Dict[Future, Node] = {}
+
+        with ProcessPoolExecutor(max(jobs, 1)) as pool:
+
+            def release(output: Path) -> None:
+                for deps in pending.values():
+                    deps.discard(output)
+
+            def schedule() -> None:
+                # Start every node whose dependencies have all finished
+                while True:
+                    ready = [out for out, deps in pending.items() if not deps]
+                    if not ready:
+                        return
+
+                    for output in ready:
+                        del pending[output]
+                        node = self.__nodes[output]
+                        if not force and not self.is_stale(node):
+                            result.up_to_date.append(output)
+                            release(output)
+                            continue
+
+                        output.parent.mkdir(parents=True, exist_ok=True)
+                        if node.kind == COMPILE:
+                            source = str(node.inputs[0])
+                            future = pool.submit(_compile, source, str(output))
+                        else:
+                            objects = [str(pth) for pth in node.inputs]
+                            future = pool.submit(_link, objects, str(output))
+                        running[future] = node
+
+            try:
+                schedule()
+                while running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        node = running.pop(future)
+                        try:
+                            future.result()
+                        except BUILD_ERRORS as err:
+                            failed = node.output
+                            if node.kind == COMPILE:
+                                failed = node.inputs[0]
+                            result.failed[node.output] = f"{failed}: {err}"
+                            self.__state.pop(str(node.output), None)
+                            continue
+
+                        # An input removed during the build leaves it stale
+                        fingerprint = self.__fingerprint(node)
+                        if fingerprint is None:
+                            self.__state.pop(str(node.output), None)
+                        else:
+                            self.__state[str(node.output)] = fingerprint
+                        result.built.append(node.output)
+                        release(node.output)
+                    schedule()
+            finally:
+                self.__save_state()
+
+        # Whatever is left waits on a failed node and was never built
+        for output in pending:
+            result.failed[output] = f"{output}: skipped, a dependency failed"
+
+        return result
@@ -0,0 +1,265 @@
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pyasm.coder import SymbolTable
+from pyasm.parser import CommandType, Instruction
+
+_RESERVED = SymbolTable()
+
+
+class Block(NamedTuple):
+    start: int
+    end: int
+    labels: Tuple[str, ...]
+    indirect: bool
+
+
+def _target(instruction: Instruction, labels: Dict[str, int]) -> Optional[int]:
+    symbol = instruction.symbol
+    if symbol.isnumeric():
+        return int(symbol)
+    if symbol in labels:
+        return labels[symbol]
+    return _RESERVED.get(symbol)
+
+
+def _csr(edges: List[List[int]]) -> Tuple[array, array]:
+    offsets = array("I", [0])
+    targets = array("I")
+    for out in edges:
+        targets.extend(out)
+        offsets.append(len(targets))
+
+    return offsets, targets
+
+
+class ControlFlowGraph:
+    __slots__ = (
+        "__starts",
+        "__ends",
+        "__labels",
+        "__indirect",
+        "__block_of",
+        "__succ_offsets",
+        "__succ",
+        "__pred_offsets",
+        "__pred",
+    )
+
+    def __init__(self, instructions: List[Instruction], labels: Dict[str, int]):
+        code: List[Instruction] = []
+        names: Dict[int, List[str]] = {}
+        for instruction in instructions:
+            if instruction.command_type is CommandType.L_COMMAND:
+                if labels.get(instruction.symbol) == len(code):
+                    names.setdefault(len(code), []).append(instruction.symbol)
+            else:
+                code.append(instruction)
+        size = len(code)
+
+        # Where each jump goes, None when A does not hold a known address
+        targets: Dict[int, Optional[int]] = {}
+        taken: Set[int] = set()
+        held: Optional[int] = None
+        for address, instruction in enumerate(code):
+            if address in names:
+                held = None
+            if instruction.command_type is CommandType.A_COMMAND:
+                held = _target(instruction, labels)
+                if instruction.symbol in labels:
+                    taken.add(labels[instruction.symbol])
+                continue
+
+            if instruction.jmp:
+                targets[address] = held
+            if instruction.jmp or "A" in instruction.dest:
+                held = None
+
+        leaders = {0} | set(names)
+        for address, target in targets.items():
+            leaders.add(address + 1)
+            if target is not None:
+                leaders.add(target)
+        starts = sorted(leader for leader in leaders if leader < size)
+
+        self.__starts = array("I", starts)
+        self.__ends = array("I", starts[1:] + [size])
+        self.__labels = [tuple(names.get(start, ())) for start in starts]
+        self.__block_of = array("I", bytes(4 * size))
+        for idx, (start, end) in enumerate(zip(self.__starts, self.__ends)):
+            self.__block_of[start:end] = array("I", [idx]) * (end - start)
+
+        # An indirect jump may reach any label whose address is loaded into A
+        indirect_targets = sorted(
+            self.__block_of[address] for address in taken if address < size
+        )
+        successors: List[List[int]] = []
+        indirect = array("B")
+        for start, end in zip(self.__starts, self.__ends):
+            out: List[int] = []
+            last = end - 1
+            jump = code[last].jmp
+            if last in targets:
+                target = targets[last]
+                if target is None:
+                    out.extend(indirect_targets)
+                elif target < size:
+                    out.append(self.__block_of[target])
+            if jump != "JMP" and end < size:
+                out.append(self.__block_of[end])
+            successors.append(sorted(set(out)))
+            indirect.append(last in targets and targets[last] is None)
+        self.__indirect = indirect
+
+        predecessors: List[List[int]] = [[] for _ in starts]
+        for idx, out in enumerate(successors):
+            for succ in out:
+                predecessors[succ].append(idx)
+
+        self.__succ_offsets, self.__succ = _csr(successors)
+        self.__pred_offsets, self.__pred = _csr(predecessors)
+
+    @classmethod
+    def from_instructions(cls, instructions: List[Instruction]) -> "ControlFlowGraph":
+        labels: Dict[str, int] = {}
+        address = 0
+        for instruction in instructions:
+            if instruction.command_type is CommandType.L_COMMAND:
+                labels.setdefault(instruction.symbol, address)
+            else:
+                address += 1
+
+        return cls(instructions, labels)
+
+    def __len__(self) -> int:
+        return len(self.__starts)
+
+    def block(self, idx: int) -> Block:
+        return Block(
+            self.__starts[idx],
+            self.__ends[idx],
+            self.__labels[idx],
+            bool(self.__indirect[idx]),
+        )
+
+    def block_of(self, address: int) -> int:
+        return self.__block_of[address]
+
+    def successors(self, idx: int) -> memoryview:
+        offsets = self.__succ_offsets
+        return memoryview(self.__succ)[offsets[idx] : offsets[idx + 1]]
+
+    def predecessors(self, idx: int) -> memoryview:
+        offsets = self.__pred_offsets
+        return memoryview(self.__pred)[offsets[idx] : offsets[idx + 1]]
+
+    def reachable(self, start: int = 0) -> Set[int]:
+        if not len(self):
+            return set()
+
+        offsets, succ = self.__succ_offsets, self.__succ
+        seen = {start}
+        stack = [start]
+        while stack:
+            idx = stack.pop()
+            for out in succ[offsets[idx] : offsets[idx + 1]]:
+                if out not in seen:
+                    seen.add(out)
+                    stack.append(out)
+
+        return seen
+
+    def __postorder(self) -> List[int]:
+        offsets, succ = self.__succ_offsets, self.__succ
+        order = []
+        seen = {0}
+        stack = [(0, offsets[0])]
+        while stack:
+            idx, pos = stack[-1]
+            if pos < offsets[idx + 1]:
+                stack[-1] = (idx, pos + 1)
+                out = succ[pos]
+                if out not in seen:
+                    seen.add(out)
+                    stack.append((out, offsets[out]))
+            else:
+                stack.pop()
+                order.append(idx)
+
+        return order
+
+    def dominators(self) -> Dict[int, int]:
+        # Immediate dominator of every reachable block (Cooper, Harvey, Kennedy)
+        if not len(self):
+            return {}
+
+        order = self.__postorder()
+        rank = [-1] * len(self)
+        for pos, idx in enumerate(order):
+            rank[idx] = pos
+        idom = [-1] * len(self)
+        idom[0] = 0
+        offsets, pred = self.__pred_offsets, self.__pred
+
+        changed = True
+        while changed:
+            changed = False
+            for idx in reversed(order[:-1]):
+                new = -1
+                for b1 in pred[offsets[idx] : offsets[idx + 1]]:
+                    if idom[b1] < 0:
+                        continue
+                    if new < 0:
+                        new = b1
+                        continue
+                    b2 = new
+                    while b1 != b2:
+                        while rank[b1] < rank[b2]:
+                            b1 = idom[b1]
+                        while rank[b2] < rank[b1]:
+                            b2 = idom[b2]
+                    new = b1
+                if idom[idx] != new:
+                    idom[idx] = new
+                    changed = True
+
+        return {idx: idom[idx] for idx in order}
+
+    def loops(self) -> Dict[int, Set[int]]:
+        # Natural loops keyed by header, merged when they share one
+        idom = self.dominators()
+        children: Dict[int, List[int]] = {}
+        for idx, parent in idom.items():
+            if idx != parent:
+                children.setdefault(parent, []).append(idx)
+
+        # Dominator tree intervals answer "does h dominate t" in constant time
+        enter: Dict[int, int] = {}
+        leave: Dict[int, int] = {}
+        clock = 0
+        stack = [(0, False)]
+        while stack:
+            idx, done = stack.pop()
+            if done:
+                leave[idx] = clock
+                continue
+            enter[idx] = clock
+            clock += 1
+            stack.append((idx, True))
+            stack.extend((child, False) for child in children.get(idx, ()))
+
+        result: Dict[int, Set[int]] = {}
+        for tail in idom:
+            for header in self.successors(tail):
+                if not enter[header] <= enter[tail] < leave[header]:
+                    continue
+
+                body = result.setdefault(header, {header})
+                pending = [tail]
+                while pending:
+                    idx = pending.pop()
+                    if idx not in body:
+                        body.add(idx)
+                        pending.extend(self.predecessors(idx))
+
+        return result
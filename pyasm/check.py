@@ -0,0 +1,79 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from pyasm.assembler import Assembler
+from pyasm.parser import Diagnostic, Parser
+from pyasm.preprocessor import Origin, PreprocessorError, Source, preprocess
+
+
+def error_report(
+    filepth: Path, errors: List[Diagnostic], source: Source, limit: int
+) -> dict:
+    # Errors come back in source order, at most `limit` of them unless it is 0
+    errors = sorted(errors)
+    shown = errors[:limit] if limit > 0 else errors
+    located = []
+    for error in shown:
+        origin = source.origin(error.line)
+        located.append(
+            {"file": origin.file, "line": origin.line, "message": error.message}
+        )
+
+    return {
+        "file": str(filepth),
+        "errors": located,
+        "count": len(errors),
+        "truncated": len(shown) < len(errors),
+    }
+
+
+def error_lines(report: dict) -> List[str]:
+    lines = [f"{e['file']}:{e['line']}: {e['message']}" for e in report["errors"]]
+    if report["truncated"]:
+        lines.append(f"... {report['count'] - len(lines)} more errors")
+    return lines
+
+
+def load_source(pth: Path) -> Tuple[Source, Parser]:
+    source = preprocess(pth)
+    return source, Parser(source.text)
+
+
+def load_report(pth: Path, err: Exception) -> dict:
+    # A source that cannot be read or parsed at all is a single error
+    if isinstance(err, PreprocessorError):
+        errors = [Diagnostic(1, err.message)]
+        return error_report(pth, errors, Source([""], [err.origin]), 0)
+    errors = [Diagnostic(1, str(err))]
+    return error_report(pth, errors, Source([""], [Origin(str(pth), 1)]), 0)
+
+
+def check_file(pth: Path, limit: int = 0) -> dict:
+    # Parses and resolves symbols like assemble, but encodes and writes nothing
+    try:
+        source, parser = load_source(pth)
+    except (OSError, ValueError) as err:
+        return load_report(pth, err)
+
+    errors: List[Diagnostic] = []
+    Assembler(parser).check(parser.instructions(errors), errors)
+    return error_report(pth, errors, source, limit)
+
+
+def asm_files(pth: Path) -> List[Path]:
+    if pth.is_dir():
+        return sorted(pth.rglob("*.asm"))
+    return [pth]
+
+
+def check_files(paths: Sequence[Path], limit: int = 0, jobs: int = 1) -> List[dict]:
+    # Files share nothing; workers take them in chunks, as most are small
+    if jobs > 1 and len(paths) > 1:
+        chunksize = max(len(paths) // (jobs * 4), 1)
+        with ProcessPoolExecutor(jobs) as pool:
+            reports = pool.map(check_file, paths, repeat(limit), chunksize=chunksize)
+            return list(reports)
+
+    return [check_file(pth, limit) for pth in paths]
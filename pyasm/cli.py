@@ -1,11 +1,43 @@
+import json
+import sys
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
 
 import typer
 from typer import Argument, Option
 
+from pyasm import linker, optimizer, vm
 from pyasm.assembler import AddressOutOfRange, Assembler
+from pyasm.build import BuildError, Project
+from pyasm.archive import ArchiveWriter
+from pyasm.batch import LOAD_ERRORS, MemberWriter, archive_suffix, assemble_batch
+from pyasm.check import (
+    asm_files,
+    check_files,
+    error_lines,
+    error_report,
+    load_report,
+)
 from pyasm.coder import InvalidMnemonicError
-from pyasm.parser import InvalidCommandException, Parser
+from pyasm.disassembler import DisassemblyError, disassemble, read_rom
+from pyasm.fuzz import CHECKS, fuzz
+from pyasm.keyboard import Keyboard
+from pyasm.linker import LinkError, ObjectModule
+from pyasm.lsp import LanguageServer
+from pyasm.parser import Diagnostic, InvalidCommandException, Parser
+from pyasm.preprocessor import PreprocessorError, Source, preprocess
+from pyasm.profiler import Profiler
+from pyasm.screen import FORMATS as SCREEN_FORMATS
+from pyasm.screen import Framebuffer
+from pyasm.simulator import (
+    MemoryAccessError,
+    ProgramTooLarge,
+    Simulator,
+    SnapshotError,
+)
+from pyasm.superopt import RewriteCache, Rule, superoptimize
+from pyasm.testscript import run_scripts, tst_files
+from pyasm.trace import TraceError, TraceWriter, read_trace
 
 cli = typer.Typer()
 
@@ -15,6 +47,61 @@ def hello():
     typer.echo("Hello there")
 
 
+def echo_error(
+    err: Exception, parser: Optional[Parser], source: Optional[Source]
+) -> None:
+    # Point back at the original file and line, through any #include or macro
+    typer.echo(err)
+    line = getattr(err, "line", None)
+    if isinstance(err, InvalidCommandException) and parser is not None:
+        line = parser.source_line
+    if line and source is not None:
+        typer.echo(f"  at {source.origin(line)}")
+
+
+def pack(
+    filepth: Path,
+    writer: Union[ArchiveWriter, MemberWriter],
+    target: Path,
+    rule_set: Optional[List[Rule]],
+    max_errors: int,
+    as_json: bool,
+    jobs: int,
+) -> None:
+    # Programs stream into the output, which is only kept if all of them assemble
+    reports = []
+    with writer:
+        try:
+            for program in assemble_batch(filepth, rule_set, max_errors, jobs):
+                reports.append(program.report)
+                if program.words is not None:
+                    writer.add(program.name, program.words)
+        except LOAD_ERRORS as err:
+            # The archive itself cannot be read
+            reports.append(load_report(filepth, err))
+
+        failed = sum(report["count"] > 0 for report in reports)
+        if failed or not reports:
+            writer.discard()
+        packed = len(writer)
+
+    if not reports:
+        typer.echo("Expected `.asm` files")
+        raise typer.Exit(code=1)
+
+    if as_json:
+        typer.echo(json.dumps(reports))
+    else:
+        for report in reports:
+            for line in error_lines(report):
+                typer.echo(line)
+    if failed:
+        typer.echo(f"{failed} of {len(reports)} files have errors", err=as_json)
+        raise typer.Exit(code=1)
+
+    typer.echo(f"Packed {packed} programs into {target}", err=as_json)
+
+
 @cli.command(name="assemble", short_help="Assemble the input file")
 def assemble(
     filepth: Path = Argument(
@@ -26,25 +113,148 @@ def assemble(
         resolve_path=True,
     ),
     out: Path = Option(None),
+    source_map: bool = Option(
+        False, "--map", help="Also write a source map next to the output"
+    ),
+    optimize: bool = Option(False, help="Run the peephole optimizer"),
+    rules: Path = Option(
+        None, exists=True, dir_okay=False, help="Superoptimizer cache to apply"
+    ),
+    compile_only: bool = Option(
+        False, "--compile", "-c", help="Write a relocatable object file to link"
+    ),
+    max_errors: int = Option(20, help="Errors to report, 0 for all of them"),
+    as_json: bool = Option(False, "--json", help="Report errors as JSON"),
+    archive: Path = Option(
+        None, help="Pack the programs of a directory, zip or tar into one archive"
+    ),
+    jobs: int = Option(1, help="Worker processes for directories and archives"),
 ):
+    suffix = archive_suffix(filepth)
+    if archive is not None or suffix or filepth.is_dir():
+        # Batches go to a pack, or to a zip or tar of `.hack` files
+        if source_map or compile_only:
+            typer.echo("Batches cannot be written with `--map` or `--compile`")
+            raise typer.Exit(code=1)
+        if archive is None and out is None and suffix:
+            out = filepth.with_name(f"{filepth.name[: -len(suffix)]}.hack{suffix}")
+        if (archive is None) == (out is None) or (out and not archive_suffix(out)):
+            typer.echo("Expected either `--archive` or a zip or tar for `--out`")
+            raise typer.Exit(code=1)
+
+        rule_set: Optional[List[Rule]] = None
+        if optimize or rules is not None:
+            rule_set = [] if rules is None else RewriteCache(rules).rules()
+        writer = MemberWriter(out) if archive is None else ArchiveWriter(archive)
+        pack(filepth, writer, archive or out, rule_set, max_errors, as_json, jobs)
+        return
+
     if filepth.suffix != ".asm":
         typer.echo("The file name must end with `.asm`")
         raise typer.Exit(code=1)
 
+    if compile_only and (optimize or rules is not None):
+        # Labels only other modules jump to look dead, and variables would be
+        # pinned to addresses before the linker allocates them
+        typer.echo("Objects cannot be written with `--optimize` or `--rules`")
+        raise typer.Exit(code=1)
+
     if out is None:
-        out = filepth.parent.joinpath(f"{filepth.stem}.hack")
+        suffix = ".hobj" if compile_only else ".hack"
+        out = filepth.parent.joinpath(f"{filepth.stem}{suffix}")
 
     try:
-        parser = Parser(filepth.read_text())
+        source = preprocess(filepth)
+        parser = Parser(source.text)
+    except PreprocessorError as err:
+        # Reported like any other error, through a source that is just the origin
+        failed = [Diagnostic(1, err.message)]
+        report = error_report(filepth, failed, Source([""], [err.origin]), 0)
+        typer.echo(json.dumps(report) if as_json else err)
+        raise typer.Exit(1)
     except ValueError as err:
         typer.echo(err)
         raise typer.Exit(1)
 
     assembler = Assembler(parser)
 
+    # Every problem is collected before anything is reported
+    errors: List[Diagnostic] = []
+    instructions = parser.instructions(errors)
+    if (optimize or rules is not None) and not errors:
+        rule_set = [] if rules is None else RewriteCache(rules).rules()
+        instructions = optimizer.optimize(instructions, rule_set)
+    if compile_only:
+        module = assembler.compile(filepth.stem, instructions, errors)
+    else:
+        assembly = assembler.assemble(instructions, errors)
+
+    report = error_report(filepth, errors, source, max_errors)
+    if as_json:
+        typer.echo(json.dumps(report))
+    elif errors:
+        for line in error_lines(report):
+            typer.echo(line)
+    if errors:
+        raise typer.Exit(code=1)
+
+    typer.echo(f"Writing to {out}", err=as_json)
+    if compile_only:
+        out.write_text(module.dump())
+    else:
+        with out.open("w") as f:
+            f.writelines([x + "\n" for x in assembly])
+
+    if source_map:
+        map_pth = out.with_suffix(".map")
+        typer.echo(f"Writing source map to {map_pth}", err=as_json)
+        with map_pth.open("w") as f:
+            # Back through the preprocessor, to the files that were written
+            mapped = assembler.source_map.through(source.origin, str(filepth))
+            f.writelines([x + "\n" for x in mapped.dump()])
+
+    typer.echo("Done", err=as_json)
+
+
+@cli.command(name="check", short_help="Report errors without writing any output")
+def check(
+    paths: List[Path] = Argument(..., exists=True, file_okay=True, dir_okay=True),
+    jobs: int = Option(1, help="Worker processes"),
+    max_errors: int = Option(20, help="Errors to report per file, 0 for all of them"),
+    as_json: bool = Option(False, "--json", help="Report errors as JSON"),
+):
+    files = [asm for pth in paths for asm in asm_files(pth)]
+    if not files or any(asm.suffix != ".asm" for asm in files):
+        typer.echo("Expected `.asm` files or directories of them")
+        raise typer.Exit(code=1)
+
+    reports = check_files(files, max_errors, jobs)
+    failed = sum(report["count"] > 0 for report in reports)
+    if as_json:
+        typer.echo(json.dumps(reports))
+    else:
+        for report in reports:
+            for line in error_lines(report):
+                typer.echo(line)
+        typer.echo(f"{len(reports)} files, {failed} with errors")
+    if failed:
+        raise typer.Exit(code=1)
+
+
+@cli.command(name="link", short_help="Link object files into one program")
+def link(
+    objects: List[Path] = Argument(
+        ..., exists=True, file_okay=True, dir_okay=False, readable=True
+    ),
+    out: Path = Option(None),
+):
+    if out is None:
+        out = objects[0].with_suffix(".hack")
+
     try:
-        assembly = assembler.assemble()
-    except (InvalidCommandException, InvalidMnemonicError, AddressOutOfRange) as err:
+        modules = [ObjectModule.load(pth.read_text()) for pth in objects]
+        assembly = linker.link(modules)
+    except LinkError as err:
         typer.echo(err)
         raise typer.Exit(code=1)
 
@@ -55,5 +265,338 @@ def assemble(
     typer.echo("Done")
 
 
+@cli.command(name="build", short_help="Rebuild the stale programs of a project")
+def build(
+    manifest: Path = Argument(
+        Path("pyasm.json"), exists=True, file_okay=True, dir_okay=False
+    ),
+    jobs: int = Option(1, help="Worker processes"),
+    force: bool = Option(False, help="Rebuild everything"),
+    dry_run: bool = Option(False, help="Only list what would be rebuilt"),
+):
+    try:
+        project = Project(manifest)
+    except BuildError as err:
+        typer.echo(err)
+        raise typer.Exit(code=1)
+
+    if dry_run:
+        for pth in project.stale():
+            typer.echo(pth)
+        return
+
+    result = project.build(jobs, force)
+    for pth in result.built:
+        typer.echo(f"Built {pth}")
+    for message in result.failed.values():
+        typer.echo(f"Failed {message}")
+    typer.echo(f"{len(result.built)} built, {len(result.up_to_date)} up to date")
+
+    if result.failed:
+        raise typer.Exit(code=1)
+
+
+@cli.command(name="vm", short_help="Translate and assemble VM code")
+def translate_vm(
+    pth: Path = Argument(..., exists=True, file_okay=True, dir_okay=True),
+    out: Path = Option(None),
+    bootstrap: bool = Option(
+        None, help="Call Sys.init first; on by default when there is a Sys.vm"
+    ),
+    jobs: int = Option(1, help="Worker processes, one file each"),
+):
+    files = vm.vm_files(pth)
+    if not files or any(f.suffix != ".vm" for f in files):
+        typer.echo("Expected a `.vm` file or a directory of them")
+        raise typer.Exit(code=1)
+
+    if out is None:
+        name = pth.name if pth.is_dir() else pth.stem
+        out = (pth if pth.is_dir() else pth.parent).joinpath(f"{name}.hack")
+
+    try:
+        instructions = vm.translate_files(files, bootstrap, jobs)
+        assembly = Assembler().assemble(instructions)
+    except (ValueError, AddressOutOfRange) as err:
+        typer.echo(err)
+        raise typer.Exit(code=1)
+
+    typer.echo(f"Writing to {out}")
+    with out.open("w") as f:
+        f.writelines([x + "\n" for x in assembly])
+
+    typer.echo("Done")
+
+
+@cli.command(name="disasm", short_help="Turn a ROM image back into assembly")
+def disasm(
+    filepth: Path = Argument(
+        ..., exists=True, file_okay=True, dir_okay=False, readable=True
+    ),
+    out: Path = Option(None, help="Write here instead of printing"),
+):
+    # `.hack` text or a raw big-endian ROM image
+    try:
+        lines = disassemble(read_rom(filepth))
+    except (ValueError, DisassemblyError) as err:
+        typer.echo(err)
+        raise typer.Exit(code=1)
+
+    if out is None:
+        for line in lines:
+            typer.echo(line)
+        return
+
+    typer.echo(f"Writing to {out}")
+    with out.open("w") as f:
+        f.writelines([x + "\n" for x in lines])
+
+    typer.echo("Done")
+
+
+@cli.command(name="lsp", short_help="Run the language server on stdin and stdout")
+def lsp():
+    server = LanguageServer(sys.stdin.buffer, sys.stdout.buffer)
+    raise typer.Exit(code=server.serve())
+
+
+def load_program(
+    filepth: Path, optimize: bool = False
+) -> Tuple[List[str], Dict[str, int]]:
+    if filepth.suffix == ".hack":
+        return filepth.read_text().split(), {}
+
+    if filepth.suffix == ".vm":
+        try:
+            assembler = Assembler()
+            instructions = vm.translate_files([filepth])
+            if optimize:
+                instructions = optimizer.optimize(instructions, indirect_jumps=True)
+            return assembler.assemble(instructions), assembler.labels
+        except (ValueError, AddressOutOfRange) as err:
+            typer.echo(err)
+            raise typer.Exit(code=1)
+
+    if filepth.suffix != ".asm":
+        typer.echo("The file name must end with `.asm`, `.vm` or `.hack`")
+        raise typer.Exit(code=1)
+
+    parser = source = None
+    try:
+        source = preprocess(filepth)
+        parser = Parser(source.text)
+        instructions = parser.instructions()
+        if optimize:
+            instructions = optimizer.optimize(instructions)
+
+        assembler = Assembler(parser)
+        return assembler.assemble(instructions), assembler.labels
+    except (
+        ValueError,
+        InvalidCommandException,
+        InvalidMnemonicError,
+        AddressOutOfRange,
+    ) as err:
+        echo_error(err, parser, source)
+        raise typer.Exit(code=1)
+
+
+@cli.command(name="run", short_help="Run a program on the simulator")
+def run(
+    filepth: Path = Argument(
+        ...,
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        readable=True,
+        resolve_path=True,
+    ),
+    cycles: int = Option(1_000_000, help="Maximum number of cycles to run"),
+    ram: int = Option(16, help="Number of RAM words to print"),
+    resume: Path = Option(
+        None, exists=True, dir_okay=False, help="Snapshot to start from"
+    ),
+    snapshot: Path = Option(None, help="Write the final machine state here"),
+    checkpoint_every: int = Option(0, help="Checkpoint interval in cycles"),
+    profile: bool = Option(False, help="Report where the cycles were spent"),
+    folded: Path = Option(None, help="Write flamegraph folded stacks here"),
+    trace: Path = Option(None, help="Record a binary execution trace here"),
+    optimize: bool = Option(False, help="Run the peephole optimizer"),
+    screen: Path = Option(None, help="Save the final screen (.pbm/.ppm/.png/.raw)"),
+    video: Path = Option(None, help="Append raw 8 bit grey frames here"),
+    frame_every: int = Option(10_000, help="Cycles between video frames"),
+    keys: Path = Option(
+        None, exists=True, dir_okay=False, help="Keyboard script of `cycle key` lines"
+    ),
+):
+    for image in (screen, video):
+        if image is not None and image.suffix not in SCREEN_FORMATS:
+            typer.echo(f"The image must end with one of {', '.join(SCREEN_FORMATS)}")
+            raise typer.Exit(code=1)
+
+    words, labels = load_program(filepth, optimize)
+    profiler = None
+    tracer = None
+    frames = None
+    try:
+        simulator = Simulator.from_binary(words)
+        framebuffer = Framebuffer(simulator.memory)
+        if keys is not None:
+            simulator.keyboard = Keyboard.parse(keys.read_text())
+        if profile or folded is not None:
+            profiler = Profiler(len(simulator.rom))
+        if resume is not None:
+            simulator.restore(resume.read_bytes())
+        if trace is not None:
+            tracer = TraceWriter(trace, start_cycle=simulator.cycles)
+
+        # Without a video the whole run is one call; with one it is cut
+        # into slices and only the rows drawn in between are decoded
+        step = cycles if video is None else max(frame_every, 1)
+        if video is not None:
+            frames = video.open("wb")
+        executed = 0
+        while executed < cycles:
+            ran = simulator.run(
+                min(step, cycles - executed),
+                checkpoint_every=checkpoint_every,
+                profiler=profiler,
+                tracer=tracer,
+            )
+            executed += ran
+            if frames is not None:
+                framebuffer.update()
+                frames.write(framebuffer.grey())
+            if simulator.halted or not ran:
+                break
+    except (ValueError, ProgramTooLarge, MemoryAccessError, SnapshotError) as err:
+        typer.echo(err)
+        raise typer.Exit(code=1)
+    finally:
+        if tracer is not None:
+            tracer.close()
+        if frames is not None:
+            frames.close()
+
+    if screen is not None:
+        framebuffer.update()
+        framebuffer.export(screen)
+
+    if snapshot is not None:
+        snapshot.write_bytes(simulator.snapshot())
+
+    typer.echo(f"Cycles: {simulator.cycles}")
+    typer.echo(f"PC: {simulator.pc}\tA: {simulator.a}\tD: {simulator.d}")
+    for address in range(min(ram, len(simulator.memory))):
+        typer.echo(f"RAM[{address}]: {simulator.memory[address]}")
+
+    if profiler is not None:
+        if profile:
+            typer.echo("")
+            for line in profiler.report(labels):
+                typer.echo(line)
+        if folded is not None:
+            stacks = profiler.folded(labels, filepth.stem)
+            with folded.open("w") as f:
+                f.writelines([x + "\n" for x in stacks])
+
+
+@cli.command(name="test", short_help="Run .tst scripts and compare their output")
+def test(
+    paths: List[Path] = Argument(..., exists=True, file_okay=True, dir_okay=True),
+    jobs: int = Option(1, help="Worker processes, one script each"),
+):
+    scripts = [script for pth in paths for script in tst_files(pth)]
+    if not scripts or any(script.suffix != ".tst" for script in scripts):
+        typer.echo("Expected `.tst` files or directories of them")
+        raise typer.Exit(code=1)
+
+    results = run_scripts(scripts, jobs)
+    for result in results:
+        typer.echo(result)
+
+    failed = sum(not result.passed for result in results)
+    typer.echo(f"{len(results) - failed} passed, {failed} failed")
+    if failed:
+        raise typer.Exit(code=1)
+
+
+@cli.command(name="trace", short_help="Print records from an execution trace")
+def trace(
+    filepth: Path = Argument(
+        ..., exists=True, file_okay=True, dir_okay=False, readable=True
+    ),
+    start: int = Option(None, help="First cycle to print"),
+    stop: int = Option(None, help="Stop before this cycle"),
+    pc: int = Option(None, help="Only print cycles executing this address"),
+    address: int = Option(None, help="Only print writes to this address"),
+):
+    try:
+        for record in read_trace(filepth, start, stop):
+            if pc is not None and record.pc != pc:
+                continue
+            if address is not None and record.address != address:
+                continue
+
+            line = f"{record.cycle}\tPC: {record.pc}\tA: {record.a}\tD: {record.d}"
+            if record.address is not None:
+                line += f"\tRAM[{record.address}] = {record.value}"
+            typer.echo(line)
+    except TraceError as err:
+        typer.echo(err)
+        raise typer.Exit(code=1)
+
+
+@cli.command(name="superopt", short_help="Search for a shorter instruction sequence")
+def superopt(
+    filepth: Path = Argument(
+        ..., exists=True, file_okay=True, dir_okay=False, readable=True
+    ),
+    max_length: int = Option(3, help="Longest rewrite to try"),
+    ignore: str = Option("", help="Registers (A, D) that may differ afterwards"),
+    jobs: int = Option(1, help="Worker processes for the last search level"),
+    cache: Path = Option(
+        Path.home().joinpath(".cache", "pyasm", "superopt.json"),
+        help="Where proven rewrites are kept",
+    ),
+):
+    try:
+        rewrite = superoptimize(
+            filepth.read_text(), RewriteCache(cache), max_length, ignore.upper(), jobs
+        )
+    except (ValueError, InvalidCommandException, InvalidMnemonicError) as err:
+        typer.echo(err)
+        raise typer.Exit(code=1)
+
+    if rewrite is None:
+        typer.echo("No shorter sequence found")
+        raise typer.Exit(code=1)
+
+    for line in rewrite:
+        typer.echo(line)
+
+
+@cli.command(name="fuzz", short_help="Compare assembler paths on random programs")
+def fuzz_cmd(
+    iterations: int = Option(100, help="Programs generated per check"),
+    seed: int = Option(0, help="Seed; case `seed:n` always gives the same program"),
+    size: int = Option(30, help="Longest program generated"),
+    corpus: Path = Option(None, help="Directory keeping shrunk failing programs"),
+    check: List[str] = Option(list(CHECKS), help="Checks to run"),
+):
+    unknown = [name for name in check if name not in CHECKS]
+    if unknown:
+        typer.echo(f"Unknown check {unknown[0]}, expected one of {', '.join(CHECKS)}")
+        raise typer.Exit(code=1)
+
+    failures = fuzz(check, seed, iterations, size, corpus)
+    for failure in failures:
+        typer.echo(f"FAIL {failure.check} {failure.case}: {failure.message}")
+
+    typer.echo(f"{iterations * len(check)} cases, {len(failures)} failures")
+    if failures:
+        raise typer.Exit(code=1)
+
+
 if __name__ == "__main__":
     cli()
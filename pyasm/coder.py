@@ -1,3 +1,4 @@
+from array import array
 from typing import Dict, Optional
 
 TranslationTable = Dict[str, str]
@@ -139,13 +140,27 @@ class SymbolTable:
         "kbd": 24576,
     }
 
-    __slots__ = "__lookup_table", "__counter"
+    __slots__ = "__lookup_table", "__counter", "__parent"
 
-    def __init__(self):
-        self.__lookup_table = {}
+    @staticmethod
+    def get_reserved_table() -> Dict[str, int]:
+        return SymbolTable.__RESERVED
+
+    def __init__(self, parent: Optional["SymbolTable"] = None):
+        self.__lookup_table: Dict[str, int] = {}
         self.__counter = 16
+        self.__parent = parent
+
+    @property
+    def parent(self) -> Optional["SymbolTable"]:
+        return self.__parent
 
     def add_variable(self, variable: str) -> None:
+        # Variables are shared between modules, so the outermost table owns them
+        if self.__parent is not None:
+            self.__parent.add_variable(variable)
+            return
+
         self.__lookup_table.__setitem__(variable, self.__counter)
         self.__counter += 1
 
@@ -160,6 +175,9 @@ class SymbolTable:
         if reserved is not None:
             return reserved
 
+        if self.__parent is not None and key not in self.__lookup_table:
+            return self.__parent[key]
+
         return self.__lookup_table[key]
 
     def get(self, key: str, default=None) -> Optional[int]:
@@ -167,7 +185,11 @@ class SymbolTable:
         if reserved is not None:
             return reserved
 
-        return self.__lookup_table.get(key, default)
+        value = self.__lookup_table.get(key)
+        if value is None and self.__parent is not None:
+            return self.__parent.get(key, default)
+
+        return default if value is None else value
 
     def __len__(self) -> int:
         return len(self.__lookup_table)
@@ -186,3 +208,45 @@ class SymbolTable:
 
         self.__lookup_table.__delitem__(symbol)
         return True
+
+
+class SymbolInterner:
+    # Dense integer IDs for symbols, with the reserved ones first so their
+    # IDs are the same in every interner
+    __slots__ = "__ids", "__names"
+
+    RESERVED = len(SymbolTable.get_reserved_table())
+
+    def __init__(self):
+        self.__names = list(SymbolTable.get_reserved_table())
+        self.__ids = {name: idx for idx, name in enumerate(self.__names)}
+
+    def __len__(self) -> int:
+        return len(self.__names)
+
+    @property
+    def ids(self) -> Dict[str, int]:
+        return self.__ids
+
+    def intern(self, name: str) -> int:
+        idx = self.__ids.get(name)
+        if idx is not None:
+            return idx
+
+        # Reserved symbols match in any case, other symbols are case sensitive
+        idx = self.__ids.get(name.lower())
+        if idx is None or idx >= SymbolInterner.RESERVED:
+            idx = len(self.__names)
+            self.__names.append(name)
+        self.__ids[name] = idx
+        return idx
+
+    def name(self, idx: int) -> str:
+        return self.__names[idx]
+
+    def addresses(self, size: int = 0) -> array:
+        # Resolved address by ID, -1 until a symbol is defined
+        table = array("i", [-1]) * max(size, len(self.__names))
+        for idx, address in enumerate(SymbolTable.get_reserved_table().values()):
+            table[idx] = address
+        return table
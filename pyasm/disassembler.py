@@ -0,0 +1,118 @@
+import sys
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, cast
+
+from pyasm.coder import Coder, TranslationTable
+
+C_PREFIX = 0b111 << 13
+A_LIMIT = 0x8000
+# Largest constant the assembler accepts in an A command
+MAX_CONSTANT = 24576
+WORDS = 0x10000
+LABEL_PREFIX = "L"
+
+
+class DisassemblyError(ValueError):
+    pass
+
+
+def _invert(table: TranslationTable) -> Dict[int, str]:
+    # Several mnemonics share a code; the first one listed is kept
+    inverted: Dict[int, str] = {}
+    for mnemonic, code in table.items():
+        inverted.setdefault(int(code, 2), mnemonic)
+    return inverted
+
+
+@lru_cache(maxsize=None)
+def decode_table() -> List[Optional[str]]:
+    # Every 16-bit word, decoded once; None marks words no mnemonic produces
+    dest = _invert(Coder.get_dest_table())
+    comp = _invert(Coder.get_comp_table())
+    jmp = _invert(Coder.get_jmp_table())
+
+    table: List[Optional[str]] = [f"@{n}" for n in range(A_LIMIT)]
+    table.extend([None] * (WORDS - A_LIMIT))
+    for comp_bits, comp_text in comp.items():
+        for dest_bits, dest_text in dest.items():
+            prefix = f"{dest_text}={comp_text}" if dest_text else comp_text
+            base = C_PREFIX | comp_bits << 6 | dest_bits << 3
+            for jmp_bits, jmp_text in jmp.items():
+                table[base | jmp_bits] = f"{prefix};{jmp_text}" if jmp_text else prefix
+
+    return table
+
+
+def _is_jump(word: int) -> bool:
+    return word & C_PREFIX == C_PREFIX and word & 0b111 != 0
+
+
+def jump_loads(words: Sequence[int]) -> List[int]:
+    # Addresses of the A-instructions that load a jump target within the program
+    size = len(words)
+    limit = min(size, A_LIMIT - 1)
+    return [
+        address - 1
+        for address in range(1, size)
+        if _is_jump(words[address]) and words[address - 1] <= limit
+    ]
+
+
+def disassemble(words: Sequence[int]) -> List[str]:
+    table = decode_table()
+    decoded = [table[word] for word in words]
+    if None in decoded:
+        address = decoded.index(None)
+        raise DisassemblyError(
+            f"Cannot decode word {words[address]:016b} at address {address}"
+        )
+    lines = cast(List[str], decoded)
+
+    loads = jump_loads(words)
+    # Larger constants only assemble as labels, so they need a word to sit on
+    jumps = set(loads)
+    for address, word in enumerate(words):
+        if MAX_CONSTANT < word < A_LIMIT and address not in jumps:
+            if word > len(words):
+                raise DisassemblyError(
+                    f"Cannot express @{word} at address {address}: constants "
+                    f"above {MAX_CONSTANT} must be addresses in the program"
+                )
+            loads.append(address)
+    for address in loads:
+        lines[address] = f"@{LABEL_PREFIX}{words[address]}"
+
+    targets = {words[address] for address in loads}
+    if not targets:
+        return lines
+
+    result = []
+    for address, line in enumerate(lines):
+        if address in targets:
+            result.append(f"({LABEL_PREFIX}{address})")
+        result.append(line)
+    if len(lines) in targets:
+        result.append(f"({LABEL_PREFIX}{len(lines)})")
+
+    return result
+
+
+def read_words(lines: Iterable[str]) -> array:
+    return array("H", (int(line, 2) for line in lines if line.strip()))
+
+
+def read_rom(pth: Path) -> array:
+    # `.hack` text, or a raw image of big-endian 16-bit words
+    if pth.suffix == ".hack":
+        return read_words(pth.read_text().splitlines())
+
+    data = pth.read_bytes()
+    if len(data) % 2:
+        raise DisassemblyError(f"Odd number of bytes in ROM image: {len(data)}")
+
+    words = array("H", data)
+    if sys.byteorder == "little":
+        words.byteswap()
+    return words
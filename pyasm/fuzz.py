@@ -0,0 +1,305 @@
+import random
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from pyasm import linker, optimizer
+from pyasm.assembler import Assembler
+from pyasm.coder import Coder, SymbolTable
+from pyasm.disassembler import disassemble, read_words
+from pyasm.parser import CommandType, Diagnostic, Instruction, Parser
+from pyasm.simulator import Simulator
+
+DESTS = [dest for dest in Coder.get_dest_table() if dest]
+COMPS = list(Coder.get_comp_table())
+JUMPS = [jmp for jmp in Coder.get_jmp_table() if jmp]
+RESERVED = list(SymbolTable.get_reserved_table())
+RESERVED_UPPER = {symbol.upper() for symbol in RESERVED}
+SYMBOLS = ["i", "n", "sum", "LOOP", "loop", "END", "ptr.1", "Main.x$y"]
+INVALID = ["M=Q", "D;JXX", "@-1", "(1X)", "A=D+M+1", "MD=", "@", "(", "JMP", "0;"]
+# Error messages start with these, so collected errors can name their class
+ERROR_KINDS = {
+    "Invalid Command": "InvalidCommandException",
+    "Invalid mnemonic": "InvalidMnemonicError",
+    "Address out of range": "AddressOutOfRange",
+}
+MAX_CYCLES = 10_000
+
+A_COMMAND = CommandType.A_COMMAND
+C_COMMAND = CommandType.C_COMMAND
+L_COMMAND = CommandType.L_COMMAND
+
+
+class Outcome(NamedTuple):
+    words: Sequence[str] = ()
+    error: str = ""
+
+    def __str__(self) -> str:
+        return f"error {self.error}" if self.error else f"{len(self.words)} words"
+
+
+class Failure(NamedTuple):
+    check: str
+    case: str
+    message: str
+    program: str
+
+
+Check = Callable[[str], Optional[str]]
+
+
+def generate(rng: random.Random, size: int, invalid: float = 0.05) -> str:
+    # Any mix of symbols, labels, aliases, case and comments; some lines bad
+    lines = []
+    for _ in range(rng.randint(1, size)):
+        roll = rng.random()
+        if roll < invalid:
+            line = rng.choice(INVALID)
+        elif roll < 0.15:
+            line = f"({rng.choice(SYMBOLS)})"
+        elif roll < 0.25:
+            line = f"@{rng.randrange(24577)}"
+            if rng.random() < invalid:
+                line = f"@{rng.randrange(24577, 40000)}"
+        elif roll < 0.45:
+            symbol = rng.choice(SYMBOLS + RESERVED)
+            if symbol in RESERVED:
+                symbol = "".join(rng.choice((c.lower(), c.upper())) for c in symbol)
+            line = f"@{symbol}"
+        else:
+            dest, comp, jmp = rng.choice(DESTS), rng.choice(COMPS), rng.choice(JUMPS)
+            forms = [f"{dest}={comp}", f"{comp};{jmp}", f"{dest}={comp};{jmp}"]
+            line = rng.choice(forms)
+            if rng.random() < 0.2:
+                line = line.lower()
+
+        if rng.random() < 0.1:
+            line = f"  {line} // note"
+        lines.append(line)
+
+    return "\n".join(lines) + "\n"
+
+
+def generate_runnable(rng: random.Random, size: int) -> str:
+    # Valid programs that always reach END: jumps only go forward and A only
+    # ever holds a constant, so every M access is in range. Label addresses
+    # move when code is optimized, so after a jump or a label A is reloaded
+    # before it is used
+    lines = []
+    pending = []
+    for num in range(rng.randint(1, size)):
+        roll = rng.random()
+        if roll < 0.15:
+            pending.append(f"F{num}")
+            lines.append(f"@F{num}")
+            comp = rng.choice(["D", "D-1", "!D", "0"])
+            lines.append(f"{comp};{rng.choice(JUMPS)}")
+        elif roll < 0.25 and pending:
+            lines.append(f"({pending.pop(rng.randrange(len(pending)))})")
+        elif roll < 0.55:
+            lines.append(f"@{rng.choice([str(rng.randrange(32)), 'R2', 'SP'])}")
+            continue
+        else:
+            lines.append(f"{rng.choice(['M', 'D', 'MD'])}={rng.choice(COMPS)}")
+            continue
+        lines.append(f"@{rng.randrange(32)}")
+
+    lines.extend(f"({label})" for label in pending)
+    lines.extend(["(END)", "@END", "0;JMP"])
+    return "\n".join(lines) + "\n"
+
+
+def _outcome(run: Callable[[], Sequence[str]]) -> Outcome:
+    # Any exception counts, so crashes in an engine show up as differences
+    try:
+        return Outcome(list(run()))
+    except Exception as err:
+        return Outcome(error=type(err).__name__)
+
+
+def reference(text: str) -> Outcome:
+    return _outcome(lambda: Assembler(Parser(text)).assemble())
+
+
+def _collecting(text: str) -> Outcome:
+    # The first collected error is the one the reference raises
+    errors: List[Diagnostic] = []
+
+    def run() -> Sequence[str]:
+        parser = Parser(text)
+        return Assembler(parser).assemble(parser.instructions(errors), errors)
+
+    outcome = _outcome(run)
+    if outcome.error or not errors:
+        return outcome
+
+    message = errors[0].message
+    kind = next((k for k in ERROR_KINDS if message.startswith(k)), message)
+    return Outcome(error=ERROR_KINDS.get(kind, kind))
+
+
+def _linked(text: str) -> Outcome:
+    return _outcome(lambda: linker.link([Assembler(Parser(text)).compile("Fuzz")]))
+
+
+def _disassembled(text: str) -> Outcome:
+    # A program of only labels has no words, and no source says nothing
+    expected = reference(text)
+    if expected.error or not expected.words:
+        return expected
+
+    source = "\n".join(disassemble(read_words(expected.words)))
+    return reference(source)
+
+
+ENGINES: Dict[str, Callable[[str], Outcome]] = {
+    "collect": _collecting,
+    "link": _linked,
+    "disasm": _disassembled,
+}
+
+
+def _against_reference(engine: Callable[[str], Outcome]) -> Check:
+    def check(text: str) -> Optional[str]:
+        expected, actual = reference(text), engine(text)
+        if actual == expected:
+            return None
+        return f"expected {expected}, got {actual}"
+
+    return check
+
+
+def _run(words: Sequence[str]) -> bytes:
+    simulator = Simulator.from_binary(words)
+    simulator.run(MAX_CYCLES)
+    return simulator.memory.tobytes()
+
+
+def _runnable(instructions: List[Instruction]) -> bool:
+    # Shrinking can break what generate_runnable promises; such programs are
+    # no evidence against the optimizer
+    labels = {i.symbol for i in instructions if i.command_type is L_COMMAND}
+    reload = jump = False
+    for instruction in instructions:
+        command_type = instruction.command_type
+        if command_type is L_COMMAND:
+            reload = True
+        elif command_type is C_COMMAND and jump:
+            if not instruction.jmp or instruction.dest:
+                return False
+            if set("AM") & set(instruction.comp):
+                return False
+            reload, jump = True, False
+        elif command_type is C_COMMAND:
+            if reload or instruction.jmp:
+                return False
+        elif jump:
+            return False
+        else:
+            symbol = instruction.symbol
+            reload = False
+            if not symbol.isnumeric() and symbol.upper() not in RESERVED_UPPER:
+                if symbol not in labels:
+                    return False
+                jump = True
+
+    return not jump
+
+
+def check_optimizer(text: str) -> Optional[str]:
+    # Optimized code may take fewer cycles, so only the memory is compared
+    try:
+        instructions = Parser(text).instructions()
+    except Exception:
+        return None
+    if not _runnable(instructions):
+        return None
+
+    try:
+        optimized = optimizer.optimize(instructions)
+        expected = _run(Assembler().assemble(instructions))
+        actual = _run(Assembler().assemble(optimized))
+    except Exception as err:
+        return f"error {type(err).__name__}: {err}"
+
+    if actual == expected:
+        return None
+    first = next(n for n in range(len(actual)) if actual[n] != expected[n])
+    return f"memory differs from address {first // 2}"
+
+
+CHECKS: Dict[str, Check] = {
+    **{name: _against_reference(engine) for name, engine in ENGINES.items()},
+    "optimizer": check_optimizer,
+}
+
+
+def shrink(lines: List[str], fails: Callable[[List[str]], bool]) -> List[str]:
+    # Drop ever smaller chunks of lines while the failure persists
+    chunk = max(len(lines) // 2, 1)
+    while True:
+        idx = 0
+        removed = False
+        while idx < len(lines) and len(lines) > 1:
+            candidate = lines[:idx] + lines[idx + chunk :]
+            if candidate and fails(candidate):
+                lines = candidate
+                removed = True
+            else:
+                idx += chunk
+        if chunk == 1 and not removed:
+            return lines
+        chunk = max(chunk // 2, 1)
+
+
+def _program(check: str, case: str, size: int) -> str:
+    rng = random.Random(case)
+    if check == "optimizer":
+        return generate_runnable(rng, size)
+    return generate(rng, size)
+
+
+def _try(
+    check: str, case: str, text: str, corpus: Optional[Path]
+) -> Optional[Failure]:
+    run = CHECKS[check]
+    message = run(text)
+    if message is None:
+        return None
+
+    def fails(lines: List[str]) -> bool:
+        return run("\n".join(lines) + "\n") is not None
+
+    program = "\n".join(shrink(text.splitlines(), fails)) + "\n"
+    if corpus is not None:
+        corpus.mkdir(parents=True, exist_ok=True)
+        name = case.replace(":", "-").replace("/", "-")
+        corpus.joinpath(f"{check}-{name}.asm").write_text(program)
+    return Failure(check, case, run(program) or message, program)
+
+
+def fuzz(
+    checks: Iterable[str],
+    seed: int = 0,
+    iterations: int = 100,
+    size: int = 30,
+    corpus: Optional[Path] = None,
+) -> List[Failure]:
+    # Case `seed:n` always generates the same program, and every program in
+    # the corpus is checked again first
+    checks = list(checks)
+    failures = []
+    saved = sorted(corpus.glob("*.asm")) if corpus is not None else []
+    for pth in saved:
+        for check in checks:
+            failure = _try(check, pth.name, pth.read_text(), None)
+            if failure is not None:
+                failures.append(failure)
+
+    for num in range(iterations):
+        case = f"{seed}:{num}"
+        for check in checks:
+            failure = _try(check, case, _program(check, case, size), corpus)
+            if failure is not None:
+                failures.append(failure)
+
+    return failures
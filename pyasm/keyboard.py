@@ -0,0 +1,93 @@
+from bisect import bisect_right
+from typing import Iterable, List, NamedTuple, Optional
+
+from pyasm.simulator import KBD, Memory
+
+KEY_CODES = {
+    "none": 0,
+    "space": 32,
+    "newline": 128,
+    "enter": 128,
+    "backspace": 129,
+    "left": 130,
+    "up": 131,
+    "right": 132,
+    "down": 133,
+    "home": 134,
+    "end": 135,
+    "pageup": 136,
+    "pagedown": 137,
+    "insert": 138,
+    "delete": 139,
+    "esc": 140,
+    **{f"f{n}": 140 + n for n in range(1, 13)},
+}
+
+
+class KeyboardError(ValueError):
+    def __init__(self, line: int, message: str):
+        msg = f"Keyboard script line {line}: {message}"
+        super(KeyboardError, self).__init__(msg)
+        self.line = line
+
+
+class KeyEvent(NamedTuple):
+    cycle: int
+    code: int
+
+
+def key_code(key: str) -> Optional[int]:
+    if len(key) == 1:
+        return ord(key) if 32 < ord(key) < 127 else None
+    if key.isdigit():
+        return int(key) if int(key) <= 0xFFFF else None
+    return KEY_CODES.get(key.lower())
+
+
+class Keyboard:
+    __slots__ = "__cycles", "__codes", "__applied"
+
+    def __init__(self, events: Iterable[KeyEvent]):
+        # Events on the same cycle keep their order, so the last one wins
+        ordered = sorted(events, key=lambda event: event.cycle)
+        self.__cycles = [event.cycle for event in ordered]
+        self.__codes = [event.code for event in ordered]
+        self.__applied = 0
+
+    @classmethod
+    def parse(cls, text: str) -> "Keyboard":
+        # One `cycle key` pair per line: a character, a key name or a code,
+        # with `none` releasing every key
+        events: List[KeyEvent] = []
+        for num, line in enumerate(text.splitlines(), 1):
+            if "#" in line:
+                line = line[: line.index("#")]
+            words = line.split()
+            if not words:
+                continue
+            if len(words) != 2 or not words[0].isdigit():
+                raise KeyboardError(num, f"Expected `cycle key`: {line.strip()}")
+
+            code = key_code(words[1])
+            if code is None:
+                raise KeyboardError(num, f"Unknown key: {words[1]}")
+            events.append(KeyEvent(int(words[0]), code))
+
+        return cls(events)
+
+    @property
+    def events(self) -> List[KeyEvent]:
+        return [KeyEvent(*event) for event in zip(self.__cycles, self.__codes)]
+
+    def next_cycle(self, cycle: int) -> Optional[int]:
+        idx = bisect_right(self.__cycles, cycle)
+        return self.__cycles[idx] if idx < len(self.__cycles) else None
+
+    def apply(self, cycle: int, memory: Memory) -> None:
+        # KBD only changes when an event boundary is crossed, so programs
+        # may still write to it in between; a restore to an earlier cycle
+        # moves the boundary back
+        idx = bisect_right(self.__cycles, cycle)
+        if idx != self.__applied:
+            memory[KBD] = self.__codes[idx - 1] if idx else 0
+            self.__applied = idx
@@ -0,0 +1,161 @@
+import json
+from array import array
+from typing import Dict, List, Sequence, Tuple
+
+from pyasm.coder import SymbolTable
+
+OBJECT_VERSION = 1
+ROM_SIZE = 32768
+
+
+class LinkError(ValueError):
+    pass
+
+
+class ObjectModule:
+    __slots__ = "__name", "__words", "__labels", "__local", "__externs"
+
+    def __init__(
+        self,
+        name: str,
+        words: Sequence[int],
+        labels: Dict[str, int],
+        local: Sequence[int],
+        externs: Sequence[Tuple[int, str]],
+    ):
+        self.__name = name
+        self.__words = array("H", words)
+        self.__labels = dict(labels)
+        # Addresses of words holding a module-relative label address
+        self.__local = array("H", local)
+        # Addresses of words naming a symbol this module does not define
+        self.__externs = [(address, symbol) for address, symbol in externs]
+
+    def __len__(self) -> int:
+        return len(self.__words)
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def words(self) -> array:
+        return self.__words
+
+    @property
+    def labels(self) -> Dict[str, int]:
+        return self.__labels
+
+    @property
+    def local(self) -> array:
+        return self.__local
+
+    @property
+    def externs(self) -> List[Tuple[int, str]]:
+        return self.__externs
+
+    def dump(self) -> str:
+        return json.dumps(
+            {
+                "version": OBJECT_VERSION,
+                "module": self.__name,
+                "words": self.__words.tolist(),
+                "labels": self.__labels,
+                "local": self.__local.tolist(),
+                "extern": self.__externs,
+            }
+        )
+
+    @classmethod
+    def load(cls, text: str) -> "ObjectModule":
+        try:
+            data = json.loads(text)
+            version = data["version"]
+            fields = (
+                data["module"],
+                data["words"],
+                data["labels"],
+                data["local"],
+                data["extern"],
+            )
+        except (ValueError, KeyError, TypeError) as err:
+            raise LinkError(f"Not an object file: {err}")
+
+        if version != OBJECT_VERSION:
+            raise LinkError(f"Unsupported object file version: {version}")
+        _check_fields(*fields)
+
+        return cls(*fields)
+
+
+def _is_int(value: object) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_fields(
+    name: object, words: object, labels: object, local: object, externs: object
+) -> None:
+    # Everything link indexes or adds to, so a damaged object is a LinkError
+    if not isinstance(name, str):
+        raise LinkError("Not an object file: the module name is not a string")
+    if not isinstance(words, list) or not all(
+        _is_int(word) and 0 <= word <= 0xFFFF for word in words
+    ):
+        raise LinkError(f"Not an object file: {name} has words out of range")
+    size = len(words)
+    if not isinstance(labels, dict) or not all(
+        _is_int(address) and 0 <= address <= size for address in labels.values()
+    ):
+        raise LinkError(f"Not an object file: {name} has labels out of range")
+    if not isinstance(local, list) or not all(
+        _is_int(address) and 0 <= address < size and words[address] <= size
+        for address in local
+    ):
+        raise LinkError(f"Not an object file: {name} has local words out of range")
+    if not isinstance(externs, list) or not all(
+        isinstance(entry, list)
+        and len(entry) == 2
+        and _is_int(entry[0])
+        and 0 <= entry[0] < size
+        and isinstance(entry[1], str)
+        for entry in externs
+    ):
+        raise LinkError(f"Not an object file: {name} has invalid externs")
+
+
+def link(modules: Sequence[ObjectModule]) -> List[str]:
+    # The first definition of a label is the exported one, as when the
+    # sources are concatenated
+    exports = SymbolTable()
+    bases = []
+    base = 0
+    for module in modules:
+        bases.append(base)
+        for label, address in module.labels.items():
+            if exports.get(label) is None:
+                exports[label] = base + address
+        base += len(module)
+
+    if base > ROM_SIZE:
+        raise LinkError(f"Linked program is too large: {base} words")
+
+    # Each module sees its own labels first, then the exports, then variables
+    buffer: List[str] = []
+    for module, base in zip(modules, bases):
+        scope = SymbolTable(exports)
+        for label, address in module.labels.items():
+            scope[label] = base + address
+
+        words = array("H", module.words)
+        for address in module.local:
+            words[address] += base
+        for address, symbol in module.externs:
+            value = scope.get(symbol)
+            if value is None:
+                scope.add_variable(symbol)
+                value = scope[symbol]
+            words[address] = value
+
+        buffer.extend("{:0>16b}".format(word) for word in words)
+
+    return buffer
@@ -0,0 +1,455 @@
+import json
+import re
+from typing import IO, Dict, List, NamedTuple, Optional, Tuple
+
+from pyasm.coder import SymbolTable
+from pyasm.parser import CommandType, Diagnostic, InvalidCommandException, Parser
+
+MAX_CONSTANT = 24576
+
+ERROR = 1
+WARNING = 2
+
+# Kind of each line, one byte per line
+BLANK, C_LINE, A_LINE, LABEL, INVALID, OUT_OF_RANGE = range(6)
+KINDS = {
+    CommandType.C_COMMAND: C_LINE,
+    CommandType.A_COMMAND: A_LINE,
+    CommandType.L_COMMAND: LABEL,
+}
+SIZES = bytes([0, 1, 1, 0, 0, 1]).ljust(256, b"\0")
+LABELS_RE = re.compile(bytes([LABEL]))
+ERRORS_RE = re.compile(bytes([ord("["), INVALID, OUT_OF_RANGE, ord("]")]))
+
+# One parser kept around for its command classification
+_CLASSIFIER = Parser("@0")
+_RESERVED = SymbolTable()
+
+
+class Entry(NamedTuple):
+    command_type: Optional[CommandType]
+    symbol: str
+    column: int
+    error: str
+
+
+class Definition(NamedTuple):
+    line: int
+    address: int
+    is_label: bool
+
+
+def classify(line: str) -> Entry:
+    commands = Parser.process(line)
+    if not commands:
+        return Entry(None, "", 0, "")
+
+    column = len(line) - len(line.lstrip())
+    try:
+        command_type = _CLASSIFIER.command_type(commands[0])
+    except InvalidCommandException as err:
+        return Entry(None, "", column, err.message)
+
+    if command_type is CommandType.C_COMMAND:
+        return Entry(command_type, "", column, "")
+
+    symbol = _CLASSIFIER.symbol
+    error = ""
+    if symbol.isnumeric() and int(symbol) > MAX_CONSTANT:
+        error = f"Address out of range: {symbol}"
+    return Entry(command_type, symbol, column, error)
+
+
+def _key(entry: Entry) -> str:
+    if entry.command_type is CommandType.L_COMMAND:
+        return f"({entry.symbol}"
+    if entry.command_type is CommandType.A_COMMAND:
+        return f"@{entry.symbol}"
+    return ""
+
+
+def _kind(entry: Entry) -> int:
+    command_type = entry.command_type
+    if entry.error:
+        return INVALID if command_type is None else OUT_OF_RANGE
+    if command_type is None:
+        return BLANK
+    return KINDS[command_type]
+
+
+class Index:
+    __slots__ = "__keys", "__labels", "__warnings", "__variables", "__diagnostics"
+
+    def __init__(
+        self,
+        keys: List[str],
+        kinds: bytearray,
+        entries: List[Entry],
+        previous: Optional["Index"] = None,
+    ):
+        # Scans run over the one-byte kind of each line, so the Python loops
+        # only visit labels and errors
+        self.__keys = keys
+        self.__variables: Optional[Dict[str, int]] = None
+        if previous is None:
+            self.__labels: Dict[str, Definition] = {}
+            self.__warnings: List[Diagnostic] = []
+            self.__read_labels(keys, kinds)
+        else:
+            self.__labels = previous.labels
+            self.__warnings = previous.warnings
+
+        # Diagnostics count lines from 1 like the assembler's, with severity
+        diagnostics = [(warning, WARNING) for warning in self.__warnings]
+        for error in ERRORS_RE.finditer(kinds):
+            num = error.start()
+            diagnostics.append((Diagnostic(num + 1, entries[num].error), ERROR))
+        diagnostics.sort()
+        self.__diagnostics = diagnostics
+
+    def __read_labels(self, keys: List[str], kinds: bytearray) -> None:
+        # Labels first, as in the assembler's first pass
+        labels = self.__labels
+        sizes = kinds.translate(SIZES)
+        address = previous = 0
+        for label in LABELS_RE.finditer(kinds):
+            num = label.start()
+            address += sizes.count(1, previous, num)
+            previous = num
+            symbol = keys[num][1:]
+            if symbol in labels:
+                first = labels[symbol].line + 1
+                message = f"Duplicate label {symbol}, first on line {first}"
+                self.__warnings.append(Diagnostic(num + 1, message))
+            elif _RESERVED.get(symbol) is not None:
+                message = f"Label {symbol} is predefined"
+                self.__warnings.append(Diagnostic(num + 1, message))
+            else:
+                labels[symbol] = Definition(num, address, True)
+
+    @property
+    def labels(self) -> Dict[str, Definition]:
+        return self.__labels
+
+    @property
+    def warnings(self) -> List[Diagnostic]:
+        return self.__warnings
+
+    @property
+    def diagnostics(self) -> List[Tuple[Diagnostic, int]]:
+        return self.__diagnostics
+
+    @property
+    def variables(self) -> Dict[str, int]:
+        # Allocated from 16 in order of first use, only when asked for
+        if self.__variables is None:
+            self.__variables = {}
+            address = 16
+            for key in dict.fromkeys(self.__keys):
+                symbol = key[1:]
+                if (
+                    key[:1] != "@"
+                    or symbol.isnumeric()
+                    or symbol in self.__labels
+                    or _RESERVED.get(symbol) is not None
+                ):
+                    continue
+                self.__variables[symbol] = address
+                address += 1
+
+        return self.__variables
+
+    def definition(self, symbol: str) -> Optional[Definition]:
+        definition = self.__labels.get(symbol)
+        if definition is None and symbol in self.variables:
+            line = self.__keys.index(f"@{symbol}")
+            definition = Definition(line, self.variables[symbol], False)
+        return definition
+
+    def references(self, symbol: str) -> List[int]:
+        result = []
+        keys = self.__keys
+        for key in (f"({symbol}", f"@{symbol}"):
+            num = -1
+            while True:
+                try:
+                    num = keys.index(key, num + 1)
+                except ValueError:
+                    break
+                result.append(num)
+
+        result.sort()
+        return result
+
+
+class Document:
+    __slots__ = "__lines", "__entries", "__keys", "__kinds", "__index", "version"
+
+    def __init__(self, text: str, version: int = 0):
+        self.__lines = text.split("\n")
+        self.__entries = [classify(line) for line in self.__lines]
+        self.__keys = [_key(entry) for entry in self.__entries]
+        self.__kinds = bytearray(_kind(entry) for entry in self.__entries)
+        self.__index: Optional[Index] = None
+        self.version = version
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.__lines)
+
+    @property
+    def lines(self) -> List[str]:
+        return self.__lines
+
+    def entry(self, line: int) -> Entry:
+        return self.__entries[line]
+
+    def apply(self, start: Tuple[int, int], end: Tuple[int, int], text: str) -> None:
+        # Only the edited lines are classified again
+        lines = self.__lines
+        (start_line, start_char), (end_line, end_char) = start, end
+        end_line = min(end_line, len(lines) - 1)
+        prefix = lines[start_line][:start_char]
+        suffix = lines[end_line][end_char:]
+        new = (prefix + text + suffix).split("\n")
+        entries = [classify(line) for line in new]
+        kinds = bytes(_kind(entry) for entry in entries)
+
+        edited = slice(start_line, end_line + 1)
+        old_kinds = self.__kinds[edited]
+        lines[edited] = new
+        self.__entries[edited] = entries
+        self.__keys[edited] = [_key(entry) for entry in entries]
+        self.__kinds[edited] = kinds
+
+        # Edits that keep every line in place and touch no label leave the
+        # label addresses alone
+        previous = self.__index
+        if previous is not None and not (
+            len(old_kinds) == len(kinds)
+            and LABEL not in old_kinds
+            and LABEL not in kinds
+            and old_kinds.translate(SIZES) == kinds.translate(SIZES)
+        ):
+            previous = None
+        self.__index = Index(self.__keys, self.__kinds, self.__entries, previous)
+
+    @property
+    def index(self) -> Index:
+        if self.__index is None:
+            self.__index = Index(self.__keys, self.__kinds, self.__entries)
+        return self.__index
+
+    def symbol_at(self, line: int) -> str:
+        if not 0 <= line < len(self.__entries):
+            return ""
+        entry = self.__entries[line]
+        if entry.symbol.isnumeric():
+            return ""
+        return entry.symbol
+
+    def definition(self, line: int) -> Optional[Definition]:
+        return self.index.definition(self.symbol_at(line))
+
+    def references(self, line: int) -> List[int]:
+        symbol = self.symbol_at(line)
+        return self.index.references(symbol) if symbol else []
+
+    def span(self, line: int) -> Tuple[int, int]:
+        return self.__entries[line].column, len(self.__lines[line].rstrip())
+
+    def hover(self, line: int) -> str:
+        symbol = self.symbol_at(line)
+        if not symbol:
+            return ""
+
+        reserved = _RESERVED.get(symbol)
+        if reserved is not None:
+            return f"{symbol}: predefined, RAM[{reserved}]"
+
+        definition = self.index.definition(symbol)
+        if definition is None:
+            return ""
+        if definition.is_label:
+            return f"{symbol}: label, ROM[{definition.address}]"
+        return f"{symbol}: variable, RAM[{definition.address}]"
+
+
+def _range(line: int, start: int, end: int) -> dict:
+    return {
+        "start": {"line": line, "character": start},
+        "end": {"line": line, "character": end},
+    }
+
+
+class LanguageServer:
+    __slots__ = "__reader", "__writer", "__documents", "__shutdown"
+
+    def __init__(self, reader: IO[bytes], writer: IO[bytes]):
+        self.__reader = reader
+        self.__writer = writer
+        self.__documents: Dict[str, Document] = {}
+        self.__shutdown = False
+
+    @property
+    def documents(self) -> Dict[str, Document]:
+        return self.__documents
+
+    def read(self) -> Optional[dict]:
+        length = None
+        while True:
+            header = self.__reader.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.decode("ascii").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+
+        if length is None:
+            return None
+        return json.loads(self.__reader.read(length))
+
+    def send(self, message: dict) -> None:
+        body = json.dumps(message).encode()
+        self.__writer.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        self.__writer.flush()
+
+    def __reject(self, code: int, message: str) -> None:
+        # Nothing readable, so no id to answer to
+        error = {"code": code, "message": message}
+        self.send({"jsonrpc": "2.0", "id": None, "error": error})
+
+    def serve(self) -> int:
+        while True:
+            try:
+                message = self.read()
+            except ValueError as err:
+                self.__reject(-32700, f"Parse error: {err}")
+                continue
+            if message is None:
+                return 1
+            if not isinstance(message, dict):
+                self.__reject(-32600, "Invalid request: not an object")
+                continue
+            if message.get("method") == "exit":
+                return 0 if self.__shutdown else 1
+
+            # One bad message gets an error back rather than ending the session
+            try:
+                response = self.handle(message)
+            except Exception as err:
+                response = None
+                if "id" in message:
+                    response = {
+                        "jsonrpc": "2.0",
+                        "id": message["id"],
+                        "error": {"code": -32603, "message": f"{err!r}"},
+                    }
+            if response is not None:
+                self.send(response)
+
+    def __publish(self, uri: str) -> None:
+        document = self.__documents.get(uri)
+        diagnostics = []
+        if document is not None:
+            diagnostics = [
+                {
+                    "range": _range(d.line - 1, *document.span(d.line - 1)),
+                    "severity": severity,
+                    "source": "pyasm",
+                    "message": d.message,
+                }
+                for d, severity in document.index.diagnostics
+            ]
+        self.send(
+            {
+                "jsonrpc": "2.0",
+                "method": "textDocument/publishDiagnostics",
+                "params": {"uri": uri, "diagnostics": diagnostics},
+            }
+        )
+
+    def __location(self, uri: str, document: Document, line: int) -> dict:
+        return {"uri": uri, "range": _range(line, *document.span(line))}
+
+    def __change(self, uri: str, params: dict) -> None:
+        document = self.__documents[uri]
+        for change in params["contentChanges"]:
+            if "range" in change:
+                start, end = change["range"]["start"], change["range"]["end"]
+                document.apply(
+                    (start["line"], start["character"]),
+                    (end["line"], end["character"]),
+                    change["text"],
+                )
+            else:
+                document = Document(change["text"])
+                self.__documents[uri] = document
+        document.version = params["textDocument"].get("version", document.version)
+        self.__publish(uri)
+
+    def handle(self, message: dict) -> Optional[dict]:
+        method = message.get("method")
+        params = message.get("params") or {}
+        result: object = None
+
+        if method == "initialize":
+            result = {
+                "capabilities": {
+                    "textDocumentSync": {"openClose": True, "change": 2},
+                    "definitionProvider": True,
+                    "referencesProvider": True,
+                    "hoverProvider": True,
+                },
+                "serverInfo": {"name": "pyasm"},
+            }
+        elif method == "shutdown":
+            self.__shutdown = True
+        elif method == "textDocument/didOpen":
+            doc = params["textDocument"]
+            self.__documents[doc["uri"]] = Document(doc["text"], doc.get("version", 0))
+            self.__publish(doc["uri"])
+        elif method == "textDocument/didChange":
+            # Changes to documents that were never opened are ignored
+            uri = params["textDocument"]["uri"]
+            if uri in self.__documents:
+                self.__change(uri, params)
+        elif method == "textDocument/didClose":
+            uri = params["textDocument"]["uri"]
+            self.__documents.pop(uri, None)
+            self.__publish(uri)
+        elif method in (
+            "textDocument/definition",
+            "textDocument/references",
+            "textDocument/hover",
+        ):
+            uri = params["textDocument"]["uri"]
+            document = self.__documents.get(uri)
+            line = params["position"]["line"]
+            if document is not None:
+                if method == "textDocument/definition":
+                    definition = document.definition(line)
+                    if definition is not None:
+                        result = self.__location(uri, document, definition.line)
+                elif method == "textDocument/references":
+                    result = [
+                        self.__location(uri, document, ref)
+                        for ref in document.references(line)
+                    ]
+                else:
+                    text = document.hover(line)
+                    if text:
+                        result = {"contents": {"kind": "plaintext", "value": text}}
+        elif "id" in message and method is not None:
+            return {
+                "jsonrpc": "2.0",
+                "id": message["id"],
+                "error": {"code": -32601, "message": f"Unknown method: {method}"},
+            }
+
+        if "id" not in message:
+            return None
+        return {"jsonrpc": "2.0", "id": message["id"], "result": result}
@@ -0,0 +1,562 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+
+from pyasm.coder import Coder, SymbolTable
+from pyasm.parser import CommandType, Instruction, Parser
+from pyasm.simulator import ALU, wrap
+from pyasm.superopt import Rule
+
+A_COMMAND = CommandType.A_COMMAND
+L_COMMAND = CommandType.L_COMMAND
+C_COMMAND = CommandType.C_COMMAND
+
+# Largest constant the assembler accepts in an A command
+MAX_CONSTANT = 24576
+
+# Comps of the form f(D) that stay legal when D is replaced by A or M
+UNARY_D = {"D": "{}", "D+1": "{}+1", "D-1": "{}-1", "!D": "!{}", "-D": "-{}"}
+
+_RESERVED = SymbolTable()
+
+
+def _address_key(symbol: str) -> str:
+    # Numbers and reserved symbols name the same address in any spelling
+    if symbol.isnumeric():
+        return str(int(symbol))
+
+    reserved = _RESERVED.get(symbol)
+    return symbol if reserved is None else str(reserved)
+
+
+def _dest(registers: str) -> str:
+    return "".join(r for r in "AMD" if r in registers)
+
+
+def _is_jump(instruction: Instruction) -> bool:
+    return instruction.command_type is C_COMMAND and instruction.jmp != ""
+
+
+def _is_goto(instruction: Instruction) -> bool:
+    return instruction.command_type is C_COMMAND and instruction.jmp == "JMP"
+
+
+def has_literal_jump_targets(
+    instructions: List[Instruction], indirect: bool = False
+) -> bool:
+    # Code that jumps anywhere but a label breaks if anything moves. A holds
+    # a label, a literal address, or a value computed into it; jumps through
+    # computed values are allowed when the caller knows they hold labels
+    labels = {i.symbol for i in instructions if i.command_type is L_COMMAND}
+    labels = {label for label in labels if _RESERVED.get(label) is None}
+    loaded = "literal"
+    for instruction in instructions:
+        if instruction.command_type is A_COMMAND:
+            loaded = "label" if instruction.symbol in labels else "literal"
+        elif instruction.command_type is C_COMMAND:
+            if instruction.jmp and loaded != "label":
+                if loaded != "computed" or not indirect:
+                    return True
+            if instruction.jmp == "JMP":
+                # Whatever runs next was jumped to, so A holds its label
+                loaded = "label"
+            elif "A" in instruction.dest:
+                loaded = "computed"
+
+    return False
+
+
+def remove_redundant_loads(instructions: List[Instruction]) -> List[Instruction]:
+    result = []
+    loaded: Optional[str] = None
+    for instruction in instructions:
+        if instruction.command_type is L_COMMAND:
+            loaded = None
+        elif instruction.command_type is A_COMMAND:
+            key = _address_key(instruction.symbol)
+            if key == loaded:
+                continue
+            loaded = key
+        elif "A" in instruction.dest:
+            loaded = None
+
+        result.append(instruction)
+
+    return result
+
+
+def remove_unreachable(instructions: List[Instruction]) -> List[Instruction]:
+    result = []
+    reachable = True
+    for instruction in instructions:
+        if instruction.command_type is L_COMMAND:
+            reachable = True
+        if reachable:
+            result.append(instruction)
+        if _is_goto(instruction):
+            reachable = False
+
+    return result
+
+
+def remove_jumps_to_next(instructions: List[Instruction]) -> List[Instruction]:
+    # `@L` and `0;JMP` straight into `(L)`, when the code there reloads A
+    result = []
+    skip = 0
+    for idx, instruction in enumerate(instructions):
+        if skip:
+            skip -= 1
+            continue
+
+        if instruction.command_type is A_COMMAND and idx + 1 < len(instructions):
+            jump = instructions[idx + 1]
+            end = idx + 2
+            while end < len(instructions) and (
+                instructions[end].command_type is L_COMMAND
+            ):
+                end += 1
+
+            following = {i.symbol for i in instructions[idx + 2 : end]}
+            if (
+                _is_goto(jump)
+                and jump.dest == ""
+                and "M" not in jump.comp
+                and instruction.symbol in following
+                and end < len(instructions)
+                and instructions[end].command_type is A_COMMAND
+            ):
+                skip = 1
+                continue
+
+        result.append(instruction)
+
+    return result
+
+
+def remove_dead_labels(instructions: List[Instruction]) -> List[Instruction]:
+    # An unreferenced label after a goto only keeps dead code alive
+    referenced = {i.symbol for i in instructions if i.command_type is A_COMMAND}
+    result: List[Instruction] = []
+    for instruction in instructions:
+        if (
+            instruction.command_type is L_COMMAND
+            and instruction.symbol not in referenced
+            and result
+            and _is_goto(result[-1])
+        ):
+            continue
+        result.append(instruction)
+
+    return result
+
+
+def _trampolines(instructions: List[Instruction]) -> Dict[str, str]:
+    # Labels whose first instructions are `@TARGET` and `0;JMP`
+    labels = {i.symbol for i in instructions if i.command_type is L_COMMAND}
+    targets = {}
+    pending: List[str] = []
+    for idx, instruction in enumerate(instructions):
+        if instruction.command_type is L_COMMAND:
+            pending.append(instruction.symbol)
+            continue
+
+        if pending and instruction.command_type is A_COMMAND:
+            following = instructions[idx + 1 : idx + 2]
+            if (
+                instruction.symbol in labels
+                and following
+                and following[0].comp == "0"
+                and following[0].dest == ""
+                and _is_goto(following[0])
+            ):
+                for label in pending:
+                    if label != instruction.symbol:
+                        targets[label] = instruction.symbol
+        pending = []
+
+    # Collapse chains, leaving cycles alone
+    resolved = {}
+    for label in targets:
+        seen = {label}
+        target = targets[label]
+        while target in targets and target not in seen:
+            seen.add(target)
+            target = targets[target]
+        if target not in seen:
+            resolved[label] = target
+
+    return resolved
+
+
+def thread_jumps(instructions: List[Instruction]) -> List[Instruction]:
+    trampolines = _trampolines(instructions)
+    if not trampolines:
+        return list(instructions)
+
+    result = list(instructions)
+    for idx, instruction in enumerate(instructions[:-1]):
+        target = trampolines.get(instruction.symbol)
+        if instruction.command_type is not A_COMMAND or target is None:
+            continue
+
+        # The jump must not read or write A or M, which still hold the old label
+        jump = instructions[idx + 1]
+        registers = jump.dest + jump.comp
+        if not _is_jump(jump) or "A" in registers or "M" in registers:
+            continue
+
+        # A conditional jump falls through with A holding the new target
+        after = instructions[idx + 2 : idx + 3]
+        if jump.jmp != "JMP" and not (after and after[0].command_type is A_COMMAND):
+            continue
+
+        result[idx] = instruction._replace(symbol=target)
+
+    return result
+
+
+def fuse(instructions: List[Instruction]) -> List[Instruction]:
+    result: List[Instruction] = []
+    comps = Coder.get_comp_table()
+    for instruction in instructions:
+        prev = result[-1] if result else None
+        if instruction.command_type is not C_COMMAND:
+            result.append(instruction)
+            continue
+
+        # D=D, A=A and M=M change nothing
+        if instruction.dest == instruction.comp and not instruction.jmp:
+            continue
+
+        if prev is None or prev.command_type is not C_COMMAND or prev.jmp:
+            result.append(instruction)
+            continue
+
+        # D=X then dest=f(D) becomes dest=f(X)
+        template = UNARY_D.get(instruction.comp)
+        if prev.dest == "D" and prev.comp in ("A", "M") and template is not None:
+            comp = template.format(prev.comp)
+            if instruction.comp == "D":
+                dest = _dest(instruction.dest + "D")
+            elif "D" in instruction.dest:
+                dest = instruction.dest
+            else:
+                dest = ""
+
+            if dest and comp in comps:
+                result[-1] = instruction._replace(dest=dest, comp=comp)
+                continue
+
+        # dest=X with M in dest then D=M reads back what was just written
+        if (
+            instruction.dest == "D"
+            and instruction.comp == "M"
+            and not instruction.jmp
+            and "M" in prev.dest
+            and "A" not in prev.dest
+        ):
+            result[-1] = prev._replace(dest=_dest(prev.dest + "D"))
+            continue
+
+        result.append(instruction)
+
+    return result
+
+
+def _constant(symbol: str) -> Optional[int]:
+    if symbol.isnumeric():
+        return int(symbol)
+
+    return _RESERVED.get(symbol)
+
+
+def _evaluate(comp: str, a: Optional[int], d: Optional[int]) -> Optional[int]:
+    if "M" in comp or ("A" in comp and a is None) or ("D" in comp and d is None):
+        return None
+
+    bits = int(Coder.translate_comp(comp)[1:], 2)
+    return wrap(ALU[bits](d or 0, a or 0))
+
+
+def _jumps(jmp: str, value: int) -> bool:
+    code = int(Coder.translate_jmp(jmp), 2)
+    return bool((code >> ((value < 0) * 2 + (value == 0))) & 1)
+
+
+def _reads(instruction: Instruction) -> Set[str]:
+    if instruction.command_type is A_COMMAND:
+        return set()
+
+    reads = {"D"} if "D" in instruction.comp else set()
+    if (
+        "A" in instruction.comp
+        or "M" in instruction.comp
+        or "M" in instruction.dest
+        or instruction.jmp
+    ):
+        reads.add("A")
+
+    return reads
+
+
+def _writes(instruction: Instruction) -> Set[str]:
+    if instruction.command_type is A_COMMAND:
+        return {"A"}
+
+    return {r for r in instruction.dest if r in "AD"}
+
+
+def _has_effect(instruction: Instruction) -> bool:
+    # Memory writes and jumps always matter, register writes only when live
+    return instruction.command_type is C_COMMAND and (
+        "M" in instruction.dest or instruction.jmp != ""
+    )
+
+
+def _blocks(instructions: List[Instruction]) -> Iterator[List[Instruction]]:
+    # Straight-line runs that end before a label or after a jump
+    block: List[Instruction] = []
+    for instruction in instructions:
+        if instruction.command_type is L_COMMAND:
+            if block:
+                yield block
+            yield [instruction]
+            block = []
+            continue
+
+        block.append(instruction)
+        if _is_jump(instruction):
+            yield block
+            block = []
+
+    if block:
+        yield block
+
+
+def _live_after(block: List[Instruction]) -> List[Set[str]]:
+    # A and D are assumed live when the block is left
+    live = {"A", "D"}
+    result = []
+    for instruction in reversed(block):
+        result.append(live)
+        live = (live - _writes(instruction)) | _reads(instruction)
+
+    result.reverse()
+    return result
+
+
+def _variables(instructions: List[Instruction]) -> List[str]:
+    # Variables in the order the assembler allocates them, by first mention
+    labels = {i.symbol for i in instructions if i.command_type is L_COMMAND}
+    seen: Dict[str, None] = {}
+    for instruction in instructions:
+        symbol = instruction.symbol
+        if (
+            instruction.command_type is A_COMMAND
+            and symbol not in labels
+            and _constant(symbol) is None
+        ):
+            seen.setdefault(symbol)
+
+    return list(seen)
+
+
+def _eliminate_dead(block: List[Instruction], pinned: Set[str]) -> List[Instruction]:
+    # The first mention of a pinned variable allocates it, which is an effect
+    first = set()
+    mentioned = set()
+    for idx, instruction in enumerate(block):
+        symbol = instruction.symbol
+        if instruction.command_type is A_COMMAND and symbol in pinned:
+            if symbol not in mentioned:
+                first.add(idx)
+                mentioned.add(symbol)
+
+    live = {"A", "D"}
+    result = []
+    for idx in range(len(block) - 1, -1, -1):
+        instruction = block[idx]
+        writes = _writes(instruction)
+        if not _has_effect(instruction) and not writes & live and idx not in first:
+            continue
+
+        live = (live - writes) | _reads(instruction)
+        result.append(instruction)
+
+    result.reverse()
+    return result
+
+
+def _propagate(block: List[Instruction], load_constants: bool) -> List[Instruction]:
+    live = _live_after(block)
+    a: Optional[int] = None
+    d: Optional[int] = None
+    result = []
+    for idx, instruction in enumerate(block):
+        if instruction.command_type is A_COMMAND:
+            constant = _constant(instruction.symbol)
+            if constant is None or constant != a:
+                a = constant
+                result.append(instruction)
+            continue
+
+        value = _evaluate(instruction.comp, a, d)
+        if value is not None:
+            # Registers that already hold the value need no write
+            known = {"A": a, "D": d}
+            if (
+                not instruction.jmp
+                and "M" not in instruction.dest
+                and all(known[r] == value for r in instruction.dest)
+            ):
+                continue
+
+            if instruction.jmp:
+                jmp = "JMP" if _jumps(instruction.jmp, value) else ""
+                instruction = instruction._replace(jmp=jmp)
+                if not instruction.dest and not jmp:
+                    continue
+
+            if value in (0, 1, -1):
+                instruction = instruction._replace(comp=str(value))
+            elif (
+                load_constants
+                and instruction.comp not in ("A", "-A")
+                and not instruction.jmp
+                and "M" not in instruction.dest
+                and ("A" in instruction.dest or "A" not in live[idx])
+                and abs(value) <= MAX_CONSTANT
+            ):
+                # dest=<expr> becomes @|value| and dest=A or dest=-A
+                a = abs(value)
+                result.append(Instruction(A_COMMAND, str(a), line=instruction.line))
+                instruction = instruction._replace(comp="A" if value > 0 else "-A")
+
+        if "A" in instruction.dest:
+            a = value
+        if "D" in instruction.dest:
+            d = value
+        result.append(instruction)
+
+    return result
+
+
+def _fold_block(
+    block: List[Instruction], load_constants: bool, pinned: Set[str]
+) -> List[Instruction]:
+    while True:
+        folded = _eliminate_dead(_propagate(block, load_constants), pinned)
+        if folded == block:
+            return folded
+        block = folded
+
+
+def fold_constants(instructions: List[Instruction]) -> List[Instruction]:
+    # Variables not mentioned before a block are pinned to their first
+    # mention in it, so they keep their addresses
+    pinned = set(_variables(instructions))
+    result = []
+    for block in _blocks(instructions):
+        if block[0].command_type is L_COMMAND:
+            result.extend(block)
+            continue
+
+        # Loading a folded constant costs an instruction, keep it only if the
+        # computation it replaces disappears
+        folded = _fold_block(block, True, pinned)
+        if len(folded) >= len(block):
+            folded = _fold_block(block, False, pinned)
+            if len(folded) > len(block):
+                folded = block
+
+        result.extend(folded)
+        pinned.difference_update(i.symbol for i in block)
+
+    return result
+
+
+def apply_rules(
+    instructions: List[Instruction], rules: Sequence[Rule]
+) -> List[Instruction]:
+    # Rewrites found by the superoptimizer; registers a rule leaves
+    # unspecified must be dead after the matched window
+    by_first: Dict[str, List[Rule]] = {}
+    for rule in rules:
+        if rule.pattern:
+            by_first.setdefault(rule.pattern[0], []).append(rule)
+
+    result: List[Instruction] = []
+    for block in _blocks(instructions):
+        texts = [str(instruction) for instruction in block]
+        live = _live_after(block)
+        idx = 0
+        while idx < len(block):
+            for rule in by_first.get(texts[idx], ()):
+                end = idx + len(rule.pattern)
+                if tuple(texts[idx:end]) == rule.pattern and not (
+                    set(rule.ignore) & live[end - 1]
+                ):
+                    line = block[idx].line
+                    if rule.replacement:
+                        replacement = Parser("\n".join(rule.replacement))
+                        result.extend(
+                            instruction._replace(line=line)
+                            for instruction in replacement.instructions()
+                        )
+                    idx = end
+                    break
+            else:
+                result.append(block[idx])
+                idx += 1
+
+    return result
+
+
+PASSES = (
+    remove_redundant_loads,
+    remove_unreachable,
+    remove_jumps_to_next,
+    remove_dead_labels,
+    thread_jumps,
+    fuse,
+    fold_constants,
+)
+
+
+def optimize(
+    instructions: List[Instruction],
+    rules: Sequence[Rule] = (),
+    indirect_jumps: bool = False,
+) -> List[Instruction]:
+    # With indirect_jumps, jumps through A=M or A=D are trusted to reach
+    # labels only, as in translated VM code
+    if has_literal_jump_targets(instructions, indirect_jumps):
+        return list(instructions)
+
+    result = list(instructions)
+    while True:
+        previous = result
+        # Proven rewrites go first, before fusion changes their windows
+        if rules:
+            result = apply_rules(result, rules)
+        for optimization in PASSES:
+            result = optimization(result)
+        if result == previous:
+            return _pin_variables(instructions, result)
+
+
+def _pin_variables(
+    original: List[Instruction], optimized: List[Instruction]
+) -> List[Instruction]:
+    # Dropping the first mention of a variable, e.g. in unreachable code,
+    # moves the ones after it; those are then loaded by address instead
+    variables = _variables(original)
+    kept = _variables(optimized)
+    if kept == variables[: len(kept)]:
+        return optimized
+
+    addresses = {symbol: str(16 + idx) for idx, symbol in enumerate(variables)}
+    return [
+        i._replace(symbol=addresses[i.symbol])
+        if i.command_type is A_COMMAND and i.symbol in addresses
+        else i
+        for i in optimized
+    ]
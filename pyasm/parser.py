@@ -1,7 +1,7 @@
 import re
 from enum import Enum
 from functools import lru_cache
-from typing import List, Optional
+from typing import List, NamedTuple, Optional, Tuple
 
 
 class CommandType(Enum):
@@ -19,6 +19,29 @@ class InvalidCommandException(Exception):
         super(InvalidCommandException, self).__init__(self.message)
 
 
+class Diagnostic(NamedTuple):
+    line: int
+    message: str
+
+
+class Instruction(NamedTuple):
+    command_type: CommandType
+    symbol: str = ""
+    dest: str = ""
+    comp: str = ""
+    jmp: str = ""
+    line: int = 0
+
+    def __str__(self) -> str:
+        if self.command_type is CommandType.A_COMMAND:
+            return f"@{self.symbol}"
+        if self.command_type is CommandType.L_COMMAND:
+            return f"({self.symbol})"
+
+        command = f"{self.dest}={self.comp}" if self.dest else self.comp
+        return f"{command};{self.jmp}" if self.jmp else command
+
+
 @lru_cache(maxsize=1)
 def generate_possible_c_commands():
     possible_comps = [
@@ -90,19 +113,25 @@ def generate_possible_c_commands():
     return set(result)
 
 
+def _c_fields(command: str) -> Tuple[str, str, str]:
+    dest, _, rest = command.rpartition("=")
+    comp, _, jmp = rest.partition(";")
+    return dest, comp, jmp
+
+
 POSSIBLE_C_COMMANDS = generate_possible_c_commands()
+# dest, comp and jmp of every valid C-command, so parsing one is a lookup
+C_COMMAND_FIELDS = {command: _c_fields(command) for command in POSSIBLE_C_COMMANDS}
 
 
 class Parser:
-    COMMENT_RE = re.compile(r"\s*//.*\n?")
-    NEWLINE_RE = re.compile(r"(?:\n){2,}")
-
     A_COMMAND_RE = re.compile(r"^@([^-][\w\d.]*)$")
     L_COMMAND_RE = re.compile(r"^\(([A-Za-z].*)\)$")
 
     __slots__ = (
-        "__raw_txt",
         "__lines",
+        "__line_nums",
+        "__columns",
         "__counter",
         "__line_idx",
         "__num_lines",
@@ -114,11 +143,11 @@ class Parser:
     )
 
     def __init__(self, raw_text: str):
-        self.__raw_txt = raw_text
         self.__counter = 0
         self.__line_idx = 0
 
-        self.__lines: List[str] = Parser.process(raw_text)
+        processed = Parser.process_with_lines(raw_text)
+        self.__lines, self.__line_nums, self.__columns = processed
         self.__num_lines = len(self.__lines)
         if self.__num_lines < 1:
             raise ValueError("The input must contain some code")
@@ -131,14 +160,26 @@ class Parser:
 
     @staticmethod
     def process(txt: str) -> List[str]:
-        # Remove comments and trailing whitespace
-        txt = Parser.COMMENT_RE.sub("\n", txt).strip()
+        return Parser.process_with_lines(txt)[0]
 
-        # Remove multiple '\n' to a single '\n'
-        txt = Parser.NEWLINE_RE.sub("\n", txt)
-        txt = txt.replace(" ", "")
-
-        return [x.strip() for x in txt.splitlines()]
+    @staticmethod
+    def process_with_lines(txt: str) -> Tuple[List[str], List[int], List[int]]:
+        # Clean each line, keeping the 1-based source line and column of every
+        # command
+        lines: List[str] = []
+        line_nums: List[int] = []
+        columns: List[int] = []
+        for line_num, line in enumerate(txt.splitlines(), 1):
+            if "//" in line:
+                line = line[: line.index("//")]
+
+            command = line.replace(" ", "").strip()
+            if command:
+                lines.append(command)
+                line_nums.append(line_num)
+                columns.append(len(line) - len(line.lstrip()) + 1)
+
+        return lines, line_nums, columns
 
     def _reset_counters(self) -> None:
         self.__counter = 0
@@ -155,6 +196,50 @@ class Parser:
         self._reset_counters()
         self._reset_symbols()
 
+    def instructions(
+        self, errors: Optional[List[Diagnostic]] = None
+    ) -> List[Instruction]:
+        # With an errors list, invalid commands are recorded and stand in as
+        # `@0`, so the addresses after them stay correct; a bad label takes
+        # no address and is only recorded. The first character tells the
+        # command types apart, so each command is matched once rather than
+        # going through command_type
+        self.reset()
+        a_match, l_match = Parser.A_COMMAND_RE.match, Parser.L_COMMAND_RE.match
+        fields = C_COMMAND_FIELDS
+        a_command, l_command = CommandType.A_COMMAND, CommandType.L_COMMAND
+        c_command = CommandType.C_COMMAND
+        result: List[Instruction] = []
+        append = result.append
+        for command, line in zip(self.__lines, self.__line_nums):
+            head = command[0]
+            if head == "@":
+                match = a_match(command)
+                if match:
+                    append(Instruction(a_command, match.group(1), line=line))
+                    continue
+            elif head == "(":
+                match = l_match(command)
+                if match:
+                    append(Instruction(l_command, match.group(1), line=line))
+                    continue
+            else:
+                c_fields = fields.get(command.upper())
+                if c_fields is not None:
+                    append(Instruction(c_command, "", *c_fields, line))
+                    continue
+
+            err = InvalidCommandException(command.upper())
+            if errors is None:
+                # Left on the bad command, for source_line
+                self.__counter = self.__line_nums.index(line)
+                raise err
+            errors.append(Diagnostic(line, err.message))
+            if head != "(":
+                append(Instruction(a_command, "0", line=line))
+
+        return result
+
     def has_more_commands(self) -> bool:
         return self.__counter < self.__num_lines
 
@@ -172,6 +257,24 @@ class Parser:
     def line_idx(self):
         return self.__line_idx
 
+    @property
+    def line_numbers(self) -> List[int]:
+        return self.__line_nums
+
+    @property
+    def source_line(self) -> int:
+        if not self.has_more_commands():
+            raise ValueError("No more commands")
+
+        return self.__line_nums[self.__counter]
+
+    @property
+    def source_column(self) -> int:
+        if not self.has_more_commands():
+            raise ValueError("No more commands")
+
+        return self.__columns[self.__counter]
+
     @property
     def current_command(self) -> str:
         if not self.has_more_commands():
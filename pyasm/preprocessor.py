@@ -0,0 +1,240 @@
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+INCLUDE_RE = re.compile(r'^#include\s+"([^"]+)"$')
+DEFINE_RE = re.compile(r"^#define\s+([A-Za-z_][\w.]*)(\([^)]*\))?(?:\s+(.*))?$")
+CALL_RE = re.compile(r"^([A-Za-z_][\w.]*)\((.*)\)$")
+WORD_RE = re.compile(r"[A-Za-z_.$:][\w.$:]*")
+END = "#end"
+
+# Replaced by a number unique to each macro expansion, for local labels
+LOCAL_MARK = "%%"
+MAX_DEPTH = 64
+
+
+class Origin(NamedTuple):
+    file: str
+    line: int
+
+    def __str__(self) -> str:
+        return f"{self.file}:{self.line}"
+
+
+class PreprocessorError(ValueError):
+    def __init__(self, origin: Origin, message: str):
+        msg = f"{origin}: {message}"
+        super(PreprocessorError, self).__init__(msg)
+        self.origin = origin
+        self.message = message
+
+
+class Macro(NamedTuple):
+    params: Tuple[str, ...]
+    body: Tuple[Tuple[str, Origin], ...]
+
+
+Line = Tuple[str, Origin]
+# Expanded lines, with nested includes left as paths to splice in once
+Segment = Union[Line, Path]
+
+
+class _Unit(NamedTuple):
+    segments: List[Segment]
+    objects: Dict[str, str]
+    macros: Dict[str, Macro]
+
+
+class Source:
+    __slots__ = "__lines", "__origins"
+
+    def __init__(self, lines: List[str], origins: List[Origin]):
+        self.__lines = lines
+        self.__origins = origins
+
+    @classmethod
+    def plain(cls, text: str, name: str) -> "Source":
+        lines = text.splitlines()
+        return cls(lines, [Origin(name, num) for num in range(1, len(lines) + 1)])
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.__lines)
+
+    @property
+    def origins(self) -> List[Origin]:
+        return self.__origins
+
+    def origin(self, line: int) -> Origin:
+        return self.__origins[line - 1]
+
+
+def _code(line: str) -> str:
+    if "//" in line:
+        line = line[: line.index("//")]
+    return line.strip()
+
+
+def _substitute(line: str, values: Dict[str, str]) -> str:
+    if not values:
+        return line
+    return WORD_RE.sub(lambda m: values.get(m.group(), m.group()), line)
+
+
+class Preprocessor:
+    __slots__ = "__cache", "__expansions"
+
+    def __init__(self):
+        # Keyed by directory and content hash, so a header shared by many
+        # files of one batch is expanded once
+        self.__cache: Dict[Tuple[str, str], _Unit] = {}
+        self.__expansions = 0
+
+    def expand(
+        self, text: str, name: str = "<input>", directory: Optional[Path] = None
+    ) -> Source:
+        directory = Path(".") if directory is None else directory
+        unit = self.__unit(text, name, directory, [])
+
+        lines: List[str] = []
+        origins: List[Origin] = []
+        self.__flatten(unit, lines, origins, set())
+        return Source(lines, origins)
+
+    def expand_file(self, pth: Path) -> Source:
+        return self.expand(pth.read_text(), str(pth), pth.parent)
+
+    def __flatten(
+        self, unit: _Unit, lines: List[str], origins: List[Origin], seen: Set[Path]
+    ) -> None:
+        # Every file is included once per expansion
+        for segment in unit.segments:
+            if isinstance(segment, Path):
+                if segment not in seen:
+                    seen.add(segment)
+                    self.__flatten(self.__included(segment, []), lines, origins, seen)
+            else:
+                lines.append(segment[0])
+                origins.append(segment[1])
+
+    def __included(self, pth: Path, stack: List[Path]) -> _Unit:
+        text = pth.read_text()
+        key = (str(pth.parent), hashlib.sha256(text.encode()).hexdigest())
+        unit = self.__cache.get(key)
+        if unit is None:
+            unit = self.__unit(text, str(pth), pth.parent, stack + [pth])
+            self.__cache[key] = unit
+
+        return unit
+
+    def __unit(
+        self, text: str, name: str, directory: Path, stack: List[Path]
+    ) -> _Unit:
+        unit = _Unit([], {}, {})
+        raw = text.splitlines()
+        idx = 0
+        while idx < len(raw):
+            line = raw[idx]
+            origin = Origin(name, idx + 1)
+            code = _code(line)
+            idx += 1
+
+            if not code.startswith("#"):
+                self.__emit(unit, line, origin, 0)
+                continue
+
+            include = INCLUDE_RE.match(code)
+            define = DEFINE_RE.match(code)
+            if include:
+                pth = directory.joinpath(include.group(1)).resolve()
+                if pth in stack:
+                    raise PreprocessorError(origin, f"Circular include of {pth}")
+                if not pth.is_file():
+                    raise PreprocessorError(origin, f"Cannot include {pth}")
+
+                included = self.__included(pth, stack)
+                unit.objects.update(included.objects)
+                unit.macros.update(included.macros)
+                unit.segments.append(pth)
+            elif define and define.group(2) is None:
+                value = define.group(3) or ""
+                unit.objects[define.group(1)] = _substitute(value, unit.objects)
+            elif define:
+                params = tuple(
+                    param.strip() for param in define.group(2)[1:-1].split(",")
+                )
+                params = tuple(param for param in params if param)
+                body = []
+                while idx < len(raw) and _code(raw[idx]) != END:
+                    body.append((raw[idx], Origin(name, idx + 1)))
+                    idx += 1
+                if idx == len(raw):
+                    raise PreprocessorError(origin, f"Missing {END}")
+                idx += 1
+                unit.macros[define.group(1)] = Macro(params, tuple(body))
+            else:
+                raise PreprocessorError(origin, f"Unknown directive: {code}")
+
+        return unit
+
+    def __emit(self, unit: _Unit, line: str, origin: Origin, depth: int) -> None:
+        code = _code(line)
+        call = CALL_RE.match(code)
+        macro = unit.macros.get(call.group(1)) if call else None
+        if call is None or macro is None:
+            unit.segments.append((_substitute(line, unit.objects), origin))
+            return
+
+        if depth == MAX_DEPTH:
+            raise PreprocessorError(origin, f"Macro {call.group(1)} nests too deep")
+        args = [arg.strip() for arg in call.group(2).split(",")]
+        if args == [""]:
+            args = []
+        if len(args) != len(macro.params):
+            raise PreprocessorError(
+                origin,
+                f"Macro {call.group(1)} takes {len(macro.params)} arguments, "
+                f"got {len(args)}",
+            )
+
+        # Expanded lines keep the location of the invocation
+        self.__expansions += 1
+        values = dict(zip(macro.params, args))
+        local = f".{self.__expansions}"
+        for body_line, _ in macro.body:
+            body_line = _substitute(body_line, values).replace(LOCAL_MARK, local)
+            self.__emit(unit, body_line, origin, depth + 1)
+
+    def dependencies(self, pth: Path) -> List[Path]:
+        # Every file reachable through #include, without expanding macros
+        result: List[Path] = []
+        stack = [pth.resolve()]
+        while stack:
+            current = stack.pop()
+            for line in current.read_text().splitlines():
+                include = INCLUDE_RE.match(_code(line))
+                if include:
+                    dep = current.parent.joinpath(include.group(1)).resolve()
+                    if dep.is_file() and dep not in result and dep != pth.resolve():
+                        result.append(dep)
+                        stack.append(dep)
+
+        return result
+
+
+def preprocess_text(
+    text: str,
+    name: str,
+    directory: Path,
+    preprocessor: Optional[Preprocessor] = None,
+) -> Source:
+    # Sources without directives are passed through untouched
+    if "#" not in text:
+        return Source.plain(text, name)
+
+    return (preprocessor or Preprocessor()).expand(text, name, directory)
+
+
+def preprocess(pth: Path, preprocessor: Optional[Preprocessor] = None) -> Source:
+    return preprocess_text(pth.read_text(), str(pth), pth.parent, preprocessor)
@@ -0,0 +1,136 @@
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Tuple
+
+START_REGION = "<start>"
+
+
+class Region(NamedTuple):
+    label: str
+    start: int
+    end: int
+    cycles: int
+    taken: int
+    not_taken: int
+
+
+def _location(label: str, offset: int) -> str:
+    return label if offset == 0 else f"{label}+{offset}"
+
+
+class Profiler:
+    __slots__ = "__counts", "__taken", "__not_taken"
+
+    def __init__(self, size: int):
+        self.__counts = array("Q", bytes(8 * size))
+        self.__taken = array("Q", bytes(8 * size))
+        self.__not_taken = array("Q", bytes(8 * size))
+
+    @property
+    def counts(self) -> array:
+        return self.__counts
+
+    @property
+    def taken(self) -> array:
+        return self.__taken
+
+    @property
+    def not_taken(self) -> array:
+        return self.__not_taken
+
+    @property
+    def total(self) -> int:
+        return sum(self.__counts)
+
+    def clear(self) -> None:
+        size = len(self.__counts)
+        for counter in (self.__counts, self.__taken, self.__not_taken):
+            counter[:] = array("Q", bytes(8 * size))
+
+    @staticmethod
+    def __boundaries(labels: Dict[str, int]) -> List[Tuple[int, str]]:
+        # One region per ROM address that has a label, first label wins
+        boundaries: Dict[int, str] = {}
+        for label, address in labels.items():
+            boundaries.setdefault(address, label)
+
+        if 0 not in boundaries:
+            boundaries[0] = START_REGION
+
+        return sorted(boundaries.items())
+
+    @staticmethod
+    def locate(address: int, labels: Dict[str, int]) -> str:
+        boundaries = Profiler.__boundaries(labels)
+        idx = bisect_right([start for start, _ in boundaries], address) - 1
+        start, label = boundaries[idx]
+        return _location(label, address - start)
+
+    def regions(self, labels: Dict[str, int]) -> List[Region]:
+        boundaries = Profiler.__boundaries(labels)
+        size = len(self.__counts)
+        result = []
+        for idx, (start, label) in enumerate(boundaries):
+            if start >= size:
+                break
+
+            end = boundaries[idx + 1][0] if idx + 1 < len(boundaries) else size
+            end = min(end, size)
+            result.append(
+                Region(
+                    label,
+                    start,
+                    end,
+                    sum(self.__counts[start:end]),
+                    sum(self.__taken[start:end]),
+                    sum(self.__not_taken[start:end]),
+                )
+            )
+
+        return result
+
+    def report(self, labels: Dict[str, int], limit: int = 10) -> List[str]:
+        total = self.total or 1
+        by_address = self.regions(labels)
+        regions = sorted(by_address, key=lambda r: r.cycles, reverse=True)
+
+        lines = [
+            f"{'Region':<24}{'Cycles':>12}{'%':>8}{'Taken':>12}{'Not taken':>12}"
+        ]
+        for region in regions[:limit]:
+            if region.cycles == 0:
+                break
+            share = 100 * region.cycles / total
+            lines.append(
+                f"{region.label:<24}{region.cycles:>12}{share:>7.1f}%"
+                f"{region.taken:>12}{region.not_taken:>12}"
+            )
+
+        lines.append("")
+        lines.append(f"{'Address':<8}{'Location':<24}{'Cycles':>12}{'%':>8}")
+        counts = self.__counts
+        hottest = sorted(range(len(counts)), key=counts.__getitem__, reverse=True)
+        starts = [region.start for region in by_address]
+        for address in hottest[:limit]:
+            if counts[address] == 0:
+                break
+            share = 100 * counts[address] / total
+            region = by_address[bisect_right(starts, address) - 1]
+            location = _location(region.label, address - region.start)
+            lines.append(
+                f"{address:<8}{location:<24}{counts[address]:>12}{share:>7.1f}%"
+            )
+
+        return lines
+
+    def folded(self, labels: Dict[str, int], root: str) -> List[str]:
+        # Flamegraph folded stacks: root;region;instruction count
+        lines = []
+        for region in self.regions(labels):
+            for address in range(region.start, region.end):
+                count = self.__counts[address]
+                if count:
+                    location = _location(region.label, address - region.start)
+                    lines.append(f"{root};{region.label};{location} {count}")
+
+        return lines
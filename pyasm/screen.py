@@ -0,0 +1,88 @@
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+
+from pyasm.simulator import ROW_WORDS, SCREEN_HEIGHT, SCREEN_WIDTH, Memory
+
+ROW_BYTES = SCREEN_WIDTH // 8
+FORMATS = (".pbm", ".ppm", ".png", ".raw")
+
+# Hack draws the lowest bit of a word leftmost, bitmaps want the highest
+# bit of a byte leftmost, so every byte is mirrored
+MIRROR = bytes(int(f"{byte:08b}"[::-1], 2) for byte in range(256))
+# PNG greyscale uses 1 for white while Hack uses 1 for black
+INVERT = bytes(byte ^ 0xFF for byte in range(256))
+# Packed pixels, one byte each, expanded to 8 bit grey and to RGB
+GREY = [
+    bytes(0 if byte & (0x80 >> bit) else 0xFF for bit in range(8))
+    for byte in range(256)
+]
+RGB = [bytes(value for value in grey for _ in range(3)) for grey in GREY]
+
+
+class Framebuffer:
+    __slots__ = "__memory", "__bits"
+
+    def __init__(self, memory: Memory):
+        self.__memory = memory
+        # The screen packed MSB first, one bit per pixel with 1 for black
+        self.__bits = bytearray(ROW_BYTES * SCREEN_HEIGHT)
+
+    @property
+    def bits(self) -> bytearray:
+        return self.__bits
+
+    def update(self) -> int:
+        # Only rows written since the last update are decoded again
+        screen = self.__memory.screen
+        bits = self.__bits
+        rows = self.__memory.take_dirty_rows()
+        for row in rows:
+            data = screen[row * ROW_WORDS : (row + 1) * ROW_WORDS].tobytes()
+            if sys.byteorder == "big":
+                swapped = array("H", data)
+                swapped.byteswap()
+                data = swapped.tobytes()
+            start = row * ROW_BYTES
+            bits[start : start + ROW_BYTES] = data.translate(MIRROR)
+
+        return len(rows)
+
+    def pbm(self) -> bytes:
+        return b"P4\n%d %d\n" % (SCREEN_WIDTH, SCREEN_HEIGHT) + bytes(self.__bits)
+
+    def ppm(self) -> bytes:
+        header = b"P6\n%d %d\n255\n" % (SCREEN_WIDTH, SCREEN_HEIGHT)
+        return header + b"".join(map(RGB.__getitem__, self.__bits))
+
+    def grey(self) -> bytes:
+        # Raw 8 bit frames, e.g. for `ffmpeg -f rawvideo -pix_fmt gray`
+        return b"".join(map(GREY.__getitem__, self.__bits))
+
+    def png(self) -> bytes:
+        inverted = bytes(self.__bits).translate(INVERT)
+        rows = b"".join(
+            b"\x00" + inverted[start : start + ROW_BYTES]
+            for start in range(0, len(inverted), ROW_BYTES)
+        )
+        header = struct.pack(">IIBBBBB", SCREEN_WIDTH, SCREEN_HEIGHT, 1, 0, 0, 0, 0)
+        return (
+            b"\x89PNG\r\n\x1a\n"
+            + _chunk(b"IHDR", header)
+            + _chunk(b"IDAT", zlib.compress(rows))
+            + _chunk(b"IEND", b"")
+        )
+
+    def export(self, pth: Path) -> None:
+        if pth.suffix not in FORMATS:
+            raise ValueError(f"Unknown image format: {pth.suffix}")
+
+        exporters = {".pbm": self.pbm, ".ppm": self.ppm, ".png": self.png}
+        pth.write_bytes(exporters.get(pth.suffix, self.grey)())
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(kind + data)
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
@@ -0,0 +1,101 @@
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from pyasm.simulator import ROM_SIZE, ProgramTooLarge, Simulator
+
+
+class RomHandle(NamedTuple):
+    name: str
+    words: int
+
+
+def _buffer(memory: SharedMemory) -> memoryview:
+    if memory.buf is None:
+        raise ValueError(f"Shared ROM {memory.name} is closed")
+    return memory.buf
+
+
+# One attachment per segment in each process, however many tasks carry it
+_ATTACHED: Dict[RomHandle, "SharedRom"] = {}
+
+
+class SharedRom:
+    __slots__ = "__memory", "__words", "__owner", "__view"
+
+    def __init__(self, memory: SharedMemory, words: int, owner: bool):
+        # Segments may be larger than asked for, so the size travels along
+        self.__memory = memory
+        self.__words = words
+        self.__owner = owner
+        self.__view: Optional[memoryview] = None
+
+    @classmethod
+    def create(cls, rom: Iterable[int]) -> "SharedRom":
+        # Assemble once, then every worker attaches to the same words
+        words = array("H", rom)
+        if len(words) > ROM_SIZE:
+            raise ProgramTooLarge(len(words))
+
+        memory = SharedMemory(create=True, size=max(len(words) * 2, 1))
+        _buffer(memory)[: len(words) * 2] = words.tobytes()
+        return cls(memory, len(words), True)
+
+    @classmethod
+    def attach(cls, handle: RomHandle) -> "SharedRom":
+        rom = _ATTACHED.get(handle)
+        if rom is None:
+            rom = _ATTACHED[handle] = cls(
+                SharedMemory(name=handle.name), handle.words, False
+            )
+        return rom
+
+    def __reduce__(self):
+        # Sent to a worker, the ROM attaches there instead of being copied
+        return SharedRom.attach, (self.handle,)
+
+    def __del__(self) -> None:
+        # The view exports the segment's buffer, so it goes first
+        try:
+            self.close()
+        except BufferError:
+            pass
+
+    def __enter__(self) -> "SharedRom":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+        if self.__owner:
+            self.unlink()
+
+    def __len__(self) -> int:
+        return self.__words
+
+    @property
+    def handle(self) -> RomHandle:
+        return RomHandle(self.__memory.name, self.__words)
+
+    @property
+    def words(self) -> memoryview:
+        # Read-only, so no worker can change the program under the others
+        if self.__view is None:
+            data = _buffer(self.__memory)[: self.__words * 2]
+            self.__view = data.toreadonly().cast("H")
+            data.release()
+        return self.__view
+
+    def simulator(self) -> Simulator:
+        return Simulator(self.words)
+
+    def close(self) -> None:
+        # Simulators made from this ROM must be gone first
+        if _ATTACHED.get(self.handle) is self:
+            del _ATTACHED[self.handle]
+        if self.__view is not None:
+            self.__view.release()
+            self.__view = None
+        self.__memory.close()
+
+    def unlink(self) -> None:
+        self.__memory.unlink()
@@ -0,0 +1,441 @@
+import struct
+import zlib
+from array import array
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Union
+
+if TYPE_CHECKING:
+    from pyasm.keyboard import Keyboard
+    from pyasm.profiler import Profiler
+    from pyasm.trace import TraceWriter
+
+SCREEN = 16384
+SCREEN_SIZE = 8192
+SCREEN_WIDTH = 512
+SCREEN_HEIGHT = 256
+ROW_WORDS = SCREEN_WIDTH // 16
+KBD = 24576
+RAM_SIZE = KBD + 1
+ROM_SIZE = 32768
+CHECKPOINT_LIMIT = 16
+
+# magic, version, ROM checksum, PC, A, D, cycle count
+SNAPSHOT_HEADER = struct.Struct("<4sHIHhhQ")
+SNAPSHOT_MAGIC = b"HSNP"
+SNAPSHOT_VERSION = 1
+
+Alu = Callable[[int, int], int]
+
+
+class MemoryAccessError(IndexError):
+    def __init__(self, pc: int, address: int):
+        msg = f"Memory access out of range at PC : {pc}\tAddress: {address}"
+        super(MemoryAccessError, self).__init__(msg)
+
+
+class ProgramTooLarge(ValueError):
+    def __init__(self, size: int):
+        msg = f"Program does not fit in ROM: {size} > {ROM_SIZE} words"
+        super(ProgramTooLarge, self).__init__(msg)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def wrap(value: int) -> int:
+    # Fold any int into the signed 16-bit range without branching
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+def _make_alu(bits: int) -> Alu:
+    zx, nx, zy, ny, f, no = ((bits >> shift) & 1 for shift in range(5, -1, -1))
+
+    def alu(x: int, y: int) -> int:
+        if zx:
+            x = 0
+        if nx:
+            x = ~x
+        if zy:
+            y = 0
+        if ny:
+            y = ~y
+        out = x + y if f else x & y
+        return ~out if no else out
+
+    return alu
+
+
+# Indexed by the six `c` bits of a C instruction, x is D and y is A or M
+ALU: List[Alu] = [_make_alu(bits) for bits in range(64)]
+
+
+class Memory:
+    __slots__ = "__words", "__view", "__dirty"
+
+    def __init__(self, size: int = RAM_SIZE):
+        self.__words = array("h", bytes(2 * size))
+        self.__view = memoryview(self.__words)
+        # One flag per screen row written since the last take_dirty_rows
+        self.__dirty = bytearray(b"\x01" * SCREEN_HEIGHT)
+
+    def __len__(self) -> int:
+        return len(self.__words)
+
+    def __getitem__(self, address: int) -> int:
+        return self.__words[address]
+
+    def __setitem__(self, address: int, value: int) -> None:
+        self.__words[address] = wrap(value)
+        if SCREEN <= address < KBD:
+            self.__dirty[(address - SCREEN) // ROW_WORDS] = 1
+
+    @property
+    def words(self) -> array:
+        return self.__words
+
+    @property
+    def view(self) -> memoryview:
+        return self.__view
+
+    @property
+    def screen(self) -> memoryview:
+        return self.__view[SCREEN : SCREEN + SCREEN_SIZE]
+
+    @property
+    def dirty(self) -> bytearray:
+        return self.__dirty
+
+    def take_dirty_rows(self) -> List[int]:
+        rows = [row for row, flag in enumerate(self.__dirty) if flag]
+        self.__dirty[:] = bytes(SCREEN_HEIGHT)
+        return rows
+
+    def tobytes(self) -> bytes:
+        return self.__view.tobytes()
+
+    def load(self, data: Union[bytes, memoryview]) -> None:
+        self.__view.cast("B")[:] = data
+        self.__dirty[:] = b"\x01" * SCREEN_HEIGHT
+
+    def clear(self) -> None:
+        self.load(bytes(2 * len(self.__words)))
+
+
+class Simulator:
+    __slots__ = (
+        "__rom",
+        "__rom_crc",
+        "__memory",
+        "__pc",
+        "__a",
+        "__d",
+        "__cycles",
+        "__checkpoints",
+        "__keyboard",
+    )
+
+    def __init__(self, rom: Union[Iterable[int], memoryview]):
+        # A view of 16-bit words, e.g. a shared ROM image, is used in place
+        if isinstance(rom, memoryview) and rom.format == "H":
+            self.__rom: Union[array, memoryview] = rom
+        else:
+            self.__rom = array("H", rom)
+        if len(self.__rom) > ROM_SIZE:
+            raise ProgramTooLarge(len(self.__rom))
+
+        # Only needed by snapshots, so it is left until one is taken
+        self.__rom_crc: Optional[int] = None
+        self.__memory = Memory()
+        self.__pc = 0
+        self.__a = 0
+        self.__d = 0
+        self.__cycles = 0
+        self.__checkpoints: Dict[int, bytes] = {}
+        self.__keyboard: Optional["Keyboard"] = None
+
+    @classmethod
+    def from_binary(cls, lines: Iterable[str]) -> "Simulator":
+        return cls(int(line, 2) for line in lines if line.strip())
+
+    @property
+    def rom(self) -> memoryview:
+        return memoryview(self.__rom)
+
+    @property
+    def memory(self) -> Memory:
+        return self.__memory
+
+    @property
+    def pc(self) -> int:
+        return self.__pc
+
+    @pc.setter
+    def pc(self, value: int) -> None:
+        self.__pc = value & 0x7FFF
+
+    @property
+    def a(self) -> int:
+        return self.__a
+
+    @a.setter
+    def a(self, value: int) -> None:
+        self.__a = wrap(value)
+
+    @property
+    def d(self) -> int:
+        return self.__d
+
+    @d.setter
+    def d(self, value: int) -> None:
+        self.__d = wrap(value)
+
+    @property
+    def cycles(self) -> int:
+        return self.__cycles
+
+    @property
+    def halted(self) -> bool:
+        return self.__pc >= len(self.__rom)
+
+    @property
+    def checkpoints(self) -> Dict[int, bytes]:
+        return self.__checkpoints
+
+    @property
+    def keyboard(self) -> Optional["Keyboard"]:
+        return self.__keyboard
+
+    @keyboard.setter
+    def keyboard(self, keyboard: Optional["Keyboard"]) -> None:
+        self.__keyboard = keyboard
+
+    def reset(self) -> None:
+        self.__memory.clear()
+        self.__pc = 0
+        self.__a = 0
+        self.__d = 0
+        self.__cycles = 0
+        self.__checkpoints.clear()
+
+    def __crc(self) -> int:
+        if self.__rom_crc is None:
+            self.__rom_crc = zlib.crc32(self.__rom)
+        return self.__rom_crc
+
+    def snapshot(self) -> bytes:
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC,
+            SNAPSHOT_VERSION,
+            self.__crc(),
+            self.__pc,
+            self.__a,
+            self.__d,
+            self.__cycles,
+        )
+        return header + self.__memory.tobytes()
+
+    def restore(self, snapshot: bytes) -> None:
+        view = memoryview(snapshot)
+        size = SNAPSHOT_HEADER.size
+        if len(view) != size + self.__memory.view.nbytes:
+            raise SnapshotError("Snapshot size does not match the memory size")
+
+        magic, version, rom_crc, pc, a, d, cycles = SNAPSHOT_HEADER.unpack(
+            view[:size]
+        )
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise SnapshotError("Not a simulator snapshot")
+        if rom_crc != self.__crc():
+            raise SnapshotError("Snapshot was taken with a different program")
+
+        self.__memory.load(view[size:])
+        self.__pc, self.__a, self.__d, self.__cycles = pc, a, d, cycles
+
+    def restore_checkpoint(self, cycle: int) -> int:
+        # Resume from the latest automatic checkpoint at or before `cycle`
+        taken = [c for c in self.__checkpoints if c <= cycle]
+        if not taken:
+            raise SnapshotError(f"No checkpoint at or before cycle {cycle}")
+
+        latest = max(taken)
+        self.restore(self.__checkpoints[latest])
+        return latest
+
+    def step(self) -> bool:
+        return self.run(1) == 1
+
+    def run(
+        self,
+        cycles: int,
+        checkpoint_every: int = 0,
+        profiler: Optional["Profiler"] = None,
+        tracer: Optional["TraceWriter"] = None,
+    ) -> int:
+        execute: Callable[[int], int] = self.__execute
+        if profiler is not None or tracer is not None:
+            if profiler is not None and len(profiler.counts) < len(self.__rom):
+                raise ValueError("Profiler is smaller than the ROM")
+            if tracer is not None and tracer.next_cycle != self.__cycles:
+                raise ValueError("Trace would not be contiguous")
+
+            def instrumented(n: int) -> int:
+                return self.__execute_instrumented(n, profiler, tracer)
+
+            execute = instrumented
+
+        if self.__keyboard is not None:
+            execute = self.__with_keyboard(execute, self.__keyboard)
+
+        if checkpoint_every <= 0:
+            return execute(cycles)
+
+        checkpoints = self.__checkpoints
+        executed = 0
+        while executed < cycles and not self.halted:
+            until_next = checkpoint_every - self.__cycles % checkpoint_every
+            executed += execute(min(until_next, cycles - executed))
+            if self.__cycles % checkpoint_every == 0:
+                checkpoints[self.__cycles] = self.snapshot()
+                while len(checkpoints) > CHECKPOINT_LIMIT:
+                    del checkpoints[next(iter(checkpoints))]
+
+        return executed
+
+    def __with_keyboard(
+        self, execute: Callable[[int], int], keyboard: "Keyboard"
+    ) -> Callable[[int], int]:
+        # Runs are cut at key events instead of checking KBD every cycle, so
+        # the loops stay as they are and a read sees the latest event
+
+        def keyed(cycles: int) -> int:
+            executed = 0
+            while executed < cycles:
+                keyboard.apply(self.__cycles, self.__memory)
+                upcoming = keyboard.next_cycle(self.__cycles)
+                n = cycles - executed
+                if upcoming is not None:
+                    n = min(n, upcoming - self.__cycles)
+                ran = execute(n)
+                executed += ran
+                if ran < n:
+                    break
+            return executed
+
+        return keyed
+
+    def __execute(self, cycles: int) -> int:
+        rom = self.__rom
+        ram = self.__memory.words
+        dirty = self.__memory.dirty
+        size = len(rom)
+        alu = ALU
+        pc, a, d = self.__pc, self.__a, self.__d
+        executed = 0
+
+        try:
+            while executed < cycles and pc < size:
+                word = rom[pc]
+                executed += 1
+                if word < 0x8000:
+                    a = word
+                    pc += 1
+                    continue
+
+                address = a & 0x7FFF
+                y = ram[address] if word & 0x1000 else a
+                out = alu[(word >> 6) & 0x3F](d, y)
+                out = ((out + 0x8000) & 0xFFFF) - 0x8000
+
+                if word & 0x08:
+                    ram[address] = out
+                    if SCREEN <= address < KBD:
+                        dirty[(address - SCREEN) >> 5] = 1
+                if word & 0x10:
+                    d = out
+                if word & 0x20:
+                    a = out
+
+                # j1 j2 j3 select out < 0, out == 0 and out > 0 respectively
+                if (word >> ((out < 0) * 2 + (out == 0))) & 1:
+                    pc = address
+                else:
+                    pc += 1
+        except IndexError:
+            executed -= 1
+            raise MemoryAccessError(pc, a & 0x7FFF)
+        finally:
+            self.__pc, self.__a, self.__d = pc, a, d
+            self.__cycles += executed
+
+        return executed
+
+    def __execute_instrumented(
+        self,
+        cycles: int,
+        profiler: Optional["Profiler"],
+        tracer: Optional["TraceWriter"],
+    ) -> int:
+        # Same loop as __execute with profiling and tracing hooks, kept
+        # separate so plain runs do not pay for the bookkeeping
+        rom = self.__rom
+        ram = self.__memory.words
+        dirty = self.__memory.dirty
+        if profiler is not None:
+            counts = profiler.counts
+            taken, not_taken = profiler.taken, profiler.not_taken
+        record = None if tracer is None else tracer.record
+        size = len(rom)
+        alu = ALU
+        pc, a, d = self.__pc, self.__a, self.__d
+        executed = 0
+
+        try:
+            while executed < cycles and pc < size:
+                word = rom[pc]
+                executed += 1
+                if profiler is not None:
+                    counts[pc] += 1
+                if word < 0x8000:
+                    a = word
+                    if record is not None:
+                        record(pc, a, d, 0xFFFF, 0)
+                    pc += 1
+                    continue
+
+                address = a & 0x7FFF
+                y = ram[address] if word & 0x1000 else a
+                out = alu[(word >> 6) & 0x3F](d, y)
+                out = ((out + 0x8000) & 0xFFFF) - 0x8000
+
+                if word & 0x08:
+                    ram[address] = out
+                    if SCREEN <= address < KBD:
+                        dirty[(address - SCREEN) >> 5] = 1
+                if word & 0x10:
+                    d = out
+                if word & 0x20:
+                    a = out
+                if record is not None:
+                    if word & 0x08:
+                        record(pc, a, d, address, out)
+                    else:
+                        record(pc, a, d, 0xFFFF, 0)
+
+                if (word >> ((out < 0) * 2 + (out == 0))) & 1:
+                    if profiler is not None:
+                        taken[pc] += 1
+                    pc = address
+                else:
+                    if profiler is not None and word & 7:
+                        not_taken[pc] += 1
+                    pc += 1
+        except IndexError:
+            executed -= 1
+            if profiler is not None:
+                counts[pc] -= 1
+            raise MemoryAccessError(pc, a & 0x7FFF)
+        finally:
+            self.__pc, self.__a, self.__d = pc, a, d
+            self.__cycles += executed
+
+        return executed
@@ -0,0 +1,92 @@
+import os
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class SourceMap:
+    __slots__ = "__lines", "__files", "__labels", "__starts", "__names"
+
+    def __init__(
+        self,
+        lines: Iterable[int],
+        labels: Dict[str, int],
+        files: Optional[Iterable[str]] = None,
+    ):
+        # Files are parallel to the lines, empty for the file being assembled
+        self.__lines = array("I", lines)
+        self.__files = [""] * len(self.__lines) if files is None else list(files)
+        self.__labels = dict(labels)
+
+        # Nearest preceding label for any address, first label wins on ties
+        by_address: Dict[int, str] = {}
+        for label, address in labels.items():
+            by_address.setdefault(address, label)
+        self.__starts = sorted(by_address)
+        self.__names = [by_address[address] for address in self.__starts]
+
+    def __len__(self) -> int:
+        return len(self.__lines)
+
+    @property
+    def labels(self) -> Dict[str, int]:
+        return self.__labels
+
+    def line_of(self, address: int) -> int:
+        return self.__lines[address]
+
+    def file_of(self, address: int) -> str:
+        return self.__files[address]
+
+    def through(
+        self, origin: Callable[[int], Tuple[str, int]], main: str
+    ) -> "SourceMap":
+        # From lines of preprocessed text to the file and line each came from;
+        # other files are named relative to the main one
+        origins = [origin(line) for line in self.__lines]
+        root = os.path.dirname(main)
+        files = [
+            "" if file == main else os.path.relpath(file, root) for file, _ in origins
+        ]
+        return SourceMap([line for _, line in origins], self.__labels, files)
+
+    def label_of(self, address: int) -> str:
+        idx = bisect_right(self.__starts, address) - 1
+        if idx < 0:
+            return ""
+
+        offset = address - self.__starts[idx]
+        label = self.__names[idx]
+        return label if offset == 0 else f"{label}+{offset}"
+
+    def addresses_of(self, line: int) -> List[int]:
+        return [addr for addr, num in enumerate(self.__lines) if num == line]
+
+    def dump(self) -> List[str]:
+        result = [f"({label}) {address}" for label, address in self.__labels.items()]
+        for addr, (line, file) in enumerate(zip(self.__lines, self.__files)):
+            result.append(f"{addr} {line} {file}" if file else f"{addr} {line}")
+        return result
+
+    @classmethod
+    def load(cls, lines: Iterable[str]) -> "SourceMap":
+        labels: Dict[str, int] = {}
+        source_lines: List[int] = []
+        files: List[str] = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            if line.startswith("("):
+                key, value = line.rsplit(" ", 1)
+                labels[key[1:-1]] = int(value)
+                continue
+
+            key, value, *file = line.split(" ", 2)
+            if int(key) != len(source_lines):
+                raise ValueError(f"Source map is not contiguous at {key}")
+            source_lines.append(int(value))
+            files.append(file[0] if file else "")
+
+        return cls(source_lines, labels, files)
@@ -0,0 +1,316 @@
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from pyasm.coder import Coder, SymbolTable
+from pyasm.parser import CommandType, Instruction, Parser
+from pyasm.simulator import ALU, wrap
+
+DESTS = ("M", "D", "MD", "A", "AM", "AD", "AMD")
+SEARCH_STATES = 8
+VERIFY_STATES = 512
+CACHE_FIELDS = {"target", "ignore", "max_length", "rewrite"}
+
+# a, d, and the memory cells that differ from the initial contents
+State = Tuple[int, int, Tuple[Tuple[int, int], ...]]
+Vector = Tuple[State, ...]
+
+
+class SuperoptError(ValueError):
+    pass
+
+
+class Rule(NamedTuple):
+    pattern: Tuple[str, ...]
+    replacement: Tuple[str, ...]
+    ignore: str = ""
+
+
+class Op(NamedTuple):
+    text: str
+    is_load: bool
+    value: int = 0
+    alu: int = 0
+    reads_m: bool = False
+    dest: str = ""
+
+
+def _initial(seed: int, address: int) -> int:
+    # Deterministic contents for an untouched cell; seeds 0 and 1 cover the
+    # all-zero and all-ones memories
+    if seed == 0:
+        return 0
+    if seed == 1:
+        return -1
+    return wrap((seed * 2654435761 + address * 40503) >> 7)
+
+
+def _step(op: Op, state: State, seed: int) -> State:
+    a, d, cells = state
+    if op.is_load:
+        return op.value, d, cells
+
+    address = a & 0x7FFF
+    if op.reads_m:
+        y = _initial(seed, address)
+        for cell, value in cells:
+            if cell == address:
+                y = value
+    else:
+        y = a
+    out = ((ALU[op.alu](d, y) + 0x8000) & 0xFFFF) - 0x8000
+
+    if "M" in op.dest:
+        kept = [(cell, value) for cell, value in cells if cell != address]
+        if out != _initial(seed, address):
+            kept.append((address, out))
+            kept.sort()
+        cells = tuple(kept)
+    if "D" in op.dest:
+        d = out
+    if "A" in op.dest:
+        a = out
+
+    return a, d, cells
+
+
+def _op(instruction: Instruction) -> Op:
+    if instruction.command_type is CommandType.A_COMMAND:
+        value = SymbolTable().get(instruction.symbol)
+        if value is None and instruction.symbol.isnumeric():
+            value = int(instruction.symbol)
+        if value is None:
+            raise SuperoptError(f"Not a constant: {instruction}")
+        return Op(str(instruction), True, value)
+
+    if instruction.command_type is CommandType.L_COMMAND or instruction.jmp:
+        raise SuperoptError(f"Only straight-line code is supported: {instruction}")
+
+    code = Coder.translate_comp(instruction.comp)
+    return _c_op(str(instruction), code, instruction.dest)
+
+
+def _c_op(text: str, code: str, dest: str) -> Op:
+    return Op(text, False, alu=int(code[1:], 2), reads_m=code[0] == "1", dest=dest)
+
+
+def _alphabet(constants: Set[int]) -> List[Op]:
+    ops = [Op(f"@{value}", True, value) for value in sorted(constants)]
+
+    # One mnemonic per distinct comp encoding
+    comps: Dict[str, str] = {}
+    for comp, code in Coder.get_comp_table().items():
+        comps.setdefault(code, comp)
+
+    for code, comp in comps.items():
+        for dest in DESTS:
+            ops.append(_c_op(f"{dest}={comp}", code, dest))
+
+    return ops
+
+
+def _states(count: int, offset: int) -> List[Tuple[State, int]]:
+    rnd = random.Random(offset)
+    edges = [0, 1, -1, 32767, -32768]
+    states: List[Tuple[State, int]] = []
+    for idx in range(count):
+        seed = offset + idx
+        if idx < len(edges):
+            a = d = edges[idx]
+        else:
+            a, d = rnd.randint(-32768, 32767), rnd.randint(-32768, 32767)
+        states.append(((a, d, ()), seed))
+
+    return states
+
+
+def _run(ops: Sequence[Op], states: List[Tuple[State, int]]) -> Vector:
+    result = []
+    for state, seed in states:
+        for op in ops:
+            state = _step(op, state, seed)
+        result.append(state)
+
+    return tuple(result)
+
+
+def _matches(vector: Vector, goal: Vector, ignore: str) -> bool:
+    for (a, d, cells), expected in zip(vector, goal):
+        if cells != expected[2]:
+            return False
+        if "A" not in ignore and a != expected[0]:
+            return False
+        if "D" not in ignore and d != expected[1]:
+            return False
+
+    return True
+
+
+def _extend(
+    frontier: List[Tuple[Vector, Tuple[int, ...]]],
+    alphabet: List[Op],
+    states: List[Tuple[State, int]],
+    goal: Vector,
+    ignore: str,
+) -> List[Tuple[int, ...]]:
+    # Candidates of one more instruction that match the goal states, checking
+    # the first state alone before running the rest
+    seeds = [seed for _, seed in states]
+    first_goal = goal[:1]
+    found = []
+    for vector, program in frontier:
+        first = vector[0]
+        for idx, op in enumerate(alphabet):
+            if not _matches((_step(op, first, seeds[0]),), first_goal, ignore):
+                continue
+
+            new = tuple(_step(op, state, seed) for state, seed in zip(vector, seeds))
+            if _matches(new, goal, ignore):
+                found.append(program + (idx,))
+
+    return found
+
+
+def search(
+    target: List[Instruction],
+    max_length: int = 3,
+    ignore: str = "",
+    jobs: int = 1,
+) -> Optional[List[str]]:
+    target_ops = [_op(instruction) for instruction in target]
+    constants = {op.value for op in target_ops if op.is_load} | {0, 1}
+    alphabet = _alphabet(constants)
+    states = _states(SEARCH_STATES, 0)
+    check = _states(VERIFY_STATES, SEARCH_STATES)
+    goal = _run(target_ops, states)
+    expected = _run(target_ops, check)
+    seeds = [seed for _, seed in states]
+
+    start = tuple(state for state, _ in states)
+    if _matches(start, goal, ignore):
+        return []
+
+    def verified(program: Tuple[int, ...]) -> bool:
+        ops = [alphabet[idx] for idx in program]
+        return _matches(_run(ops, check), expected, ignore)
+
+    # Breadth-first over programs, pruning any that reach the same states as
+    # a shorter or earlier program
+    seen = {start}
+    frontier: List[Tuple[Vector, Tuple[int, ...]]] = [(start, ())]
+    longest = min(max_length, len(target) - 1)
+    for length in range(1, longest + 1):
+        if length == longest:
+            # The last level is only matched against the goal, in parallel
+            if jobs > 1 and len(frontier) > jobs:
+                chunks = [frontier[idx::jobs] for idx in range(jobs)]
+                with ProcessPoolExecutor(jobs) as pool:
+                    futures = [
+                        pool.submit(_extend, chunk, alphabet, states, goal, ignore)
+                        for chunk in chunks
+                    ]
+                    candidates = sorted(p for f in futures for p in f.result())
+            else:
+                candidates = _extend(frontier, alphabet, states, goal, ignore)
+
+            for program in candidates:
+                if verified(program):
+                    return [alphabet[idx].text for idx in program]
+            break
+
+        next_frontier = []
+        for vector, program in frontier:
+            for idx, op in enumerate(alphabet):
+                new = tuple(
+                    _step(op, state, seed) for state, seed in zip(vector, seeds)
+                )
+                if new in seen:
+                    continue
+
+                seen.add(new)
+                candidate = program + (idx,)
+                if _matches(new, goal, ignore) and verified(candidate):
+                    return [op.text for op in (alphabet[i] for i in candidate)]
+                next_frontier.append((new, candidate))
+        frontier = next_frontier
+
+    return None
+
+
+class RewriteCache:
+    __slots__ = "__pth", "__entries"
+
+    def __init__(self, pth: Path):
+        self.__pth = pth
+        self.__entries: Dict[str, dict] = {}
+        if pth.exists():
+            # An unreadable cache is searched again and rewritten on the next put
+            try:
+                entries = json.loads(pth.read_text())
+            except (OSError, ValueError):
+                entries = {}
+            if isinstance(entries, dict):
+                self.__entries = {
+                    key: entry
+                    for key, entry in entries.items()
+                    if isinstance(entry, dict) and CACHE_FIELDS <= entry.keys()
+                }
+
+    @staticmethod
+    def key(target: List[Instruction], ignore: str) -> str:
+        return " ".join(str(instruction) for instruction in target) + f" |{ignore}"
+
+    def get(self, target: List[Instruction], ignore: str, max_length: int):
+        # (True, rewrite) when a search at least this deep is cached
+        entry = self.__entries.get(RewriteCache.key(target, ignore))
+        if entry is None:
+            return False, None
+        if entry["rewrite"] is None and entry["max_length"] < max_length:
+            return False, None
+
+        return True, entry["rewrite"]
+
+    def put(
+        self,
+        target: List[Instruction],
+        ignore: str,
+        max_length: int,
+        rewrite: Optional[List[str]],
+    ) -> None:
+        self.__entries[RewriteCache.key(target, ignore)] = {
+            "target": [str(instruction) for instruction in target],
+            "ignore": ignore,
+            "max_length": max_length,
+            "rewrite": rewrite,
+        }
+        self.__pth.parent.mkdir(parents=True, exist_ok=True)
+        self.__pth.write_text(json.dumps(self.__entries, indent=1, sort_keys=True))
+
+    def rules(self) -> List[Rule]:
+        return [
+            Rule(tuple(entry["target"]), tuple(entry["rewrite"]), entry["ignore"])
+            for entry in self.__entries.values()
+            if entry["rewrite"] is not None
+        ]
+
+
+def superoptimize(
+    code: str,
+    cache: Optional[RewriteCache] = None,
+    max_length: int = 3,
+    ignore: str = "",
+    jobs: int = 1,
+) -> Optional[List[str]]:
+    target = Parser(code).instructions()
+    if cache is not None:
+        cached, rewrite = cache.get(target, ignore, max_length)
+        if cached:
+            return rewrite
+
+    rewrite = search(target, max_length, ignore, jobs)
+    if cache is not None:
+        cache.put(target, ignore, max_length, rewrite)
+
+    return rewrite
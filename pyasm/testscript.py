@@ -0,0 +1,351 @@
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+
+from pyasm.assembler import AddressOutOfRange, Assembler
+from pyasm.coder import InvalidMnemonicError
+from pyasm.parser import InvalidCommandException, Parser
+from pyasm.preprocessor import preprocess
+from pyasm.simulator import MemoryAccessError, Simulator, wrap
+
+TOKEN_RE = re.compile(r'"[^"]*"|[{},;!]|[^\s{},;!"]+')
+COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+COLUMN_RE = re.compile(r"^(.+?)%([BDXS])(\d+)\.(\d+)\.(\d+)$")
+RAM_RE = re.compile(r"^RAM\[(\d+)\]$")
+TERMINATORS = ",;!"
+CONDITIONS: Dict[str, Callable[[int, int], bool]] = {
+    "=": lambda x, y: x == y,
+    "<>": lambda x, y: x != y,
+    "<": lambda x, y: x < y,
+    ">": lambda x, y: x > y,
+    "<=": lambda x, y: x <= y,
+    ">=": lambda x, y: x >= y,
+}
+LOAD_ERRORS = (
+    OSError,
+    ValueError,
+    InvalidCommandException,
+    InvalidMnemonicError,
+    AddressOutOfRange,
+)
+# Bounds `while` loops whose condition never turns false
+MAX_ITERATIONS = 10_000_000
+
+
+class ScriptError(ValueError):
+    def __init__(self, script: str, line: int, message: str):
+        msg = f"{script}:{line}: {message}"
+        super(ScriptError, self).__init__(msg)
+        self.line = line
+
+
+Token = Tuple[str, int]
+
+
+class Statement(NamedTuple):
+    line: int
+    words: List[str]
+    body: Optional[List["Statement"]] = None
+
+
+class Column(NamedTuple):
+    name: str
+    fmt: str
+    left: int
+    width: int
+    right: int
+
+    def header(self) -> str:
+        # Centred in the whole column, cut to fit like the Java tools do
+        size = self.left + self.width + self.right
+        name = self.name[:size]
+        left = (size - len(name)) // 2
+        return " " * left + name + " " * (size - left - len(name))
+
+    def format(self, value: int) -> str:
+        if self.fmt == "B":
+            text = f"{value & 0xFFFF:016b}"[-self.width :]
+        elif self.fmt == "X":
+            text = f"{value & 0xFFFF:04X}"[-self.width :]
+        else:
+            text = str(value)
+        return " " * self.left + text.rjust(self.width) + " " * self.right
+
+
+class Result(NamedTuple):
+    script: str
+    passed: bool
+    outputs: int
+    cycles: int
+    seconds: float
+    message: str = ""
+
+    def __str__(self) -> str:
+        status = "PASS" if self.passed else "FAIL"
+        line = f"{status} {self.script} ({self.outputs} outputs, "
+        line += f"{self.cycles} cycles, {self.seconds * 1000:.1f}ms)"
+        return f"{line}: {self.message}" if self.message else line
+
+
+def _tokens(text: str) -> List[Token]:
+    # Comments are blanked out with their newlines kept, so lines still count
+    text = COMMENT_RE.sub(lambda m: "\n" * m.group().count("\n"), text)
+    result: List[Token] = []
+    for num, line in enumerate(text.splitlines(), 1):
+        result.extend((token, num) for token in TOKEN_RE.findall(line))
+    return result
+
+
+def _matches(line: str, expected: str) -> bool:
+    # `*` in a compare file matches any character
+    return len(line) == len(expected) and all(
+        e == "*" or c == e for c, e in zip(line, expected)
+    )
+
+
+def load_rom(pth: Path) -> List[str]:
+    if pth.suffix == ".hack":
+        return pth.read_text().split()
+
+    return Assembler(Parser(preprocess(pth).text)).assemble()
+
+
+class Script:
+    __slots__ = (
+        "__path",
+        "__statements",
+        "__simulator",
+        "__columns",
+        "__compare",
+        "__output",
+        "__outputs",
+    )
+
+    def __init__(self, pth: Path):
+        self.__path = pth
+        self.__statements = self.__parse(iter(_tokens(pth.read_text())))
+        self.__simulator: Optional[Simulator] = None
+        self.__columns: List[Column] = []
+        self.__compare: List[str] = []
+        self.__output: Optional[TextIO] = None
+        self.__outputs = 0
+
+    @property
+    def statements(self) -> List[Statement]:
+        return self.__statements
+
+    def __error(self, line: int, message: str) -> ScriptError:
+        return ScriptError(self.__path.name, line, message)
+
+    def __parse(self, tokens: Iterator[Token], nested: bool = False) -> List[Statement]:
+        statements = []
+        words: List[str] = []
+        line = 0
+        for token, num in tokens:
+            if not words:
+                line = num
+            if token in TERMINATORS:
+                if words:
+                    statements.append(Statement(line, words))
+                words = []
+            elif token == "{":
+                if not words or words[0] not in ("repeat", "while"):
+                    raise self.__error(num, "Unexpected {")
+                statements.append(Statement(line, words, self.__parse(tokens, True)))
+                words = []
+            elif token == "}":
+                if not nested:
+                    raise self.__error(num, "Unexpected }")
+                break
+            else:
+                words.append(token)
+        else:
+            if nested:
+                raise self.__error(line, "Missing }")
+
+        if words:
+            statements.append(Statement(line, words))
+        return statements
+
+    def run(self) -> Result:
+        start = time.perf_counter()
+        cycles = 0
+        try:
+            self.__execute(self.__statements)
+            message = ""
+            if self.__outputs < len(self.__compare):
+                message = f"Expected {len(self.__compare)} lines, got {self.__outputs}"
+        except (ScriptError, OSError, MemoryAccessError) as err:
+            message = str(err)
+        finally:
+            if self.__output is not None:
+                self.__output.close()
+                self.__output = None
+            if self.__simulator is not None:
+                cycles = self.__simulator.cycles
+
+        seconds = time.perf_counter() - start
+        return Result(
+            self.__path.name, not message, self.__outputs, cycles, seconds, message
+        )
+
+    def __execute(self, statements: Sequence[Statement]) -> None:
+        for statement in statements:
+            if statement.body is not None:
+                self.__loop(statement, statement.body)
+            else:
+                self.__command(statement.line, statement.words)
+
+    def __loop(self, statement: Statement, body: List[Statement]) -> None:
+        words = statement.words
+        simulator = self.__machine(statement.line)
+        if words[0] == "repeat" and len(words) == 2:
+            count = self.__number(statement.line, words[1])
+            # The common `repeat N { ticktock; }` runs in one go
+            if [s.words for s in body] == [["ticktock"]]:
+                simulator.run(max(count, 0))
+                return
+            for _ in range(count):
+                self.__execute(body)
+        elif words[0] == "while" and len(words) == 4 and words[2] in CONDITIONS:
+            condition = CONDITIONS[words[2]]
+            iterations = 0
+            while condition(
+                self.__value(statement.line, words[1]),
+                self.__value(statement.line, words[3]),
+            ):
+                iterations += 1
+                if iterations > MAX_ITERATIONS:
+                    raise self.__error(statement.line, "Loop did not finish")
+                self.__execute(body)
+        else:
+            raise self.__error(statement.line, f"Invalid loop: {' '.join(words)}")
+
+    def __command(self, line: int, words: List[str]) -> None:
+        command, args = words[0], words[1:]
+        if command == "load" and len(args) == 1:
+            pth = self.__path.parent.joinpath(args[0])
+            try:
+                self.__simulator = Simulator.from_binary(load_rom(pth))
+            except LOAD_ERRORS as err:
+                raise self.__error(line, f"Cannot load {args[0]}: {err}")
+        elif command == "output-file" and len(args) == 1:
+            self.__output = self.__path.parent.joinpath(args[0]).open("w")
+        elif command == "compare-to" and len(args) == 1:
+            text = self.__path.parent.joinpath(args[0]).read_text()
+            self.__compare = text.splitlines()
+        elif command == "output-list":
+            self.__columns = [self.__column(arg) for arg in args]
+            headers = [column.header() for column in self.__columns]
+            self.__write(line, "|" + "|".join(headers) + "|")
+        elif command == "set" and len(args) == 2:
+            self.__set(line, args[0], self.__number(line, args[1]))
+        elif command == "ticktock" and not args:
+            self.__machine(line).run(1)
+        elif command == "output" and not args:
+            values = [c.format(self.__value(line, c.name)) for c in self.__columns]
+            self.__write(line, "|" + "|".join(values) + "|")
+        elif command not in ("echo", "clear-echo"):
+            raise self.__error(line, f"Invalid command: {' '.join(words)}")
+
+    def __machine(self, line: int) -> Simulator:
+        if self.__simulator is None:
+            raise self.__error(line, "No program loaded")
+        return self.__simulator
+
+    @staticmethod
+    def __column(spec: str) -> Column:
+        match = COLUMN_RE.match(spec)
+        if match is None:
+            # A bare name gets the decimal format the Java tools default to
+            return Column(spec, "D", 1, 6, 1)
+        name, fmt, left, width, right = match.groups()
+        return Column(name, fmt, int(left), int(width), int(right))
+
+    def __number(self, line: int, text: str) -> int:
+        base = {"%B": 2, "%X": 16, "%D": 10}.get(text[:2].upper())
+        try:
+            return int(text[2:], base) if base else int(text)
+        except ValueError:
+            raise self.__error(line, f"Invalid number: {text}")
+
+    def __value(self, line: int, name: str) -> int:
+        simulator = self.__machine(line)
+        ram = RAM_RE.match(name)
+        if ram:
+            return simulator.memory[self.__address(line, ram.group(1))]
+        if name == "PC":
+            return simulator.pc
+        if name == "A":
+            return wrap(simulator.a)
+        if name == "D":
+            return simulator.d
+        if name == "time":
+            return simulator.cycles
+        try:
+            return self.__number(line, name)
+        except ScriptError:
+            raise self.__error(line, f"Unknown variable: {name}")
+
+    def __address(self, line: int, text: str) -> int:
+        address = int(text)
+        if address >= len(self.__machine(line).memory):
+            raise self.__error(line, f"Address out of range: {address}")
+        return address
+
+    def __set(self, line: int, target: str, value: int) -> None:
+        simulator = self.__machine(line)
+        ram = RAM_RE.match(target)
+        if ram:
+            simulator.memory[self.__address(line, ram.group(1))] = value
+        elif target == "PC":
+            simulator.pc = value
+        elif target == "A":
+            simulator.a = value
+        elif target == "D":
+            simulator.d = value
+        else:
+            raise self.__error(line, f"Cannot set {target}")
+
+    def __write(self, line: int, text: str) -> None:
+        if self.__output is not None:
+            self.__output.write(text + "\n")
+
+        num = self.__outputs
+        self.__outputs += 1
+        if num < len(self.__compare) and not _matches(text, self.__compare[num]):
+            raise self.__error(line, f"Comparison failure at line {num + 1}")
+
+
+def run_script(pth: Path) -> Result:
+    try:
+        return Script(pth).run()
+    except (ScriptError, OSError) as err:
+        return Result(pth.name, False, 0, 0, 0.0, str(err))
+
+
+def tst_files(pth: Path) -> List[Path]:
+    if pth.is_dir():
+        return sorted(pth.rglob("*.tst"))
+    return [pth]
+
+
+def run_scripts(paths: Sequence[Path], jobs: int = 1) -> List[Result]:
+    # Scripts share nothing, so each can run in its own worker
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            return list(pool.map(run_script, paths))
+
+    return [run_script(pth) for pth in paths]
@@ -0,0 +1,113 @@
+import struct
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+# magic, version, cycle of the first record
+TRACE_HEADER = struct.Struct("<4sHQ")
+TRACE_MAGIC = b"HTRC"
+TRACE_VERSION = 1
+
+# PC, A and D after the cycle, address and value of the memory write
+TRACE_RECORD = struct.Struct("<HhhHh")
+NO_WRITE = 0xFFFF
+
+BLOCK_RECORDS = 1 << 16
+
+
+class TraceError(ValueError):
+    pass
+
+
+class TraceRecord(NamedTuple):
+    cycle: int
+    pc: int
+    a: int
+    d: int
+    address: Optional[int]
+    value: int
+
+
+class TraceWriter:
+    __slots__ = "__file", "__buffer", "__block_size", "__next_cycle"
+
+    def __init__(
+        self, pth: Path, start_cycle: int = 0, block_records: int = BLOCK_RECORDS
+    ):
+        header = TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, start_cycle)
+        self.__file = pth.open("wb")
+        self.__file.write(header)
+        self.__buffer = bytearray()
+        self.__block_size = block_records * TRACE_RECORD.size
+        self.__next_cycle = start_cycle
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @property
+    def next_cycle(self) -> int:
+        return self.__next_cycle
+
+    def record(self, pc: int, a: int, d: int, address: int, value: int) -> None:
+        self.__buffer += TRACE_RECORD.pack(pc, a, d, address, value)
+        self.__next_cycle += 1
+        if len(self.__buffer) >= self.__block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.__file.write(self.__buffer)
+        self.__buffer.clear()
+        self.__file.flush()
+
+    def close(self) -> None:
+        if not self.__file.closed:
+            self.flush()
+            self.__file.close()
+
+
+def _read_header(f) -> int:
+    header = f.read(TRACE_HEADER.size)
+    if len(header) != TRACE_HEADER.size:
+        raise TraceError("Not an execution trace")
+
+    magic, version, start_cycle = TRACE_HEADER.unpack(header)
+    if magic != TRACE_MAGIC or version != TRACE_VERSION:
+        raise TraceError("Not an execution trace")
+
+    return start_cycle
+
+
+def trace_bounds(pth: Path) -> Tuple[int, int]:
+    # First cycle and one past the last cycle stored in the trace
+    with pth.open("rb") as f:
+        start_cycle = _read_header(f)
+
+    records = (pth.stat().st_size - TRACE_HEADER.size) // TRACE_RECORD.size
+    return start_cycle, start_cycle + records
+
+
+def read_trace(
+    pth: Path,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+    block_records: int = BLOCK_RECORDS,
+) -> Iterator[TraceRecord]:
+    first, end = trace_bounds(pth)
+    start = first if start is None else max(start, first)
+    stop = end if stop is None else min(stop, end)
+    size = TRACE_RECORD.size
+
+    with pth.open("rb") as f:
+        # Records are fixed size, so a cycle maps straight to a file offset
+        f.seek(TRACE_HEADER.size + (start - first) * size)
+        cycle = start
+        while cycle < stop:
+            count = min(block_records, stop - cycle)
+            block = f.read(count * size)
+            for pc, a, d, address, value in TRACE_RECORD.iter_unpack(block):
+                yield TraceRecord(
+                    cycle, pc, a, d, None if address == NO_WRITE else address, value
+                )
+                cycle += 1
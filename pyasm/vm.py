@@ -0,0 +1,300 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from pyasm.parser import CommandType, Instruction
+
+SEGMENTS = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
+FIXED = {"temp": 5, "pointer": 3}
+FIXED_SIZE = {"temp": 8, "pointer": 2}
+
+BINARY = {"add": "D+M", "sub": "M-D", "and": "D&M", "or": "D|M"}
+UNARY = {"neg": "-M", "not": "!M"}
+COMPARE = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+
+MAX_CONSTANT = 24576
+STACK_BASE = 256
+ENTRY = "Sys.init"
+# Labels become `function$label`, so with no `$` in them they never meet the
+# `function$$kind.n` labels made up by the translator
+LABEL_RE = re.compile(r"^[A-Za-z_.:][\w.:]*$")
+
+
+class VMError(ValueError):
+    def __init__(self, module: str, line: int, message: str):
+        msg = f"{module}.vm:{line}: {message}"
+        super(VMError, self).__init__(msg)
+        self.line = line
+
+
+class Translator:
+    __slots__ = "__module", "__out", "__function", "__counter", "__line"
+
+    def __init__(self, module: str):
+        self.__module = module
+        self.__out: List[Instruction] = []
+        self.__function = module
+        self.__counter = 0
+        self.__line = 0
+
+    def __a(self, symbol) -> None:
+        self.__out.append(
+            Instruction(CommandType.A_COMMAND, str(symbol), line=self.__line)
+        )
+
+    def __c(self, dest: str, comp: str, jmp: str = "") -> None:
+        self.__out.append(
+            Instruction(CommandType.C_COMMAND, "", dest, comp, jmp, self.__line)
+        )
+
+    def __label(self, symbol: str) -> None:
+        self.__out.append(
+            Instruction(CommandType.L_COMMAND, symbol, line=self.__line)
+        )
+
+    def __unique(self, kind: str) -> str:
+        self.__counter += 1
+        return f"{self.__function}$${kind}.{self.__counter}"
+
+    def __scoped(self, label: str) -> str:
+        if not LABEL_RE.match(label):
+            raise self.__error(f"Invalid label: {label}")
+        return f"{self.__function}${label}"
+
+    def __push_d(self) -> None:
+        self.__a("SP")
+        self.__c("AM", "M+1")
+        self.__c("A", "A-1")
+        self.__c("M", "D")
+
+    def __pop_d(self) -> None:
+        self.__a("SP")
+        self.__c("AM", "M-1")
+        self.__c("D", "M")
+
+    def __error(self, message: str) -> VMError:
+        return VMError(self.__module, self.__line, message)
+
+    def __index(self, segment: str, index: str) -> int:
+        if not index.isdigit():
+            raise self.__error(f"Invalid index: {index}")
+
+        value = int(index)
+        if segment == "constant" and value > 0x7FFF:
+            raise self.__error(f"Constant out of range: {value}")
+        if segment in FIXED_SIZE and value >= FIXED_SIZE[segment]:
+            raise self.__error(f"Index out of range for {segment}: {value}")
+        return value
+
+    def __push(self, segment: str, index: int) -> None:
+        if segment == "constant":
+            # The assembler only takes constants up to MAX_CONSTANT
+            self.__a(min(index, MAX_CONSTANT))
+            self.__c("D", "A")
+            if index > MAX_CONSTANT:
+                self.__a(index - MAX_CONSTANT)
+                self.__c("D", "D+A")
+        elif segment in SEGMENTS:
+            self.__a(index)
+            self.__c("D", "A")
+            self.__a(SEGMENTS[segment])
+            self.__c("A", "D+M")
+            self.__c("D", "M")
+        elif segment in FIXED:
+            self.__a(FIXED[segment] + index)
+            self.__c("D", "M")
+        elif segment == "static":
+            self.__a(f"{self.__module}.{index}")
+            self.__c("D", "M")
+        else:
+            raise self.__error(f"Unknown segment: {segment}")
+
+        self.__push_d()
+
+    def __pop(self, segment: str, index: int) -> None:
+        if segment in SEGMENTS:
+            # The target address waits in R13 while the stack is popped
+            self.__a(index)
+            self.__c("D", "A")
+            self.__a(SEGMENTS[segment])
+            self.__c("D", "D+M")
+            self.__a("R13")
+            self.__c("M", "D")
+            self.__pop_d()
+            self.__a("R13")
+            self.__c("A", "M")
+        elif segment in FIXED or segment == "static":
+            self.__pop_d()
+            if segment == "static":
+                self.__a(f"{self.__module}.{index}")
+            else:
+                self.__a(FIXED[segment] + index)
+        else:
+            raise self.__error(f"Cannot pop to segment: {segment}")
+
+        self.__c("M", "D")
+
+    def __arithmetic(self, command: str) -> None:
+        if command in UNARY:
+            self.__a("SP")
+            self.__c("A", "M-1")
+            self.__c("M", UNARY[command])
+            return
+
+        self.__pop_d()
+        self.__c("A", "A-1")
+        if command in BINARY:
+            self.__c("M", BINARY[command])
+            return
+
+        # Assume true, then overwrite with false when the jump is not taken
+        done = self.__unique("cmp")
+        self.__c("D", "M-D")
+        self.__c("M", "-1")
+        self.__a(done)
+        self.__c("", "D", COMPARE[command])
+        self.__a("SP")
+        self.__c("A", "M-1")
+        self.__c("M", "0")
+        self.__label(done)
+
+    def __call(self, function: str, args: int) -> None:
+        ret = self.__unique("ret")
+        self.__a(ret)
+        self.__c("D", "A")
+        self.__push_d()
+        for pointer in ("LCL", "ARG", "THIS", "THAT"):
+            self.__a(pointer)
+            self.__c("D", "M")
+            self.__push_d()
+
+        # ARG = SP - args - 5, LCL = SP
+        self.__a("SP")
+        self.__c("D", "M")
+        self.__a(args + 5)
+        self.__c("D", "D-A")
+        self.__a("ARG")
+        self.__c("M", "D")
+        self.__a("SP")
+        self.__c("D", "M")
+        self.__a("LCL")
+        self.__c("M", "D")
+        self.__a(function)
+        self.__c("", "0", "JMP")
+        self.__label(ret)
+
+    def __return(self) -> None:
+        # R13 holds the frame, R14 the return address
+        self.__a("LCL")
+        self.__c("D", "M")
+        self.__a("R13")
+        self.__c("M", "D")
+        self.__a(5)
+        self.__c("A", "D-A")
+        self.__c("D", "M")
+        self.__a("R14")
+        self.__c("M", "D")
+        self.__pop_d()
+        self.__a("ARG")
+        self.__c("A", "M")
+        self.__c("M", "D")
+        self.__a("ARG")
+        self.__c("D", "M+1")
+        self.__a("SP")
+        self.__c("M", "D")
+        for pointer in ("THAT", "THIS", "ARG", "LCL"):
+            self.__a("R13")
+            self.__c("AM", "M-1")
+            self.__c("D", "M")
+            self.__a(pointer)
+            self.__c("M", "D")
+        self.__a("R14")
+        self.__c("A", "M")
+        self.__c("", "0", "JMP")
+
+    def bootstrap(self) -> List[Instruction]:
+        self.__a(STACK_BASE)
+        self.__c("D", "A")
+        self.__a("SP")
+        self.__c("M", "D")
+        self.__call(ENTRY, 0)
+        return self.__out
+
+    def translate(self, text: str) -> List[Instruction]:
+        for line_num, line in enumerate(text.splitlines(), 1):
+            if "//" in line:
+                line = line[: line.index("//")]
+            words = line.split()
+            if not words:
+                continue
+
+            self.__line = line_num
+            command, args = words[0], words[1:]
+            expected = 2 if command in ("push", "pop", "function", "call") else 0
+            if command in ("label", "goto", "if-goto"):
+                expected = 1
+            if len(args) != expected:
+                raise self.__error(f"Invalid command: {line.strip()}")
+
+            if command == "push":
+                self.__push(args[0], self.__index(args[0], args[1]))
+            elif command == "pop":
+                self.__pop(args[0], self.__index(args[0], args[1]))
+            elif command in BINARY or command in UNARY or command in COMPARE:
+                self.__arithmetic(command)
+            elif command == "label":
+                self.__label(self.__scoped(args[0]))
+            elif command == "goto":
+                self.__a(self.__scoped(args[0]))
+                self.__c("", "0", "JMP")
+            elif command == "if-goto":
+                self.__pop_d()
+                self.__a(self.__scoped(args[0]))
+                self.__c("", "D", "JNE")
+            elif command == "function":
+                self.__function = args[0]
+                self.__label(args[0])
+                for _ in range(self.__index("function", args[1])):
+                    self.__a("SP")
+                    self.__c("AM", "M+1")
+                    self.__c("A", "A-1")
+                    self.__c("M", "0")
+            elif command == "call":
+                self.__call(args[0], self.__index("call", args[1]))
+            elif command == "return":
+                self.__return()
+            else:
+                raise self.__error(f"Invalid command: {line.strip()}")
+
+        return self.__out
+
+
+def translate_file(pth: Path) -> List[Instruction]:
+    return Translator(pth.stem).translate(pth.read_text())
+
+
+def vm_files(pth: Path) -> List[Path]:
+    if pth.is_dir():
+        return sorted(pth.glob("*.vm"))
+    return [pth]
+
+
+def translate_files(
+    paths: Sequence[Path], bootstrap: Optional[bool] = None, jobs: int = 1
+) -> List[Instruction]:
+    # Each file is translated on its own, so files can go to separate workers
+    if bootstrap is None:
+        bootstrap = any(pth.stem == "Sys" for pth in paths)
+
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            translated = list(pool.map(translate_file, paths))
+    else:
+        translated = [translate_file(pth) for pth in paths]
+
+    result = Translator("Bootstrap").bootstrap() if bootstrap else []
+    for instructions in translated:
+        result.extend(instructions)
+
+    return result
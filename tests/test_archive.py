@@ -0,0 +1,57 @@
+from array import array
+from pathlib import Path
+
+import pytest
+from pyasm.archive import ARCHIVE_HEADER, Archive, ArchiveError, ArchiveWriter
+
+
+def test_archive_round_trip(tmp_path: Path):
+    pth = tmp_path.joinpath("out.pack")
+    programs = {"Max": [0, 1, 0xFFFF], "sub/Empty": [], "Add": list(range(300))}
+
+    with ArchiveWriter(pth, block_size=16) as writer:
+        for name, words in programs.items():
+            writer.add(name, words)
+        assert not pth.exists()
+
+    assert not tmp_path.joinpath("out.pack.tmp").exists()
+    with Archive(pth) as archive:
+        assert list(archive) == list(programs)
+        assert len(archive) == 3 and "Max" in archive and "Nope" not in archive
+        for name, words in programs.items():
+            assert archive[name] == array("H", words)
+            assert archive.verify(name)
+        assert archive.entry("Max").offset == ARCHIVE_HEADER.size
+        with archive.view("Max") as view:
+            assert len(view) == 6
+
+        with pytest.raises(ArchiveError):
+            archive["Nope"]
+
+
+def test_archive_duplicates_and_discard(tmp_path: Path):
+    pth = tmp_path.joinpath("out.pack")
+
+    with pytest.raises(ArchiveError):
+        with ArchiveWriter(pth) as writer:
+            writer.add("Max", [1])
+            writer.add("Max", [2])
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_archive_detects_corruption(tmp_path: Path):
+    pth = tmp_path.joinpath("out.pack")
+    with ArchiveWriter(pth) as writer:
+        writer.add("Max", [1, 2])
+
+    data = bytearray(pth.read_bytes())
+    data[ARCHIVE_HEADER.size] ^= 1
+    pth.write_bytes(data)
+    with Archive(pth) as archive:
+        assert not archive.verify("Max")
+
+    for data in (b"", b"HTRC" + bytes(20), pth.read_bytes()[:-4]):
+        pth.write_bytes(data)
+        with pytest.raises(ArchiveError):
+            Archive(pth)
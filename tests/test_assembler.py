@@ -3,7 +3,8 @@ from pathlib import Path
 import pytest
 
 from pyasm.assembler import AddressOutOfRange, Assembler
-from pyasm.parser import Parser
+from pyasm.coder import SymbolInterner
+from pyasm.parser import CommandType, Diagnostic, Instruction, Parser
 
 
 def test_addr_out_of_range():
@@ -76,3 +77,108 @@ def test_assembler_with_max_l_file():
     expected = load_file("MaxL.hack").splitlines()
 
     assert output == expected
+
+
+def test_assembler_symbol_ids():
+    parser = Parser("@i\n(LOOP)\n@LOOP\nM=1\n@i\n@7\n@kbd\n")
+    assembler = Assembler(parser)
+
+    output = assembler.assemble()
+
+    ids = assembler.symbol_ids.tolist()
+    assert ids[0] == ids[4]
+    assert ids[1] == ids[2]
+    assert ids[3] == ids[5] == -1
+    assert assembler.interner.name(ids[1]) == "LOOP"
+    assert ids[6] < SymbolInterner.RESERVED
+    assert output[-1] == "0110000000000000"
+
+
+def test_assembler_keeps_symbols_between_runs():
+    assembler = Assembler()
+    first = assembler.assemble(Parser("@i\n@j\n").instructions())
+    second = assembler.assemble(Parser("@k\n@i\n").instructions())
+
+    assert first == ["0000000000010000", "0000000000010001"]
+    assert second == ["0000000000010010", "0000000000010000"]
+
+
+def test_assembler_allocates_variables():
+    parser = Parser("@i\nM=1\n@j\nM=0\n@i\nD=M")
+    assembler = Assembler(parser)
+
+    output = assembler.assemble()
+
+    assert len(output) == 6
+    assert output[0] == "0000000000010000"
+    assert output[2] == "0000000000010001"
+    assert output[4] == "0000000000010000"
+
+
+def test_addr_out_of_range_reports_source_line():
+    parser = Parser("// comment\n\n@1\n\n@24579\n")
+    assembler = Assembler(parser)
+
+    with pytest.raises(AddressOutOfRange) as err:
+        _ = assembler.assemble()
+
+    assert "line : 5" in str(err.value)
+
+
+def test_assembler_collects_errors_and_keeps_addresses():
+    parser = Parser("@24579\n(LOOP)\n@30000\n@LOOP\n0;JMP\n")
+    errors = []
+
+    output = Assembler(parser).assemble(errors=errors)
+
+    assert output[:3] == ["0" * 16, "0" * 16, "0000000000000001"]
+    assert errors == [
+        Diagnostic(1, "Address out of range: 24579"),
+        Diagnostic(3, "Address out of range: 30000"),
+    ]
+
+
+def test_invalid_commands_keep_label_addresses():
+    parser = Parser("@1\nM=Q\n(L)\n@L\n0;JMP\n")
+    errors = []
+
+    words = Assembler(parser).assemble(parser.instructions(errors), errors)
+
+    assert words == ["0" * 15 + "1", "0" * 16, "0" * 14 + "10", "1110101010000111"]
+    assert errors == [Diagnostic(2, "Invalid Command: M=Q")]
+
+
+def test_check_reports_what_assemble_would():
+    code = "@24579\n(LOOP)\n@x\n@LOOP\n0;JMP\n"
+    instructions = Parser(code).instructions() + [
+        Instruction(CommandType.C_COMMAND, dest="Q", comp="D", line=6)
+    ]
+    errors = []
+
+    assert Assembler().check(instructions, errors) is None
+    assert errors == [
+        Diagnostic(1, "Address out of range: 24579"),
+        Diagnostic(6, "Invalid mnemonic for `dest`: Q"),
+    ]
+
+    with pytest.raises(AddressOutOfRange):
+        Assembler(Parser(code)).check()
+    assert Assembler(Parser("@x\n(x)\nd=m;jmp\n")).check() is None
+
+
+@pytest.mark.integ_test
+@pytest.mark.integ_assembler
+def test_assembler_source_map_with_max_file():
+    parser = Parser(load_file("Max.asm"))
+    assembler = Assembler(parser)
+
+    output = assembler.assemble()
+    source_map = assembler.source_map
+
+    assert len(source_map) == len(output)
+    assert source_map.line_of(0) == 8
+    assert source_map.line_of(10) == 19
+    assert source_map.label_of(10) == "OUTPUT_FIRST"
+    assert source_map.label_of(11) == "OUTPUT_FIRST+1"
+    assert source_map.label_of(0) == ""
+    assert source_map.addresses_of(25) == [14]
@@ -0,0 +1,130 @@
+import io
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+from pyasm.batch import (
+    MemberWriter,
+    archive_suffix,
+    assemble_batch,
+    member_name,
+    members,
+)
+
+rootPth = Path(__file__).parent
+MAX = rootPth.joinpath("asm_files", "Max.asm").read_text()
+MAX_WORDS = [int(word, 2) for word in rootPth.joinpath("asm_files", "Max.hack").open()]
+SOURCES = {"a/Max.asm": MAX, "b/Bad.asm": "@1\nM=Q\n", "notes.txt": "M=Q\n"}
+
+
+def write_zip(pth: Path) -> None:
+    with zipfile.ZipFile(pth, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, text in SOURCES.items():
+            archive.writestr(name, text)
+
+
+def write_tar(pth: Path) -> None:
+    with tarfile.open(pth, "w:gz" if pth.name.endswith(".gz") else "w") as archive:
+        for name, text in SOURCES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(text)
+            archive.addfile(info, io.BytesIO(text.encode()))
+
+
+@pytest.mark.parametrize(
+    "name, suffix",
+    [("a.zip", ".zip"), ("a.TAR.GZ", ".tar.gz"), ("a.tgz", ".tgz"), ("a.asm", "")],
+)
+def test_archive_suffix(name: str, suffix: str):
+    assert archive_suffix(Path(name)) == suffix
+
+
+def test_members_are_in_file_order(tmp_path: Path):
+    pth = tmp_path.joinpath("in.tar")
+    write_tar(pth)
+
+    found = members(pth)
+
+    assert [member.name for member in found] == ["a/Max.asm", "b/Bad.asm"]
+    with pth.open("rb") as f:
+        f.seek(found[1].offset)
+        assert f.read(found[1].size) == b"@1\nM=Q\n"
+
+
+@pytest.mark.parametrize("name", ["in.zip", "in.tar", "in.tar.gz", "in"])
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_assemble_batch(tmp_path: Path, name: str, jobs: int):
+    pth = tmp_path.joinpath(name)
+    if name == "in":
+        for member, text in SOURCES.items():
+            pth.joinpath(member).parent.mkdir(parents=True, exist_ok=True)
+            pth.joinpath(member).write_text(text)
+    elif name.endswith(".zip"):
+        write_zip(pth)
+    else:
+        write_tar(pth)
+
+    programs = list(assemble_batch(pth, jobs=jobs))
+
+    assert [program.name for program in programs] == ["a/Max", "b/Bad"]
+    assert list(programs[0].words) == MAX_WORDS
+    assert programs[1].words is None
+    error = programs[1].report["errors"][0]
+    assert (error["file"], error["line"]) == (str(pth.joinpath("b/Bad.asm")), 2)
+
+
+def test_member_writer(tmp_path: Path):
+    for name in ("out.zip", "out.tar.xz"):
+        pth = tmp_path.joinpath(name)
+        with MemberWriter(pth) as writer:
+            writer.add("a/Max", MAX_WORDS)
+            assert not pth.exists()
+
+        if name.endswith(".zip"):
+            text = zipfile.ZipFile(pth).read("a/Max.hack").decode()
+        else:
+            text = tarfile.open(pth).extractfile("a/Max.hack").read().decode()
+        assert [int(word, 2) for word in text.split()] == MAX_WORDS
+
+    with pytest.raises(ValueError):
+        MemberWriter(tmp_path.joinpath("out.hack"))
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("a/Max.asm", "a/Max.asm"),
+        ("./a//Max.asm", "a/Max.asm"),
+        ("a\\Max.asm", "a/Max.asm"),
+        ("/abs/A.asm", None),
+        ("../up/A.asm", None),
+        ("a/../../A.asm", None),
+        ("C:/A.asm", None),
+    ],
+)
+def test_member_name(name: str, expected):
+    assert member_name(name) == expected
+
+
+def test_unsafe_and_duplicate_members_are_errors(tmp_path: Path):
+    pth = tmp_path.joinpath("in.zip")
+    with zipfile.ZipFile(pth, "w") as archive:
+        for name in ("/abs/A.asm", "../up/A.asm", "A.asm", "./A.asm"):
+            archive.writestr(zipfile.ZipInfo(name), MAX)
+
+    programs = list(assemble_batch(pth))
+
+    assert [program.words is None for program in programs] == [
+        True,
+        True,
+        False,
+        True,
+    ]
+    messages = [p.report["errors"][0]["message"] for p in programs if p.words is None]
+    assert messages == [
+        "Unsafe member name: /abs/A.asm",
+        "Unsafe member name: ../up/A.asm",
+        "Duplicate member: A.asm",
+    ]
+    assert programs[2].name == "A"
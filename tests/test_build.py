@@ -0,0 +1,157 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.build import BuildError, Project
+from pyasm.parser import Parser
+
+MAIN = "@count\nM=0\n@STEP\n0;JMP\n(BACK)\n(END)\n@END\n0;JMP\n"
+STEP = "(STEP)\n@count\nM=M+1\n@BACK\n0;JMP\n"
+OTHER = "@STEP\n0;JMP\n(BACK)\n@BACK\n0;JMP\n"
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    tmp_path.joinpath("lib").mkdir()
+    tmp_path.joinpath("main.asm").write_text(MAIN)
+    tmp_path.joinpath("lib", "step.asm").write_text(STEP)
+    tmp_path.joinpath("other.asm").write_text(OTHER)
+    manifest = tmp_path.joinpath("pyasm.json")
+    manifest.write_text(
+        json.dumps(
+            {
+                "programs": {
+                    "Main": ["main.asm", "lib/step.asm"],
+                    "Other": ["other.asm", "lib/step.asm"],
+                }
+            }
+        )
+    )
+    return manifest
+
+
+def touch(pth: Path, text: str = None) -> None:
+    if text is not None:
+        pth.write_text(text)
+    stat = pth.stat()
+    os.utime(pth, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_graph(project: Path):
+    nodes = Project(project).nodes
+    build = project.parent.joinpath("build")
+
+    assert len(nodes) == 5
+    assert nodes[build.joinpath("Main.hack")].deps == (
+        build.joinpath("main.hobj"),
+        build.joinpath("lib", "step.hobj"),
+    )
+
+
+def test_build_matches_assembly(project: Path):
+    result = Project(project).build(jobs=2)
+
+    assert result.failed == {}
+    assert len(result.built) == 5
+    main = Project(project).programs["Main"]
+    expected = Assembler(Parser(MAIN + STEP)).assemble()
+    assert main.read_text().split() == expected
+
+
+def test_incremental_build(project: Path):
+    Project(project).build()
+    step = project.parent.joinpath("lib", "step.asm")
+    build = project.parent.joinpath("build")
+
+    assert Project(project).stale() == []
+    assert Project(project).build().built == []
+
+    # A touched file with the same contents is not rebuilt
+    touch(step)
+    assert Project(project).build().built == []
+
+    # A comment changes the source but not the object, so nothing is relinked
+    touch(step, "// step\n" + STEP)
+    assert Project(project).build().built == [build.joinpath("lib", "step.hobj")]
+
+    touch(project.parent.joinpath("other.asm"), OTHER + "@BACK\n")
+    assert Project(project).stale() == [
+        build.joinpath("other.hobj"),
+        build.joinpath("Other.hack"),
+    ]
+    result = Project(project).build()
+    assert set(result.built) == {
+        build.joinpath("other.hobj"),
+        build.joinpath("Other.hack"),
+    }
+    assert len(result.up_to_date) == 3
+
+
+def test_build_failure(project: Path):
+    touch(project.parent.joinpath("main.asm"), "D=Q\n")
+
+    result = Project(project).build()
+
+    build = project.parent.joinpath("build")
+    assert list(result.failed) == [
+        build.joinpath("main.hobj"),
+        build.joinpath("Main.hack"),
+    ]
+    assert "main.asm" in result.failed[build.joinpath("main.hobj")]
+    assert "dependency failed" in result.failed[build.joinpath("Main.hack")]
+    assert not build.joinpath("Main.hack").exists()
+    assert build.joinpath("Other.hack").exists()
+
+
+@pytest.mark.parametrize(
+    "text", ['{"a": ', "[]", "", "{main: 1}", '{main: {"b": 1}}', "{main: [[1]]}"]
+)
+def test_damaged_state_file(project: Path, text: str):
+    Project(project).build()
+    build = project.parent.joinpath("build")
+    main = json.dumps(str(build.joinpath("main.hobj")))
+    build.joinpath(".pyasm-state.json").write_text(text.replace("main", main))
+
+    result = Project(project).build()
+
+    assert result.failed == {}
+    assert Project(project).stale() == []
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "[]",
+        '{"build_dir": "out"}',
+        '{"programs": ["main.asm"]}',
+        '{"programs": {"Main": "main.asm"}}',
+        '{"programs": {"Main": []}}',
+        '{"programs": {"Main": [1]}}',
+        '{"programs": {"Main": ["main.asm"]}, "build_dir": 1}',
+    ],
+)
+def test_invalid_manifest(tmp_path: Path, text: str):
+    manifest = tmp_path.joinpath("pyasm.json")
+    manifest.write_text(text)
+
+    with pytest.raises(BuildError):
+        Project(manifest)
+
+
+def test_included_files_are_inputs(project: Path):
+    root = project.parent
+    root.joinpath("lib", "inc.asm").write_text("#define BUMP(a)\n@a\nM=M+1\n#end\n")
+    touch(root.joinpath("main.asm"), '#include "lib/inc.asm"\nBUMP(R0)\n' + MAIN)
+    Project(project).build()
+    build = root.joinpath("build")
+
+    touch(root.joinpath("lib", "inc.asm"), "#define BUMP(a)\n@a\nM=M-1\n#end\n")
+
+    assert Project(project).stale() == [
+        build.joinpath("main.hobj"),
+        build.joinpath("Main.hack"),
+    ]
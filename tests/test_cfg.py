@@ -0,0 +1,103 @@
+from pathlib import Path
+
+from pyasm.assembler import Assembler
+from pyasm.cfg import Block, ControlFlowGraph
+from pyasm.parser import Parser
+
+
+def load_file(name: str):
+    return (
+        Path(__file__).parent.joinpath("asm_files").joinpath(name).read_text()
+    )
+
+
+def build(code: str) -> ControlFlowGraph:
+    return ControlFlowGraph.from_instructions(Parser(code).instructions())
+
+
+def test_max_blocks():
+    assembler = Assembler(Parser(load_file("Max.asm")))
+    assembler.assemble()
+    cfg = assembler.control_flow_graph
+
+    assert len(cfg) == 5
+    assert cfg.block(0) == Block(0, 6, (), False)
+    assert cfg.block(2) == Block(10, 12, ("OUTPUT_FIRST",), False)
+    assert cfg.block(4) == Block(14, 16, ("INFINITE_LOOP",), False)
+    assert [cfg.successors(idx).tolist() for idx in range(5)] == [
+        [1, 2],
+        [3],
+        [3],
+        [4],
+        [4],
+    ]
+    assert cfg.predecessors(3).tolist() == [1, 2]
+    assert cfg.block_of(11) == 2
+    assert cfg.reachable() == {0, 1, 2, 3, 4}
+    assert cfg.reachable(3) == {3, 4}
+    assert cfg.dominators() == {0: 0, 1: 0, 2: 0, 3: 0, 4: 3}
+    assert cfg.loops() == {4: {4}}
+
+
+def test_nested_loops():
+    code = """
+    @R0
+    M=0
+    (OUTER)
+    @R1
+    D=M
+    (INNER)
+    D=D-1
+    @INNER
+    D;JGT
+    @R0
+    M=M+1
+    D=M
+    @OUTER
+    D;JLT
+    (END)
+    @END
+    0;JMP
+    """
+    cfg = build(code)
+
+    outer, inner, tail, end = (cfg.block_of(address) for address in (2, 4, 7, 12))
+    assert cfg.loops() == {
+        outer: {outer, inner, tail},
+        inner: {inner},
+        end: {end},
+    }
+
+
+def test_unreachable_block():
+    cfg = build("@END\n0;JMP\n@R0\nM=1\n(END)\n@END\n0;JMP")
+
+    assert cfg.reachable() == {0, 2}
+    assert 1 not in cfg.dominators()
+    assert cfg.predecessors(1).tolist() == []
+
+
+def test_indirect_jump():
+    # A return through memory may reach any label loaded into A
+    code = (
+        "@RET\nD=A\n@R13\nM=D\n@SUB\n0;JMP\n"
+        "(RET)\n@RET\n0;JMP\n(SUB)\n@R13\nA=M\n0;JMP"
+    )
+    cfg = build(code)
+
+    sub = cfg.block_of(8)
+    assert cfg.block(sub) == Block(8, 11, ("SUB",), True)
+    assert cfg.successors(sub).tolist() == [cfg.block_of(6), sub]
+
+
+def test_numeric_targets_and_empty_program():
+    cfg = build("@3\n0;JMP\nD=0\nD=1\n@100\nD;JEQ")
+
+    assert [cfg.block(idx).start for idx in range(len(cfg))] == [0, 2, 3]
+    assert cfg.successors(0).tolist() == [2]
+    assert cfg.successors(2).tolist() == []
+
+    empty = ControlFlowGraph([], {})
+    assert len(empty) == 0
+    assert empty.reachable() == set()
+    assert empty.loops() == {}
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from pyasm.check import asm_files, check_file, check_files, error_lines
+
+rootPth = Path(__file__).parent
+
+
+def test_check_file_reports_errors(tmp_path: Path):
+    inpPth = tmp_path.joinpath("Bad.asm")
+    inpPth.write_text("@1\nM=Q\n@99999\nD;JXX\n")
+
+    report = check_file(inpPth, 2)
+
+    assert report["count"] == 3
+    assert error_lines(report) == [
+        f"{inpPth}:2: Invalid Command: M=Q",
+        f"{inpPth}:3: Address out of range: 99999",
+        "... 1 more errors",
+    ]
+    assert list(tmp_path.iterdir()) == [inpPth]
+
+
+def test_check_file_reports_unreadable_sources(tmp_path: Path):
+    empty = tmp_path.joinpath("Empty.asm")
+    empty.write_text("// nothing\n")
+    include = tmp_path.joinpath("Include.asm")
+    include.write_text('#include "Missing.asm"\n')
+
+    assert error_lines(check_file(empty)) == [
+        f"{empty}:1: The input must contain some code"
+    ]
+    assert check_file(include)["count"] == 1
+
+
+def test_check_files(tmp_path: Path):
+    good = rootPth.joinpath("asm_files", "Max.asm")
+    bad = tmp_path.joinpath("Bad.asm")
+    bad.write_text("M=Q\n")
+
+    assert asm_files(tmp_path) == [bad]
+    for jobs in (1, 2):
+        reports = check_files([good, bad, good], jobs=jobs)
+        assert [report["count"] for report in reports] == [0, 1, 0]
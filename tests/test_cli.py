@@ -1,5 +1,10 @@
+import json
+import shutil
+import zipfile
 from pathlib import Path
 
+import pytest
+from pyasm.archive import Archive
 from pyasm.cli import cli
 from typer.testing import CliRunner
 
@@ -83,3 +88,474 @@ def test_valid_assembly_with_given_out_path():
     assert not assembledPth.exists()
 
     assert output == expected_out
+
+
+def test_run():
+    result = runner.invoke(
+        cli, ["run", str(rootPth.joinpath("asm_files/Add.asm")), "--ram", "1"]
+    )
+
+    assert result.exit_code == 0
+    assert "Cycles: 6" in result.stdout
+    assert "RAM[0]: 5" in result.stdout
+
+
+def test_run_hack_file():
+    result = runner.invoke(cli, ["run", str(rootPth.joinpath("asm_files/Add.hack"))])
+
+    assert result.exit_code == 0
+    assert "RAM[0]: 5" in result.stdout
+
+
+def test_run_with_snapshot_and_resume(tmp_path: Path):
+    source = rootPth.joinpath("asm_files/Max.asm")
+    snapshot = tmp_path.joinpath("max.snap")
+
+    result = runner.invoke(
+        cli, ["run", str(source), "--cycles", "5", "--snapshot", str(snapshot)]
+    )
+    assert result.exit_code == 0
+    assert snapshot.exists()
+
+    result = runner.invoke(
+        cli, ["run", str(source), "--cycles", "5", "--resume", str(snapshot)]
+    )
+    assert result.exit_code == 0
+    assert "Cycles: 10" in result.stdout
+
+
+def test_run_with_profile(tmp_path: Path):
+    folded = tmp_path.joinpath("max.folded")
+    result = runner.invoke(
+        cli,
+        [
+            "run",
+            str(rootPth.joinpath("asm_files/Max.asm")),
+            "--cycles",
+            "50",
+            "--profile",
+            "--folded",
+            str(folded),
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert "INFINITE_LOOP" in result.stdout
+    assert "Max;INFINITE_LOOP;INFINITE_LOOP+1" in folded.read_text()
+
+
+def test_assembly_with_source_map(tmp_path: Path):
+    inpPth = rootPth.joinpath("asm_files/Max.asm")
+    out = tmp_path.joinpath("Max.hack")
+    result = runner.invoke(cli, ["assemble", str(inpPth), "--out", str(out), "--map"])
+
+    assert result.exit_code == 0
+    dumped = tmp_path.joinpath("Max.map").read_text().splitlines()
+    assert "(OUTPUT_FIRST) 10" in dumped
+    assert "0 8" in dumped
+
+
+def test_source_map_through_preprocessor(tmp_path: Path):
+    tmp_path.joinpath("lib").mkdir()
+    tmp_path.joinpath("lib", "inc.asm").write_text("@R2\nM=0\n")
+    main = tmp_path.joinpath("Main.asm")
+    main.write_text(
+        "// header\n"
+        '#include "lib/inc.asm"\n'
+        "#define BUMP(a)\n@a\nM=M+1\n#end\n"
+        "@R0\nD=M\nBUMP(R1)\n(END)\n@END\n0;JMP\n"
+    )
+
+    result = runner.invoke(cli, ["assemble", str(main), "--map"])
+
+    assert result.exit_code == 0
+    assert tmp_path.joinpath("Main.map").read_text().splitlines() == [
+        "(END) 6",
+        "0 1 lib/inc.asm",
+        "1 2 lib/inc.asm",
+        "2 7",
+        "3 8",
+        "4 9",
+        "5 9",
+        "6 11",
+        "7 12",
+    ]
+
+
+def test_run_with_trace(tmp_path: Path):
+    trace = tmp_path.joinpath("max.trc")
+    source = str(rootPth.joinpath("asm_files/Max.asm"))
+    result = runner.invoke(
+        cli, ["run", source, "--cycles", "20", "--trace", str(trace)]
+    )
+    assert result.exit_code == 0
+
+    result = runner.invoke(cli, ["trace", str(trace), "--address", "2"])
+    assert result.exit_code == 0
+    assert result.stdout.count("RAM[2] = 0") == 1
+
+
+def test_assembly_with_optimize(tmp_path: Path):
+    inpPth = tmp_path.joinpath("Jumps.asm")
+    inpPth.write_text("@END\n0;JMP\n@R0\nM=1\n(END)\n@END\n0;JMP\n")
+    out = tmp_path.joinpath("Jumps.hack")
+
+    result = runner.invoke(cli, ["assemble", str(inpPth), "--optimize"])
+
+    assert result.exit_code == 0
+    assert out.read_text().split() == ["0000000000000000", "1110101010000111"]
+
+
+def test_superopt(tmp_path: Path):
+    inpPth = tmp_path.joinpath("snippet.asm")
+    inpPth.write_text("D=M\nD=D+1\nM=D\n")
+    cache = tmp_path.joinpath("superopt.json")
+
+    result = runner.invoke(
+        cli, ["superopt", str(inpPth), "--max-length", "2", "--cache", str(cache)]
+    )
+
+    assert result.exit_code == 0
+    assert result.stdout.split() == ["MD=M+1"]
+
+    prog = tmp_path.joinpath("Inc.asm")
+    prog.write_text("@R0\nD=M\nD=D+1\nM=D\n(END)\n@END\n0;JMP\n")
+    result = runner.invoke(cli, ["assemble", str(prog), "--rules", str(cache)])
+
+    assert result.exit_code == 0
+    assert len(tmp_path.joinpath("Inc.hack").read_text().split()) == 4
+
+
+def test_superopt_not_found(tmp_path: Path):
+    inpPth = tmp_path.joinpath("snippet.asm")
+    inpPth.write_text("@x\nD=M\n")
+
+    result = runner.invoke(
+        cli, ["superopt", str(inpPth), "--cache", str(tmp_path.joinpath("c.json"))]
+    )
+
+    assert result.exit_code == 1
+    assert "Not a constant" in result.stdout
+
+
+def test_compile_and_link(tmp_path: Path):
+    main = tmp_path.joinpath("Main.asm")
+    main.write_text("@R0\nD=M\n@DOUBLE\n0;JMP\n")
+    double = tmp_path.joinpath("Double.asm")
+    double.write_text("(DOUBLE)\n@R1\nM=D+M\n(END)\n@END\n0;JMP\n")
+
+    for pth in (main, double):
+        result = runner.invoke(cli, ["assemble", str(pth), "-c"])
+        assert result.exit_code == 0
+
+    objects = [str(tmp_path.joinpath(name)) for name in ("Main.hobj", "Double.hobj")]
+    result = runner.invoke(cli, ["link", *objects])
+
+    assert result.exit_code == 0
+    whole = tmp_path.joinpath("Whole.asm")
+    whole.write_text(main.read_text() + double.read_text())
+    runner.invoke(cli, ["assemble", str(whole)])
+    linked = tmp_path.joinpath("Main.hack").read_text()
+    assert linked == tmp_path.joinpath("Whole.hack").read_text()
+
+
+def test_compile_rejects_optimize(tmp_path: Path):
+    main = tmp_path.joinpath("Main.asm")
+    main.write_text("@Helper\n0;JMP\n")
+    lib = tmp_path.joinpath("Lib.asm")
+    lib.write_text("@END\n0;JMP\n(Helper)\n@R0\nM=1\n(END)\n@END\n0;JMP\n")
+
+    result = runner.invoke(cli, ["assemble", str(lib), "-c", "--optimize"])
+
+    assert result.exit_code == 1
+    assert "cannot be written with `--optimize`" in result.stdout
+    assert not tmp_path.joinpath("Lib.hobj").exists()
+
+    for pth in (main, lib):
+        assert runner.invoke(cli, ["assemble", str(pth), "-c"]).exit_code == 0
+    objects = [str(tmp_path.joinpath(name)) for name in ("Main.hobj", "Lib.hobj")]
+    assert runner.invoke(cli, ["link", *objects]).exit_code == 0
+    # Helper sits after Main's two words and Lib's first two
+    assert tmp_path.joinpath("Main.hack").read_text().split()[0] == f"{4:016b}"
+
+
+def test_link_bad_object(tmp_path: Path):
+    bad = tmp_path.joinpath("Bad.hobj")
+    bad.write_text("not json")
+
+    result = runner.invoke(cli, ["link", str(bad)])
+
+    assert result.exit_code == 1
+    assert "Not an object file" in result.stdout
+
+
+def test_build(tmp_path: Path):
+    tmp_path.joinpath("main.asm").write_text("(END)\n@END\n0;JMP\n")
+    manifest = tmp_path.joinpath("pyasm.json")
+    manifest.write_text('{"programs": {"Main": ["main.asm"]}}')
+
+    result = runner.invoke(cli, ["build", str(manifest), "--dry-run"])
+    assert result.exit_code == 0
+    assert len(result.stdout.split()) == 2
+
+    result = runner.invoke(cli, ["build", str(manifest)])
+    assert result.exit_code == 0
+    assert "2 built, 0 up to date" in result.stdout
+
+    result = runner.invoke(cli, ["build", str(manifest)])
+    assert "0 built, 2 up to date" in result.stdout
+
+
+def test_assembly_with_preprocessor(tmp_path: Path):
+    tmp_path.joinpath("macros.asm").write_text("#define INC(a)\n@a\nM=M+1\n#end\n")
+    inpPth = tmp_path.joinpath("Main.asm")
+    inpPth.write_text('#include "macros.asm"\nINC(R0)\nINC(R1)\n')
+
+    result = runner.invoke(cli, ["assemble", str(inpPth)])
+
+    assert result.exit_code == 0
+    assert len(tmp_path.joinpath("Main.hack").read_text().split()) == 4
+
+    tmp_path.joinpath("macros.asm").write_text("#define INC(a)\n@a\nM=Q\n#end\n")
+    result = runner.invoke(cli, ["assemble", str(inpPth)])
+
+    assert result.exit_code == 1
+    assert f"{inpPth}:2: Invalid Command: M=Q" in result.stdout
+    assert f"{inpPth}:3: Invalid Command: M=Q" in result.stdout
+
+
+def test_assembly_reports_every_error(tmp_path: Path):
+    inpPth = tmp_path.joinpath("Bad.asm")
+    inpPth.write_text("@1\nM=Q\n@99999\nD;JXX\n@2\nM=Q\n")
+
+    result = runner.invoke(cli, ["assemble", str(inpPth), "--max-errors", "2"])
+
+    assert result.exit_code == 1
+    assert result.stdout.splitlines() == [
+        f"{inpPth}:2: Invalid Command: M=Q",
+        f"{inpPth}:3: Address out of range: 99999",
+        "... 2 more errors",
+    ]
+    assert not tmp_path.joinpath("Bad.hack").exists()
+
+
+def test_assembly_errors_as_json(tmp_path: Path):
+    inpPth = tmp_path.joinpath("Bad.asm")
+    inpPth.write_text("@1\nM=Q\n@99999\n")
+
+    result = runner.invoke(cli, ["assemble", str(inpPth), "--json"])
+
+    assert result.exit_code == 1
+    report = json.loads(result.stdout)
+    assert report["count"] == 2
+    assert not report["truncated"]
+    assert [(e["line"], e["message"]) for e in report["errors"]] == [
+        (2, "Invalid Command: M=Q"),
+        (3, "Address out of range: 99999"),
+    ]
+
+
+def test_vm(tmp_path: Path):
+    out = tmp_path.joinpath("Fib.hack")
+    vmDir = rootPth.joinpath("vm_files")
+
+    result = runner.invoke(cli, ["vm", str(vmDir), "--out", str(out), "--jobs", "2"])
+
+    assert result.exit_code == 0
+    result = runner.invoke(cli, ["run", str(out), "--cycles", "100000", "--ram", "7"])
+    assert result.exit_code == 0
+    assert "RAM[6]: 55" in result.stdout
+
+
+def test_vm_error(tmp_path: Path):
+    bad = tmp_path.joinpath("Bad.vm")
+    bad.write_text("push constant 1\npop constant 1\n")
+
+    result = runner.invoke(cli, ["vm", str(bad)])
+
+    assert result.exit_code == 1
+    assert "Bad.vm:2: Cannot pop" in result.stdout
+
+
+def test_disasm(tmp_path: Path):
+    out = tmp_path.joinpath("Max.asm")
+    result = runner.invoke(cli, ["disasm", str(rootPth.joinpath("asm_files/Max.hack"))])
+
+    assert result.exit_code == 0
+    assert "(L10)" in result.stdout.split()
+
+    result = runner.invoke(
+        cli,
+        ["disasm", str(rootPth.joinpath("asm_files/Max.hack")), "--out", str(out)],
+    )
+    assert result.exit_code == 0
+    runner.invoke(cli, ["assemble", str(out)])
+    assembled = tmp_path.joinpath("Max.hack").read_text()
+    assert assembled == rootPth.joinpath("asm_files/Max.hack").read_text()
+
+
+def test_test_scripts(tmp_path: Path):
+    shutil.copy(rootPth.joinpath("asm_files/Max.asm"), tmp_path)
+    for name in ("Max.tst", "Max.cmp"):
+        shutil.copy(rootPth.joinpath("tst_files", name), tmp_path)
+
+    result = runner.invoke(cli, ["test", str(tmp_path), "--jobs", "2"])
+
+    assert result.exit_code == 0
+    assert result.stdout.splitlines()[-1] == "1 passed, 0 failed"
+
+    tmp_path.joinpath("Max.cmp").write_text("|  RAM[0]  |\n")
+    result = runner.invoke(cli, ["test", str(tmp_path.joinpath("Max.tst"))])
+
+    assert result.exit_code == 1
+    assert "FAIL Max.tst" in result.stdout
+
+
+def test_run_with_screen_and_video(tmp_path: Path):
+    prog = tmp_path.joinpath("Fill.asm")
+    prog.write_text("@SCREEN\nM=-1\n(END)\n@END\n0;JMP\n")
+    screen = tmp_path.joinpath("screen.pbm")
+    video = tmp_path.joinpath("frames.raw")
+
+    result = runner.invoke(
+        cli,
+        [
+            "run",
+            str(prog),
+            "--cycles",
+            "100",
+            "--screen",
+            str(screen),
+            "--video",
+            str(video),
+            "--frame-every",
+            "25",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert screen.read_bytes()[11:13] == b"\xff\xff"
+    assert video.stat().st_size == 4 * 512 * 256
+
+
+def test_run_with_keys(tmp_path: Path):
+    prog = tmp_path.joinpath("Wait.asm")
+    prog.write_text("(WAIT)\n@KBD\nD=M\n@WAIT\nD;JEQ\n@R0\nM=D\n")
+    keys = tmp_path.joinpath("keys.txt")
+    keys.write_text("100 q\n")
+
+    result = runner.invoke(cli, ["run", str(prog), "--keys", str(keys), "--ram", "1"])
+
+    assert result.exit_code == 0
+    assert "RAM[0]: 113" in result.stdout
+
+    keys.write_text("100 nokey\n")
+    result = runner.invoke(cli, ["run", str(prog), "--keys", str(keys)])
+
+    assert result.exit_code == 1
+    assert "Unknown key: nokey" in result.stdout
+
+
+def test_fuzz(tmp_path: Path):
+    result = runner.invoke(cli, ["fuzz", "--iterations", "5", "--check", "link"])
+
+    assert result.exit_code == 0
+    assert result.stdout == "5 cases, 0 failures\n"
+
+    result = runner.invoke(cli, ["fuzz", "--check", "nope"])
+
+    assert result.exit_code == 1
+    assert "Unknown check nope" in result.stdout
+
+
+def test_check(tmp_path: Path):
+    shutil.copy(rootPth.joinpath("asm_files/Max.asm"), tmp_path)
+
+    result = runner.invoke(cli, ["check", str(tmp_path), "--jobs", "2"])
+
+    assert result.exit_code == 0
+    assert result.stdout == "1 files, 0 with errors\n"
+    assert not tmp_path.joinpath("Max.hack").exists()
+
+    bad = tmp_path.joinpath("Bad.asm")
+    bad.write_text("@1\nM=Q\n")
+    result = runner.invoke(cli, ["check", str(tmp_path), "--json"])
+
+    assert result.exit_code == 1
+    reports = json.loads(result.stdout)
+    assert [report["count"] for report in reports] == [1, 0]
+    assert reports[0]["errors"][0]["message"] == "Invalid Command: M=Q"
+
+
+def test_assemble_into_archive(tmp_path: Path):
+    shutil.copy(rootPth.joinpath("asm_files/Max.asm"), tmp_path)
+    tmp_path.joinpath("sub").mkdir()
+    shutil.copy(rootPth.joinpath("asm_files/MaxL.asm"), tmp_path.joinpath("sub"))
+    pack = tmp_path.joinpath("out.pack")
+
+    result = runner.invoke(cli, ["assemble", str(tmp_path), "--archive", str(pack)])
+
+    assert result.exit_code == 0
+    assert result.stdout == f"Packed 2 programs into {pack}\n"
+    expected = rootPth.joinpath("asm_files/Max.hack").read_text().split()
+    with Archive(pack) as archive:
+        assert list(archive) == ["Max", "sub/MaxL"]
+        assert list(archive["Max"]) == [int(word, 2) for word in expected]
+
+    tmp_path.joinpath("Bad.asm").write_text("M=Q\n")
+    result = runner.invoke(cli, ["assemble", str(tmp_path), "--archive", str(pack)])
+
+    assert result.exit_code == 1
+    assert "1 of 3 files have errors" in result.stdout
+    with Archive(pack) as archive:
+        assert len(archive) == 2
+
+
+def test_assemble_zip_to_matching_zip(tmp_path: Path):
+    submissions = tmp_path.joinpath("submissions.zip")
+    with zipfile.ZipFile(submissions, "w") as archive:
+        archive.write(rootPth.joinpath("asm_files/Max.asm"), "alice/Max.asm")
+
+    result = runner.invoke(cli, ["assemble", str(submissions), "--jobs", "2"])
+
+    out = tmp_path.joinpath("submissions.hack.zip")
+    assert result.exit_code == 0
+    assert result.stdout == f"Packed 1 programs into {out}\n"
+    expected = rootPth.joinpath("asm_files/Max.hack").read_text()
+    assert zipfile.ZipFile(out).read("alice/Max.hack").decode() == expected
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "submissions.hack.zip",
+        "submissions.zip",
+    ]
+
+    result = runner.invoke(cli, ["assemble", str(tmp_path)])
+
+    assert result.exit_code == 1
+    assert "Expected either `--archive` or a zip or tar" in result.stdout
+
+
+def test_assemble_unreadable_or_unsafe_archive(tmp_path: Path):
+    broken = tmp_path.joinpath("broken.zip")
+    broken.write_text("not a zip")
+
+    result = runner.invoke(cli, ["assemble", str(broken)])
+
+    assert result.exit_code == 1
+    assert result.exception is None or isinstance(result.exception, SystemExit)
+    assert f"{broken}:1: File is not a zip file" in result.stdout
+
+    unsafe = tmp_path.joinpath("unsafe.zip")
+    with zipfile.ZipFile(unsafe, "w") as archive:
+        archive.writestr("../up/A.asm", "@1\n")
+        archive.writestr("A.asm", "@1\n")
+        with pytest.warns(UserWarning):
+            archive.writestr("A.asm", "@2\n")
+    pack = tmp_path.joinpath("out.pack")
+
+    result = runner.invoke(cli, ["assemble", str(unsafe), "--archive", str(pack)])
+
+    assert result.exit_code == 1
+    assert "Unsafe member name: ../up/A.asm" in result.stdout
+    assert "Duplicate member: A.asm" in result.stdout
+    assert not pack.exists()
+    assert not tmp_path.joinpath("unsafe.hack.zip").exists()
@@ -1,6 +1,6 @@
 import pytest
 
-from pyasm.coder import Coder, InvalidMnemonicError, SymbolTable
+from pyasm.coder import Coder, InvalidMnemonicError, SymbolInterner, SymbolTable
 
 
 def test_coder_cannot_be_instantiated():
@@ -177,3 +177,49 @@ def test_setting_and_getting_symbol_table_entries_():
 
     symbol_table.clear()
     assert len(symbol_table) == 0
+
+
+def test_scoped_symbol_table():
+    exports = SymbolTable()
+    exports["main"] = 0
+    exports["shared"] = 10
+    scope = SymbolTable(exports)
+    scope["shared"] = 20
+
+    assert scope.parent is exports
+    assert scope["shared"] == 20
+    assert scope.get("main") == 0
+    assert scope["SCREEN"] == 16384
+    assert scope.get("missing", default=3) == 3
+
+    # Variables go to the outermost table so every module agrees on them
+    scope.add_variable("counter")
+    assert exports["counter"] == 16
+    assert SymbolTable(exports)["counter"] == 16
+    assert len(scope) == 1
+
+
+def test_interner_gives_dense_ids():
+    interner = SymbolInterner()
+    reserved = SymbolInterner.RESERVED
+
+    assert len(interner) == reserved
+    assert interner.intern("LOOP") == reserved
+    assert interner.intern("i") == reserved + 1
+    assert interner.intern("LOOP") == reserved
+    assert interner.name(reserved + 1) == "i"
+    assert len(interner) == reserved + 2
+
+
+def test_interner_reserved_symbols():
+    interner = SymbolInterner()
+    addresses = interner.addresses()
+
+    assert interner.intern("SCREEN") == interner.intern("screen")
+    assert addresses[interner.intern("ScReEn")] == 16384
+    assert addresses[interner.intern("R15")] == 15
+    assert len(interner) == SymbolInterner.RESERVED
+
+    # Only reserved symbols ignore case
+    assert interner.intern("loop") != interner.intern("LOOP")
+    assert interner.addresses()[interner.intern("loop")] == -1
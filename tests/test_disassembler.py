@@ -0,0 +1,103 @@
+import random
+from array import array
+from pathlib import Path
+
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.disassembler import (
+    MAX_CONSTANT,
+    DisassemblyError,
+    decode_table,
+    disassemble,
+    read_rom,
+    read_words,
+)
+from pyasm.parser import Parser
+
+rootPth = Path(__file__).parent
+
+
+def assemble(text: str) -> array:
+    return read_words(Assembler(Parser(text)).assemble())
+
+
+@pytest.mark.parametrize(
+    "word, text",
+    [
+        (0, "@0"),
+        (0x7FFF, "@32767"),
+        (0b1110101010000111, "0;JMP"),
+        (0b1111110111011000, "MD=M+1"),
+        (0b1110000010010000, "D=D+A"),
+        (0b1110001100000101, "D;JNE"),
+        (0b1110111111111111, "AMD=1;JMP"),
+    ],
+)
+def test_decode_table(word: int, text: str):
+    assert decode_table()[word] == text
+
+
+def test_decode_table_rejects_unused_words():
+    table = decode_table()
+
+    assert len(table) == 0x10000
+    assert table[0x8000] is None
+    assert table[0b1110100000000000] is None
+
+
+@pytest.mark.parametrize("name", ["Add", "Max", "MaxL"])
+def test_round_trip(name: str):
+    words = read_rom(rootPth.joinpath(f"asm_files/{name}.hack"))
+
+    assert assemble("\n".join(disassemble(words))) == words
+
+
+def test_round_trip_random_program():
+    # The parser has no syntax for a bare comp, so it never emits those words
+    rng = random.Random(7)
+    table = decode_table()
+    c_words = [w for w in range(0x8000, 0x10000) if table[w] and w & 0b111111]
+    words = array("H")
+    for _ in range(500):
+        words.append(rng.choice(c_words) if rng.random() < 0.6 else rng.randrange(64))
+
+    assert assemble("\n".join(disassemble(words))) == words
+
+
+def test_jump_targets_get_labels():
+    lines = disassemble(assemble("@3\nD;JGT\n@5\nD=A\n(END)\n@END\n0;JMP\n"))
+
+    assert lines == ["@L3", "D;JGT", "@5", "(L3)", "D=A", "(L4)", "@L4", "0;JMP"]
+
+
+def test_large_constants_get_labels():
+    words = array("H", [MAX_CONSTANT + 1, 0b1110110000010000])
+    words.extend([0] * MAX_CONSTANT)
+    lines = disassemble(words)
+
+    assert lines[0] == f"@L{MAX_CONSTANT + 1}"
+    assert lines[MAX_CONSTANT + 1] == f"(L{MAX_CONSTANT + 1})"
+    assert assemble("\n".join(lines)) == words
+
+    with pytest.raises(DisassemblyError) as err:
+        disassemble([30000, 0b1110110000010000])
+    assert "@30000 at address 0" in str(err.value)
+
+
+def test_undecodable_word():
+    with pytest.raises(DisassemblyError) as err:
+        disassemble([0, 0x8000])
+
+    assert "at address 1" in str(err.value)
+
+
+def test_read_binary_rom(tmp_path: Path):
+    rom = tmp_path.joinpath("Add.bin")
+    rom.write_bytes(bytes([0x00, 0x02, 0xEC, 0x10]))
+
+    assert disassemble(read_rom(rom)) == ["@2", "D=A"]
+
+    rom.write_bytes(b"\x00")
+    with pytest.raises(DisassemblyError):
+        read_rom(rom)
@@ -0,0 +1,64 @@
+import random
+from pathlib import Path
+
+import pytest
+from pyasm import fuzz
+from pyasm.parser import Parser
+
+
+@pytest.mark.parametrize("generator", [fuzz.generate, fuzz.generate_runnable])
+def test_generators_are_deterministic(generator):
+    first = generator(random.Random("0:1"), 30)
+    second = generator(random.Random("0:1"), 30)
+
+    assert first == second
+    assert first != generator(random.Random("0:2"), 30)
+
+
+def test_runnable_programs():
+    for num in range(50):
+        text = fuzz.generate_runnable(random.Random(num), 30)
+        assert fuzz._runnable(Parser(text).instructions())
+
+
+@pytest.mark.parametrize(
+    "text, runnable",
+    [
+        ("@1\nD=M\n(END)\n@END\n0;JMP\n", True),
+        ("@F\nD;JGT\nD=M\n(F)\n", False),
+        ("@F\nD=A\n(F)\n", False),
+        ("@i\nM=1\n", False),
+    ],
+)
+def test_runnable(text: str, runnable: bool):
+    assert fuzz._runnable(Parser(text).instructions()) is runnable
+
+
+def test_fuzz_clean():
+    assert fuzz.fuzz(fuzz.CHECKS, seed=0, iterations=20) == []
+
+
+def test_shrink():
+    lines = [str(n) for n in range(20)]
+    assert fuzz.shrink(lines, lambda lines: "7" in lines and "13" in lines) == [
+        "7",
+        "13",
+    ]
+
+
+def test_failures_are_shrunk_and_replayed(monkeypatch, tmp_path: Path):
+    def broken(text: str):
+        return "labels break it" if "(" in text else None
+
+    monkeypatch.setitem(fuzz.CHECKS, "broken", broken)
+    failures = fuzz.fuzz(["broken"], iterations=10, corpus=tmp_path)
+
+    assert failures
+    assert all(failure.program.count("\n") == 1 for failure in failures)
+    assert failures[0].message == "labels break it"
+    saved = sorted(tmp_path.glob("broken-0-*.asm"))
+    assert len(saved) == len(failures)
+
+    replayed = fuzz.fuzz(["broken"], iterations=0, corpus=tmp_path)
+
+    assert [failure.case for failure in replayed] == [pth.name for pth in saved]
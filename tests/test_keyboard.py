@@ -0,0 +1,89 @@
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.keyboard import Keyboard, KeyboardError, KeyEvent, key_code
+from pyasm.parser import Parser
+from pyasm.simulator import KBD, Simulator
+
+# Copies KBD into RAM[0], RAM[1], ... one word every 5 cycles
+ECHO = """
+@i
+M=0
+(LOOP)
+@KBD
+D=M
+@i
+A=M
+M=D
+@i
+M=M+1
+@LOOP
+0;JMP
+"""
+
+
+def echo_simulator() -> Simulator:
+    return Simulator.from_binary(Assembler(Parser(ECHO)).assemble())
+
+
+@pytest.mark.parametrize(
+    "key, code",
+    [("a", 97), ("Z", 90), ("space", 32), ("left", 130), ("F12", 152), ("200", 200)],
+)
+def test_key_code(key: str, code: int):
+    assert key_code(key) == code
+
+
+def test_parse():
+    keyboard = Keyboard.parse("# Pong\n30 right\n10 a  # press\n\n50 none\n")
+
+    assert keyboard.events == [
+        KeyEvent(10, 97),
+        KeyEvent(30, 132),
+        KeyEvent(50, 0),
+    ]
+    assert keyboard.next_cycle(10) == 30
+    assert keyboard.next_cycle(50) is None
+
+
+@pytest.mark.parametrize("text", ["10\n", "x a\n", "10 nokey\n"])
+def test_parse_errors(text: str):
+    with pytest.raises(KeyboardError):
+        Keyboard.parse(text)
+
+
+def test_events_reach_kbd_on_their_cycle():
+    simulator = echo_simulator()
+    simulator.keyboard = Keyboard.parse("11 a\n19 none\n")
+
+    simulator.run(30)
+
+    # KBD is read on cycles 3, 11, 19 and 27
+    assert [simulator.memory[n] for n in range(4)] == [0, 97, 0, 0]
+
+
+def test_keyboard_is_independent_of_how_the_run_is_split():
+    whole = echo_simulator()
+    whole.keyboard = Keyboard.parse("7 a\n19 b\n31 c\n")
+    whole.run(60)
+
+    stepped = echo_simulator()
+    stepped.keyboard = Keyboard.parse("7 a\n19 b\n31 c\n")
+    for _ in range(60):
+        stepped.step()
+
+    assert whole.memory.tobytes() == stepped.memory.tobytes()
+    assert whole.memory[KBD] == ord("c")
+
+
+def test_restore_replays_the_keyboard():
+    simulator = echo_simulator()
+    simulator.keyboard = Keyboard.parse("2 a\n15 b\n")
+    start = simulator.snapshot()
+    simulator.run(30)
+    first = simulator.memory.tobytes()
+
+    simulator.restore(start)
+    simulator.run(30)
+
+    assert simulator.memory.tobytes() == first
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.linker import LinkError, ObjectModule, link
+from pyasm.parser import Parser
+
+MAIN = """
+@count
+M=0
+(LOOP)
+@STEP
+0;JMP
+(BACK)
+@count
+D=M
+@LOOP
+D;JLT
+(END)
+@END
+0;JMP
+"""
+
+STEP = """
+(STEP)
+@count
+M=M+1
+@total
+M=D+M
+@SCREEN
+D=A
+@BACK
+0;JMP
+"""
+
+
+def compile_module(name: str, code: str) -> ObjectModule:
+    return Assembler(Parser(code)).compile(name)
+
+
+def test_compile_records_relocations():
+    module = compile_module("step", STEP)
+
+    assert len(module) == 8
+    assert module.labels == {"STEP": 0}
+    assert module.local.tolist() == []
+    assert module.externs == [(0, "count"), (2, "total"), (6, "BACK")]
+    assert module.words[4] == 16384
+
+    main = compile_module("main", MAIN)
+    assert main.local.tolist() == [6, 8]
+    assert main.words[8] == main.labels["END"]
+
+
+def test_link_matches_wholesale_assembly():
+    modules = [compile_module("main", MAIN), compile_module("step", STEP)]
+
+    expected = Assembler(Parser(MAIN + STEP)).assemble()
+
+    assert link(modules) == expected
+
+
+def test_object_file_round_trip():
+    module = compile_module("step", STEP)
+
+    loaded = ObjectModule.load(module.dump())
+
+    assert loaded.name == "step"
+    assert loaded.words == module.words
+    assert loaded.labels == module.labels
+    assert loaded.externs == module.externs
+    assert link([compile_module("main", MAIN), loaded]) == link(
+        [compile_module("main", MAIN), module]
+    )
+
+
+def test_module_labels_shadow_exports():
+    first = compile_module("a", "(LOOP)\n@LOOP\n0;JMP")
+    second = compile_module("b", "(LOOP)\n@LOOP\n0;JMP")
+
+    assert link([first, second]) == [
+        "0000000000000000",
+        "1110101010000111",
+        "0000000000000010",
+        "1110101010000111",
+    ]
+
+
+def damaged(**fields) -> str:
+    data = {"version": 1, "module": "x", "words": [0, 1], "labels": {"L": 1}}
+    data.update({"local": [1], "extern": [[0, "y"]]}, **fields)
+    return json.dumps(data)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "[]",
+        '{"version": 1}',
+        '{"version": 2, "module": "x"}',
+        damaged(module=None),
+        damaged(words=[65536]),
+        damaged(words=[0, "1"]),
+        damaged(labels={"L": 3}),
+        damaged(local=[2]),
+        damaged(words=[0, 60000]),
+        damaged(extern=[[0]]),
+        damaged(extern=[[5, "y"]]),
+        damaged(extern=[["y", 0]]),
+    ],
+)
+def test_load_rejects_bad_objects(text):
+    with pytest.raises(LinkError):
+        ObjectModule.load(text)
+
+
+def test_link_too_large():
+    module = ObjectModule("big", [0] * 20000, {}, [], [])
+
+    with pytest.raises(LinkError):
+        link([module, module])
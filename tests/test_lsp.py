@@ -0,0 +1,208 @@
+import json
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.lsp import ERROR, WARNING, Document, LanguageServer
+from pyasm.parser import Diagnostic, Parser
+
+URI = "file:///Max.asm"
+
+
+def load_file(name: str):
+    return (
+        Path(__file__).parent.joinpath("asm_files").joinpath(name).read_text()
+    )
+
+
+def line_of(document: Document, text: str) -> int:
+    return [line.strip() for line in document.lines].index(text)
+
+
+def test_symbols_match_the_assembler():
+    code = load_file("Max.asm") + "@count\nM=0\n@total\nM=0\n@count\n"
+    document = Document(code)
+    assembler = Assembler(Parser(code))
+    assembler.assemble()
+
+    for label, address in assembler.labels.items():
+        definition = document.index.labels[label]
+        assert definition.address == address
+        assert document.lines[definition.line].strip() == f"({label})"
+
+    assert document.index.variables == {"count": 16, "total": 17}
+    assert document.hover(line_of(document, "@total")) == "total: variable, RAM[17]"
+    assert document.hover(line_of(document, "@R0")) == "R0: predefined, RAM[0]"
+    assert (
+        document.hover(line_of(document, "@OUTPUT_FIRST"))
+        == "OUTPUT_FIRST: label, ROM[10]"
+    )
+    assert document.hover(line_of(document, "@R0") + 1) == ""
+
+
+def test_definition_and_references():
+    document = Document("@LOOP\n0;JMP\n(LOOP)\n@x\nM=0\n@LOOP\n@x\n")
+
+    assert document.definition(0).line == 2
+    assert document.definition(6).line == 3
+    assert document.references(5) == [0, 2, 5]
+    assert document.references(3) == [3, 6]
+    assert document.references(1) == []
+
+
+def test_diagnostics():
+    document = Document("(A)\nD=Q\n(A)\n@30000\n(SP)\n")
+
+    assert [(d.line, severity) for d, severity in document.index.diagnostics] == [
+        (2, ERROR),
+        (3, WARNING),
+        (4, ERROR),
+        (5, WARNING),
+    ]
+    assert document.index.diagnostics[0][0] == Diagnostic(2, "Invalid Command: D=Q")
+
+
+def test_incremental_edits():
+    document = Document("@R0\nD=M\n(END)\n@END\n0;JMP\n")
+    assert document.index.labels["END"].address == 2
+
+    # Same line count and no labels touched
+    document.apply((1, 0), (1, 3), "D=Q")
+    assert [d.line for d, _ in document.index.diagnostics] == [2]
+    document.apply((1, 2), (1, 3), "A")
+    assert document.index.diagnostics == []
+
+    # New lines move the label
+    document.apply((1, 3), (1, 3), "\n@R1\nD=D+M")
+    assert document.text == "@R0\nD=A\n@R1\nD=D+M\n(END)\n@END\n0;JMP\n"
+    assert document.index.labels["END"] == (4, 4, True)
+
+    document.apply((4, 0), (6, 5), "")
+    assert document.index.labels == {}
+    assert document.text == Document(document.text).text
+
+
+def frame(message: dict) -> bytes:
+    body = json.dumps(message).encode()
+    return f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+
+
+def read_all(data: bytes):
+    server = LanguageServer(BytesIO(data), BytesIO())
+    messages = []
+    while True:
+        message = server.read()
+        if message is None:
+            return messages
+        messages.append(message)
+
+
+def test_server_session():
+    requests = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didOpen",
+            "params": {
+                "textDocument": {"uri": URI, "version": 1, "text": "@END\n(END)\n"}
+            },
+        },
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didChange",
+            "params": {
+                "textDocument": {"uri": URI, "version": 2},
+                "contentChanges": [
+                    {
+                        "range": {
+                            "start": {"line": 1, "character": 5},
+                            "end": {"line": 1, "character": 5},
+                        },
+                        "text": "\nD=Q",
+                    }
+                ],
+            },
+        },
+        {
+            "jsonrpc": "2.0",
+            "id": 2,
+            "method": "textDocument/definition",
+            "params": {
+                "textDocument": {"uri": URI},
+                "position": {"line": 0, "character": 2},
+            },
+        },
+        {
+            "jsonrpc": "2.0",
+            "id": 3,
+            "method": "textDocument/hover",
+            "params": {
+                "textDocument": {"uri": URI},
+                "position": {"line": 0, "character": 2},
+            },
+        },
+        {"jsonrpc": "2.0", "id": 4, "method": "workspace/symbol", "params": {}},
+        {"jsonrpc": "2.0", "id": 5, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]
+    out = BytesIO()
+    server = LanguageServer(BytesIO(b"".join(map(frame, requests))), out)
+
+    assert server.serve() == 0
+
+    responses = read_all(out.getvalue())
+    initialize, opened, changed, definition, hover, unknown, shutdown = responses
+    assert initialize["result"]["capabilities"]["textDocumentSync"]["change"] == 2
+    assert opened["params"]["diagnostics"] == []
+    assert changed["params"]["diagnostics"][0]["range"]["start"]["line"] == 2
+    assert definition["result"]["range"]["start"] == {"line": 1, "character": 0}
+    assert hover["result"]["contents"]["value"] == "END: label, ROM[1]"
+    assert unknown["error"]["code"] == -32601
+    assert shutdown == {"jsonrpc": "2.0", "id": 5, "result": None}
+    assert server.documents[URI].version == 2
+
+
+@pytest.mark.parametrize("data,code", [(b"", 1), (frame({"method": "exit"}), 1)])
+def test_server_exit_without_shutdown(data, code):
+    assert LanguageServer(BytesIO(data), BytesIO()).serve() == code
+
+
+def test_server_survives_bad_messages():
+    requests = [
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didChange",
+            "params": {
+                "textDocument": {"uri": "file:///never/opened.asm", "version": 2},
+                "contentChanges": [{"text": "@1\n"}],
+            },
+        },
+        {"jsonrpc": "2.0", "id": 1, "method": "textDocument/hover", "params": {}},
+        {"jsonrpc": "2.0", "method": "textDocument/didOpen", "params": {}},
+        {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]
+    out = BytesIO()
+    server = LanguageServer(BytesIO(b"".join(map(frame, requests))), out)
+
+    assert server.serve() == 0
+
+    failed, shutdown = read_all(out.getvalue())
+    assert failed["id"] == 1 and failed["error"]["code"] == -32603
+    assert shutdown == {"jsonrpc": "2.0", "id": 2, "result": None}
+    assert server.documents == {}
+
+
+def test_server_answers_unreadable_messages():
+    bodies = [b"{not json", b"[1, 2]", json.dumps({"method": "exit"}).encode()]
+    data = b"".join(b"Content-Length: %d\r\n\r\n" % len(b) + b for b in bodies)
+    out = BytesIO()
+
+    assert LanguageServer(BytesIO(data), out).serve() == 1
+
+    parse, invalid = read_all(out.getvalue())
+    assert parse["id"] is None and parse["error"]["code"] == -32700
+    assert invalid["id"] is None and invalid["error"]["code"] == -32600
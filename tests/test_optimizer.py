@@ -0,0 +1,298 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.optimizer import (
+    fold_constants,
+    fuse,
+    has_literal_jump_targets,
+    optimize,
+    remove_jumps_to_next,
+    remove_redundant_loads,
+    remove_unreachable,
+    thread_jumps,
+)
+from pyasm.parser import Instruction, Parser
+from pyasm.simulator import Simulator
+
+
+def parse(code: str) -> List[Instruction]:
+    return Parser(code).instructions()
+
+
+def render(instructions: List[Instruction]) -> List[str]:
+    return [str(instruction) for instruction in instructions]
+
+
+def load_file(name: str):
+    return (
+        Path(__file__).parent.joinpath("asm_files").joinpath(name).read_text()
+    )
+
+
+def test_redundant_loads():
+    code = "@SP\nM=M+1\n@0\nA=M-1\nM=D\n@SP\nD=M\n(L)\n@SP\nD=M"
+
+    assert render(remove_redundant_loads(parse(code))) == [
+        "@SP",
+        "M=M+1",
+        "A=M-1",
+        "M=D",
+        "@SP",
+        "D=M",
+        "(L)",
+        "@SP",
+        "D=M",
+    ]
+
+
+def test_unreachable_code():
+    code = "@END\n0;JMP\n@1\nD=A\n(END)\n@END\nD;JMP\nM=1"
+
+    assert render(remove_unreachable(parse(code))) == [
+        "@END",
+        "0;JMP",
+        "(END)",
+        "@END",
+        "D;JMP",
+    ]
+
+
+def test_jump_chains():
+    code = (
+        "@A1\nD;JGT\n@R0\n@A1\n0;JMP\n@A1\nD;JEQ\nM=D\n"
+        "(A1)\n@A2\n0;JMP\n(A2)\n@END\n0;JMP\n(END)\n@END\n0;JMP"
+    )
+
+    assert render(thread_jumps(parse(code))) == [
+        "@END",
+        "D;JGT",
+        "@R0",
+        "@END",
+        "0;JMP",
+        "@A1",
+        "D;JEQ",
+        "M=D",
+        "(A1)",
+        "@END",
+        "0;JMP",
+        "(A2)",
+        "@END",
+        "0;JMP",
+        "(END)",
+        "@END",
+        "0;JMP",
+    ]
+
+
+@pytest.mark.parametrize(
+    "code,expected",
+    [
+        ("D=M\nD=D+1", ["D=M+1"]),
+        ("D=A\nMD=-D", ["MD=-A"]),
+        ("D=M\nD;JGT", ["D=M;JGT"]),
+        ("D=A\nM=D", ["MD=A"]),
+        ("D=M\nM=D+1", ["D=M", "M=D+1"]),
+        ("D=M\nD=D+A", ["D=M", "D=D+A"]),
+        ("M=M+1\nD=M", ["MD=M+1"]),
+        ("AM=M-1\nD=M", ["AM=M-1", "D=M"]),
+        ("D=D\nM=M\nA=A", []),
+        ("D=M;JGT\nD=D+1", ["D=M;JGT", "D=D+1"]),
+    ],
+)
+def test_fuse(code: str, expected: List[str]):
+    assert render(fuse(parse(code))) == expected
+
+
+def test_literal_jump_targets_are_left_alone():
+    instructions = parse(load_file("MaxL.asm"))
+
+    assert has_literal_jump_targets(instructions)
+    assert optimize(instructions) == instructions
+    assert not has_literal_jump_targets(parse(load_file("Max.asm")))
+
+
+@pytest.mark.parametrize(
+    "code,indirect,expected",
+    [
+        ("@R0\nA=M\n0;JMP", False, True),
+        ("@R0\nA=M\n0;JMP", True, False),
+        ("@R0\nD=M\n@5\nD;JGT", True, True),
+        ("@x\n0;JMP", True, True),
+        ("@LOOP\nA=A+1\n0;JMP\n(LOOP)", False, True),
+        ("(LOOP)\n0;JMP", False, True),
+        ("(LOOP)\n@LOOP\nD=A\nM=D;JGT\n(END)\n@END\n0;JMP", False, False),
+        ("@END\n0;JMP\n(END)\n0;JMP", False, False),
+    ],
+)
+def test_jumps_not_through_labels(code: str, indirect: bool, expected: bool):
+    assert has_literal_jump_targets(parse(code), indirect) is expected
+
+
+# Multiplies R0 by R1 into R2 with the kind of code a VM translator emits
+MULT = """
+@R2
+M=0
+@R1
+D=M
+@i
+M=D
+(LOOP)
+@i
+D=M
+@LOOP_TEST
+0;JMP
+@R0
+D=A
+(LOOP_TEST)
+@STEP
+D;JGT
+@END
+0;JMP
+(STEP)
+@R0
+D=M
+@R2
+M=D+M
+@i
+M=M-1
+@i
+D=M
+@LOOP
+0;JMP
+(END)
+@END
+0;JMP
+"""
+
+
+@pytest.mark.parametrize("r0,r1", [(0, 0), (3, 4), (7, 1), (-2, 5)])
+def test_optimized_program_behaves_the_same(r0: int, r1: int):
+    instructions = parse(MULT)
+    optimized = optimize(instructions)
+    assert len(optimized) < len(instructions)
+
+    results = []
+    for program in (instructions, optimized):
+        simulator = Simulator.from_binary(Assembler().assemble(program))
+        simulator.memory[0] = r0
+        simulator.memory[1] = r1
+        simulator.run(1000)
+        results.append(simulator.memory[2])
+
+    assert results == [r0 * r1, r0 * r1]
+
+
+def test_optimize_reaches_fixed_point():
+    optimized = optimize(parse(MULT))
+    assert optimize(optimized) == optimized
+
+
+def test_jumps_to_next_instruction():
+    code = "@NEXT\n0;JMP\n(OTHER)\n(NEXT)\n@1\n@LAST\n0;JMP\n(LAST)\nD=A"
+
+    assert render(remove_jumps_to_next(parse(code))) == [
+        "(OTHER)",
+        "(NEXT)",
+        "@1",
+        "@LAST",
+        "0;JMP",
+        "(LAST)",
+        "D=A",
+    ]
+
+
+@pytest.mark.parametrize(
+    "code,expected",
+    [
+        ("@5\nD=A\n@3\nD=D+A\n@0\nM=D", ["@8", "D=A", "@0", "M=D"]),
+        ("@5\nD=A\n@5\nD=D-A\n@R1\nM=D", ["D=0", "@R1", "M=0"]),
+        ("@3\nD=A\n@7\nD=D-A\n@R2\nM=D", ["@4", "D=-A", "@R2", "M=D"]),
+        ("@5\nD=A\n@3\nM=D+A", ["@5", "D=A", "@3", "M=D+A"]),
+        ("@5\nD=A\n@END\nD;JGT\nM=1", ["@5", "D=A", "@END", "D;JMP", "M=1"]),
+        ("@5\nD=A\n@END\nD;JLT\nM=1", ["@5", "D=A", "@END", "M=1"]),
+        ("D=M\n@5\nD=A\n@R0\nM=D", ["@5", "D=A", "@R0", "M=D"]),
+        ("@x\nD=M\n@3\nD=D+A\n@x\nM=D", ["@x", "D=M", "@3", "D=D+A", "@x", "M=D"]),
+        ("@SCREEN\nD=A\n@32\nD=D+A\n@p\nM=D", ["@16416", "D=A", "@p", "M=D"]),
+    ],
+)
+def test_fold_constants(code: str, expected: List[str]):
+    assert render(fold_constants(parse(code))) == expected
+
+
+def test_fold_constants_keeps_live_a():
+    # A is still needed by the jump, so D=D+A cannot become @8 / D=A
+    code = "@5\nD=A\n@3\nD=D+A;JGT"
+
+    assert render(fold_constants(parse(code))) == ["@5", "D=A", "@3", "D=D+A;JMP"]
+
+
+# Sums the constants 7 and 9 through a temporary, then tests the result
+ARITHMETIC = """
+@7
+D=A
+@9
+D=D+A
+@R13
+M=D
+@16
+D=A
+@R13
+D=M-D
+@POSITIVE
+D;JGT
+@R0
+M=-1
+@END
+0;JMP
+(POSITIVE)
+@R0
+M=1
+(END)
+@END
+0;JMP
+"""
+
+
+def test_folded_program_behaves_the_same():
+    instructions = parse(ARITHMETIC)
+    optimized = optimize(instructions)
+    assert len(optimized) < len(instructions)
+
+    for program in (instructions, optimized):
+        simulator = Simulator.from_binary(Assembler().assemble(program))
+        simulator.run(100)
+        assert simulator.memory[0] == -1
+        assert simulator.memory[13] == 16
+
+
+def test_fold_constants_drops_repeated_values():
+    code = "@16\nD=A\n@R13\nM=D\n@16\nD=A\n@R13\nD=M-D"
+
+    assert render(fold_constants(parse(code))) == [
+        "@16",
+        "D=A",
+        "@R13",
+        "M=D",
+        "D=M-D",
+    ]
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "@x\n@y\nD=A\n@x\nM=D\n",
+        "@SKIP\n0;JMP\n@x\nM=1\n(SKIP)\n@y\nM=-1\n@x\nM=1\n",
+    ],
+)
+def test_optimize_keeps_variable_addresses(code: str):
+    memories = []
+    for program in (parse(code), optimize(parse(code)), fold_constants(parse(code))):
+        simulator = Simulator.from_binary(Assembler().assemble(program))
+        simulator.run(100)
+        memories.append(simulator.memory.tobytes())
+
+    assert memories[1] == memories[0]
+    assert memories[2] == memories[0]
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import pytest
 
-from pyasm.parser import CommandType, InvalidCommandException, Parser
+from pyasm.parser import CommandType, Diagnostic, InvalidCommandException, Parser
 
 
 def generate_valid_parser():
@@ -638,3 +638,38 @@ def test_parser_with_max_asm_file():
 
     assert parser.counter == 19
     assert not parser.has_more_commands()
+
+
+def test_parser_keeps_source_lines():
+    code = "// header\n\n   @value // comment\n\t\n  M = A + D\n(END)\n"
+    parser = Parser(code)
+
+    assert parser.line_numbers == [3, 5, 6]
+    assert Parser.process_with_lines(code)[2] == [4, 3, 1]
+    assert parser.source_line == 3
+    assert parser.source_column == 4
+
+    parser.advance()
+    assert parser.source_line == 5
+    assert parser.source_column == 3
+
+
+def test_process_skips_whitespace_only_lines():
+    assert Parser.process("@1\n  \t \n@2") == ["@1", "@2"]
+
+
+def test_instructions_collects_invalid_commands():
+    parser = Parser("@1\nM=Q\n\n@2\n(BAD\n")
+    errors = []
+
+    instructions = parser.instructions(errors)
+
+    assert [i.symbol for i in instructions] == ["1", "0", "2"]
+    assert errors == [
+        Diagnostic(2, "Invalid Command: M=Q"),
+        Diagnostic(5, "Invalid Command: (BAD"),
+    ]
+
+    with pytest.raises(InvalidCommandException):
+        parser.instructions()
+    assert parser.source_line == 2
@@ -0,0 +1,148 @@
+from pathlib import Path
+
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.parser import Parser
+from pyasm.preprocessor import (
+    Origin,
+    Preprocessor,
+    PreprocessorError,
+    preprocess,
+)
+
+MACROS = """
+// Shared helpers
+#define TOP 24575
+#define INC(addr)
+@addr
+M=M+1
+#end
+#define COPY(src, dst)
+@src
+D=M
+@dst
+M=D
+#end
+"""
+
+
+def write(pth: Path, text: str) -> Path:
+    pth.parent.mkdir(parents=True, exist_ok=True)
+    pth.write_text(text)
+    return pth
+
+
+def test_macros_and_constants():
+    source = Preprocessor().expand(MACROS + "INC(R0)\nCOPY(R0, R1)\n@TOP\nD=A\n")
+
+    assert Parser.process(source.text) == [
+        "@R0",
+        "M=M+1",
+        "@R0",
+        "D=M",
+        "@R1",
+        "M=D",
+        "@24575",
+        "D=A",
+    ]
+    # Expanded lines point at the invocation
+    line = source.text.splitlines().index("@R1") + 1
+    assert source.origin(line) == Origin("<input>", 15)
+
+
+def test_local_labels_are_unique():
+    code = "#define SPIN()\n(WAIT%%)\n@WAIT%%\n0;JMP\n#end\nSPIN()\nSPIN()\n"
+
+    lines = Parser.process(Preprocessor().expand(code).text)
+
+    assert lines[0] != lines[3]
+    assert len(Assembler(Parser("\n".join(lines))).assemble()) == 4
+
+
+def test_nested_macros():
+    code = MACROS + "#define INC2(a)\nINC(a)\nINC(a)\n#end\nINC2(R5)\n"
+
+    lines = Parser.process(Preprocessor().expand(code).text)
+
+    assert lines == ["@R5", "M=M+1", "@R5", "M=M+1"]
+
+
+def test_include(tmp_path: Path):
+    write(tmp_path.joinpath("lib", "macros.asm"), MACROS)
+    write(tmp_path.joinpath("lib", "all.asm"), '#include "macros.asm"\n@KBD\n')
+    main = write(
+        tmp_path.joinpath("main.asm"),
+        '#include "lib/macros.asm"\n#include "lib/all.asm"\nINC(R3)\n',
+    )
+    preprocessor = Preprocessor()
+
+    source = preprocessor.expand_file(main)
+
+    # macros.asm is spliced in once even though it is included twice
+    assert Parser.process(source.text) == ["@KBD", "@R3", "M=M+1"]
+    line = source.text.splitlines().index("@KBD") + 1
+    assert source.origin(line) == Origin(str(tmp_path.joinpath("lib", "all.asm")), 2)
+    assert preprocessor.dependencies(main) == [
+        tmp_path.joinpath("lib", "macros.asm"),
+        tmp_path.joinpath("lib", "all.asm"),
+    ]
+
+
+def test_include_cache(tmp_path: Path, monkeypatch):
+    header = write(tmp_path.joinpath("macros.asm"), MACROS)
+    first = write(tmp_path.joinpath("a.asm"), '#include "macros.asm"\nINC(R1)\n')
+    second = write(tmp_path.joinpath("b.asm"), '#include "macros.asm"\nINC(R2)\n')
+    preprocessor = Preprocessor()
+    preprocessor.expand_file(first)
+
+    # The header is not expanded again while its contents are unchanged
+    calls = []
+    unit = Preprocessor._Preprocessor__unit
+    monkeypatch.setattr(
+        Preprocessor,
+        "_Preprocessor__unit",
+        lambda self, text, name, *args: calls.append(name)
+        or unit(self, text, name, *args),
+    )
+    preprocessor.expand_file(second)
+    assert calls == [str(second)]
+
+    header.write_text(MACROS + "@R9\n")
+    preprocessor.expand_file(second)
+    assert calls[-1] == str(header)
+
+
+@pytest.mark.parametrize(
+    "code,message,line",
+    [
+        ("#define X(a)\n@a\n", "Missing #end", 1),
+        ("@R0\n#pragma once\n", "Unknown directive", 2),
+        ("#define X(a)\n@a\n#end\n\nX(1, 2)\n", "takes 1 arguments, got 2", 5),
+        ("#define X()\nX()\n#end\nX()\n", "nests too deep", 4),
+        ('#include "missing.asm"\n', "Cannot include", 1),
+    ],
+)
+def test_errors(code, message, line):
+    with pytest.raises(PreprocessorError) as err:
+        Preprocessor().expand(code, "main.asm")
+
+    assert message in str(err.value)
+    assert err.value.origin == Origin("main.asm", line)
+
+
+def test_circular_include(tmp_path: Path):
+    write(tmp_path.joinpath("a.asm"), '#include "b.asm"\n')
+    write(tmp_path.joinpath("b.asm"), '#include "a.asm"\n')
+
+    with pytest.raises(PreprocessorError):
+        Preprocessor().expand_file(tmp_path.joinpath("a.asm"))
+
+
+def test_plain_sources_pass_through(tmp_path: Path):
+    pth = write(tmp_path.joinpath("plain.asm"), "@R0\n\nD=M // comment\n")
+
+    source = preprocess(pth)
+
+    assert source.text == "@R0\n\nD=M // comment"
+    assert source.origin(3) == Origin(str(pth), 3)
@@ -0,0 +1,90 @@
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.parser import Parser
+from pyasm.profiler import START_REGION, Profiler
+from pyasm.simulator import Simulator
+
+# Sums 1..5 into R1, then spins in END
+SUM = """
+@5
+D=A
+@R0
+M=D
+(LOOP)
+@R0
+D=M
+@END
+D;JEQ
+@R1
+M=D+M
+@R0
+M=M-1
+@LOOP
+0;JMP
+(END)
+@END
+0;JMP
+"""
+
+
+@pytest.fixture(scope="module")
+def profiled():
+    assembler = Assembler(Parser(SUM))
+    simulator = Simulator.from_binary(assembler.assemble())
+    profiler = Profiler(len(simulator.rom))
+    simulator.run(100, profiler=profiler)
+
+    return simulator, profiler, assembler.labels
+
+
+def test_profiled_run_matches_plain_run(profiled):
+    simulator, profiler, _ = profiled
+    plain = Simulator.from_binary(Assembler(Parser(SUM)).assemble())
+    plain.run(100)
+
+    assert simulator.snapshot() == plain.snapshot()
+    assert simulator.memory[1] == 15
+    assert profiler.total == 100
+
+
+def test_jump_counts(profiled):
+    _, profiler, labels = profiled
+    conditional = labels["LOOP"] + 3
+
+    assert profiler.counts[conditional] == 6
+    assert profiler.taken[conditional] == 1
+    assert profiler.not_taken[conditional] == 5
+    assert profiler.taken[labels["END"] - 1] == 5
+
+
+def test_regions(profiled):
+    _, profiler, labels = profiled
+    regions = {region.label: region for region in profiler.regions(labels)}
+
+    assert list(regions) == [START_REGION, "LOOP", "END"]
+    assert regions[START_REGION].cycles == 4
+    assert regions["LOOP"].cycles == 6 * 4 + 5 * 6
+    assert regions["END"].cycles == 100 - 4 - 54
+    assert regions["LOOP"].taken == 6
+
+
+def test_locate():
+    labels = {"LOOP": 4, "END": 14}
+
+    assert Profiler.locate(0, labels) == START_REGION
+    assert Profiler.locate(4, labels) == "LOOP"
+    assert Profiler.locate(7, labels) == "LOOP+3"
+    assert Profiler.locate(15, labels) == "END+1"
+
+
+def test_report_and_folded(profiled):
+    _, profiler, labels = profiled
+
+    report = profiler.report(labels, limit=2)
+    assert report[1].startswith("LOOP")
+    assert report[2].startswith("END")
+
+    folded = profiler.folded(labels, "sum")
+    assert "sum;LOOP;LOOP+3 6" in folded
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in folded) == 100
@@ -0,0 +1,72 @@
+import zlib
+from pathlib import Path
+
+import pytest
+
+from pyasm.screen import Framebuffer
+from pyasm.simulator import SCREEN, Memory
+
+
+def test_update_decodes_dirty_rows():
+    memory = Memory()
+    framebuffer = Framebuffer(memory)
+    assert framebuffer.update() == 256
+    assert framebuffer.update() == 0
+
+    memory[SCREEN] = 1
+    memory[SCREEN + 33] = -1
+    assert framebuffer.update() == 2
+    assert framebuffer.bits[:2] == b"\x80\x00"
+    assert framebuffer.bits[64:68] == b"\x00\x00\xff\xff"
+
+    # Rows not written since the last update are left alone
+    framebuffer.bits[200] = 0xAA
+    memory[SCREEN] = 0
+    framebuffer.update()
+    assert framebuffer.bits[0] == 0
+    assert framebuffer.bits[200] == 0xAA
+
+
+def test_pixel_order():
+    memory = Memory()
+    framebuffer = Framebuffer(memory)
+    memory[SCREEN + 1] = 0b11 << 14
+    framebuffer.update()
+
+    grey = framebuffer.grey()
+    assert len(grey) == 512 * 256
+    assert [x for x in range(512) if grey[x] == 0] == [30, 31]
+    assert framebuffer.ppm()[-3:] == b"\xff\xff\xff"
+    assert framebuffer.pbm().startswith(b"P4\n512 256\n")
+
+
+def test_png():
+    memory = Memory()
+    framebuffer = Framebuffer(memory)
+    memory[SCREEN + 32] = 1
+    framebuffer.update()
+
+    png = framebuffer.png()
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    start = png.index(b"IDAT") + 4
+    size = int.from_bytes(png[start - 8 : start - 4], "big")
+    rows = zlib.decompress(png[start : start + size])
+    assert len(rows) == 256 * 65
+    assert rows[65:67] == b"\x00\x7f"
+    assert rows[1:65] == b"\xff" * 64
+
+
+@pytest.mark.parametrize("suffix", [".pbm", ".ppm", ".png", ".raw"])
+def test_export(tmp_path: Path, suffix: str):
+    framebuffer = Framebuffer(Memory())
+    framebuffer.update()
+    out = tmp_path.joinpath(f"screen{suffix}")
+
+    framebuffer.export(out)
+
+    assert out.stat().st_size > 0
+
+
+def test_export_unknown_format(tmp_path: Path):
+    with pytest.raises(ValueError):
+        Framebuffer(Memory()).export(tmp_path.joinpath("screen.gif"))
@@ -0,0 +1,73 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+from pyasm import sharedrom
+from pyasm.assembler import Assembler
+from pyasm.parser import Parser
+from pyasm.sharedrom import SharedRom
+from pyasm.simulator import ROM_SIZE, ProgramTooLarge
+
+rootPth = Path(__file__).parent
+
+
+def max_of(rom: SharedRom, x: int, y: int) -> int:
+    simulator = rom.simulator()
+    simulator.memory[0], simulator.memory[1] = x, y
+    simulator.run(100)
+    return simulator.memory[2]
+
+
+def attachments(rom: SharedRom) -> int:
+    return len(sharedrom._ATTACHED)
+
+
+def assembled(name: str):
+    text = rootPth.joinpath("asm_files", name).read_text()
+    return [int(word, 2) for word in Assembler(Parser(text)).assemble()]
+
+
+def test_shared_rom_in_place():
+    words = assembled("Max.asm")
+    with SharedRom.create(words) as rom:
+        attached = SharedRom.attach(rom.handle)
+
+        assert len(attached) == len(words)
+        assert attached.words.readonly
+        assert attached.words.tolist() == words
+        with pytest.raises(TypeError):
+            attached.words[0] = 1
+
+        simulator = attached.simulator()
+        assert simulator.rom.obj is attached.words.obj
+        assert simulator.snapshot()
+        del simulator
+        assert max_of(attached, 3, 7) == 7
+
+
+def test_shared_rom_workers():
+    with SharedRom.create(assembled("Max.asm")) as rom:
+        with ProcessPoolExecutor(2) as pool:
+            pairs = [(3, 7), (9, -2), (0, 0)]
+            results = pool.map(max_of, [rom] * 3, *zip(*pairs))
+            assert list(results) == [7, 9, 0]
+
+
+def test_shared_rom_attaches_once():
+    with SharedRom.create(assembled("Max.asm")) as rom:
+        attached = pickle.loads(pickle.dumps(rom))
+
+        assert attached is SharedRom.attach(rom.handle)
+        assert attached is not rom
+        attached.close()
+        assert SharedRom.attach(rom.handle) is not attached
+
+        with ProcessPoolExecutor(1) as pool:
+            # Every task finds the attachment the first one made
+            assert len(set(pool.map(attachments, [rom] * 200))) == 1
+
+
+def test_shared_rom_too_large():
+    with pytest.raises(ProgramTooLarge):
+        SharedRom.create([0] * (ROM_SIZE + 1))
@@ -0,0 +1,200 @@
+from pathlib import Path
+
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.parser import Parser
+from pyasm.simulator import (
+    CHECKPOINT_LIMIT,
+    KBD,
+    RAM_SIZE,
+    SCREEN,
+    SCREEN_SIZE,
+    Memory,
+    MemoryAccessError,
+    Simulator,
+    SnapshotError,
+    wrap,
+)
+
+
+def load_file(name: str):
+    return (
+        Path(__file__).parent.joinpath("asm_files").joinpath(name).read_text()
+    )
+
+
+def simulator_for(code: str) -> Simulator:
+    return Simulator.from_binary(Assembler(Parser(code)).assemble())
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [(0, 0), (1, 1), (-1, -1), (32767, 32767), (32768, -32768), (65535, -1)],
+)
+def test_wrap(value: int, expected: int):
+    assert wrap(value) == expected
+
+
+def test_memory_layout():
+    memory = Memory()
+
+    assert len(memory) == RAM_SIZE
+    assert memory.view.nbytes < 150 * 1024
+    assert len(memory.screen) == SCREEN_SIZE
+
+    memory[SCREEN + 1] = 0xFFFF
+    assert memory[SCREEN + 1] == -1
+    assert memory.screen[1] == -1
+
+    memory[KBD] = 40000
+    assert memory[KBD] == 40000 - 65536
+
+
+def test_memory_tracks_dirty_screen_rows():
+    memory = Memory()
+    assert len(memory.take_dirty_rows()) == 256
+
+    memory[SCREEN - 1] = 1
+    memory[SCREEN + 31] = 1
+    memory[SCREEN + 32 * 255] = 1
+    memory[KBD] = 1
+    assert memory.take_dirty_rows() == [0, 255]
+    assert memory.take_dirty_rows() == []
+
+
+def test_execution_marks_screen_rows():
+    simulator = simulator_for("@SCREEN\nD=A\n@100\nA=D+A\nM=-1\n@KBD\nM=1\n")
+    simulator.memory.take_dirty_rows()
+
+    simulator.run(10)
+
+    assert simulator.memory.take_dirty_rows() == [3]
+
+
+def test_memory_load_and_clear():
+    memory = Memory()
+    memory[3] = 7
+    data = memory.tobytes()
+
+    memory.clear()
+    assert memory[3] == 0
+
+    memory.load(data)
+    assert memory[3] == 7
+
+
+@pytest.mark.integ_test
+def test_run_add_file():
+    simulator = simulator_for(load_file("Add.asm"))
+
+    assert simulator.run(100) == 6
+    assert simulator.halted
+    assert simulator.memory[0] == 5
+    assert simulator.cycles == 6
+
+
+@pytest.mark.integ_test
+@pytest.mark.parametrize("r0,r1", [(3, 9), (9, 3), (-4, -7), (0, 0)])
+def test_run_max_file(r0: int, r1: int):
+    simulator = simulator_for(load_file("Max.asm"))
+    simulator.memory[0] = r0
+    simulator.memory[1] = r1
+
+    simulator.run(100)
+    assert not simulator.halted
+    assert simulator.memory[2] == max(r0, r1)
+
+
+def test_arithmetic_wraps_around():
+    simulator = simulator_for("@16384\nD=A\nD=D+A\n@0\nM=D\nM=M-1")
+    simulator.run(10)
+
+    assert simulator.d == -32768
+    assert simulator.memory[0] == 32767
+
+
+def test_variables_are_allocated():
+    simulator = simulator_for("@10\nD=A\n@i\nM=D\n@j\nM=D+1\n@i\nD=M")
+    simulator.run(10)
+
+    assert simulator.memory[16] == 10
+    assert simulator.memory[17] == 11
+    assert simulator.d == 10
+
+
+def test_memory_access_out_of_range():
+    simulator = simulator_for("@24576\nD=A\n@100\nD=D+A\nA=D\nM=1")
+
+    with pytest.raises(MemoryAccessError):
+        simulator.run(10)
+
+    assert simulator.pc == 5
+    assert simulator.cycles == 5
+
+
+def test_step_and_reset():
+    simulator = simulator_for("@5\nD=A")
+
+    assert simulator.step()
+    assert simulator.a == 5
+    assert simulator.step()
+    assert simulator.d == 5
+    assert not simulator.step()
+
+    simulator.reset()
+    assert (simulator.pc, simulator.a, simulator.d) == (0, 0, 0)
+
+
+COUNTER = "@i\nM=M+1\n@0\n0;JMP"
+
+
+def test_snapshot_and_restore():
+    simulator = simulator_for(COUNTER)
+    simulator.run(40)
+    snapshot = simulator.snapshot()
+
+    simulator.run(40)
+    assert simulator.memory[16] == 20
+
+    simulator.restore(snapshot)
+    assert simulator.cycles == 40
+    assert simulator.memory[16] == 10
+
+    fresh = simulator_for(COUNTER)
+    fresh.restore(snapshot)
+    fresh.run(40)
+    simulator.run(40)
+    assert fresh.snapshot() == simulator.snapshot()
+
+
+def test_restore_rejects_other_programs():
+    snapshot = simulator_for(COUNTER).snapshot()
+
+    with pytest.raises(SnapshotError):
+        simulator_for("@5\nD=A").restore(snapshot)
+
+    with pytest.raises(SnapshotError):
+        simulator_for(COUNTER).restore(snapshot[:-2])
+
+
+def test_automatic_checkpoints():
+    simulator = simulator_for(COUNTER)
+    assert simulator.run(100, checkpoint_every=8) == 100
+
+    assert list(simulator.checkpoints) == list(range(8, 100, 8))
+
+    assert simulator.restore_checkpoint(50) == 48
+    assert simulator.cycles == 48
+    assert simulator.memory[16] == 12
+
+    with pytest.raises(SnapshotError):
+        simulator.restore_checkpoint(3)
+
+
+def test_checkpoints_are_bounded():
+    simulator = simulator_for(COUNTER)
+    simulator.run(1000, checkpoint_every=1)
+
+    assert len(simulator.checkpoints) == CHECKPOINT_LIMIT
+    assert max(simulator.checkpoints) == 1000
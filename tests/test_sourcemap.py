@@ -0,0 +1,39 @@
+import pytest
+
+from pyasm.sourcemap import SourceMap
+
+
+def test_dump_and_load_round_trip():
+    source_map = SourceMap([3, 4, 7, 9], {"LOOP": 2, "END": 3})
+    dumped = source_map.dump()
+
+    assert dumped == ["(LOOP) 2", "(END) 3", "0 3", "1 4", "2 7", "3 9"]
+
+    loaded = SourceMap.load(["# Max.asm", ""] + dumped)
+    assert loaded.labels == {"LOOP": 2, "END": 3}
+    assert [loaded.line_of(addr) for addr in range(len(loaded))] == [3, 4, 7, 9]
+
+
+def test_files_round_trip():
+    source_map = SourceMap([1, 2, 5], {}, ["lib/inc.asm", "lib/inc.asm", ""])
+    dumped = source_map.dump()
+
+    assert dumped == ["0 1 lib/inc.asm", "1 2 lib/inc.asm", "2 5"]
+
+    loaded = SourceMap.load(dumped)
+    assert [loaded.file_of(addr) for addr in range(3)] == ["lib/inc.asm"] * 2 + [""]
+    assert [loaded.line_of(addr) for addr in range(3)] == [1, 2, 5]
+
+
+def test_label_of():
+    source_map = SourceMap([1, 2, 3, 4, 5], {"A": 1, "B": 1, "C": 3})
+
+    assert source_map.label_of(0) == ""
+    assert source_map.label_of(1) == "A"
+    assert source_map.label_of(2) == "A+1"
+    assert source_map.label_of(4) == "C+1"
+
+
+def test_load_rejects_gaps():
+    with pytest.raises(ValueError):
+        SourceMap.load(["0 1", "2 3"])
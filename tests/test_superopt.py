@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+
+from pyasm.optimizer import apply_rules
+from pyasm.parser import Parser
+from pyasm.superopt import Rule, RewriteCache, SuperoptError, search, superoptimize
+
+
+def parse(code: str):
+    return Parser(code).instructions()
+
+
+@pytest.mark.parametrize(
+    "code,expected",
+    [
+        ("@5\nD=A\nD=D+1", ["@5", "D=A+1"]),
+        ("D=M\nD=D+1\nM=D", ["MD=M+1"]),
+        ("D=0\nD=D+1", ["D=1"]),
+        ("D=A\nD=D", ["D=A"]),
+    ],
+)
+def test_search(code, expected):
+    assert search(parse(code), max_length=2) == expected
+
+
+def test_search_no_rewrite():
+    assert search(parse("D=M\nM=D+1"), max_length=2) is None
+
+
+def test_search_ignore():
+    # D is dead afterwards, so the copy through D is not needed
+    assert search(parse("D=M\nM=D+1"), max_length=1, ignore="D") == ["M=M+1"]
+
+
+@pytest.mark.parametrize("code", ["(LOOP)\n@LOOP\n0;JMP", "D;JGT\nD=0", "@x\nD=M"])
+def test_search_unsupported(code):
+    with pytest.raises(SuperoptError):
+        search(parse(code))
+
+
+def test_cache(tmp_path: Path):
+    pth = tmp_path.joinpath("cache", "rules.json")
+    cache = RewriteCache(pth)
+
+    assert superoptimize("D=M\nD=D+1\nM=D", cache, max_length=2) == ["MD=M+1"]
+    assert superoptimize("D=M\nM=D+1", cache, max_length=2) is None
+
+    cache = RewriteCache(pth)
+    assert cache.get(parse("D=M\nD=D+1\nM=D"), "", 2) == (True, ["MD=M+1"])
+    # A failed search only answers for the depth that was tried
+    assert cache.get(parse("D=M\nM=D+1"), "", 1) == (True, None)
+    assert cache.get(parse("D=M\nM=D+1"), "", 3) == (False, None)
+    assert cache.rules() == [Rule(("D=M", "D=D+1", "M=D"), ("MD=M+1",), "")]
+
+
+@pytest.mark.parametrize("text", ['{"D=M |": ', "[]", '{"D=M |": {}}', "\xff"])
+def test_damaged_cache(tmp_path: Path, text: str):
+    pth = tmp_path.joinpath("rules.json")
+    pth.write_text(text, encoding="latin-1")
+    cache = RewriteCache(pth)
+
+    assert cache.rules() == []
+    assert superoptimize("D=M\nD=D+1\nM=D", cache, max_length=2) == ["MD=M+1"]
+    assert RewriteCache(pth).rules() == [
+        Rule(("D=M", "D=D+1", "M=D"), ("MD=M+1",), "")
+    ]
+
+
+def test_apply_rules():
+    rules = [Rule(("D=M", "M=D+1"), ("M=M+1",), "D")]
+    code = "@R0\nD=M\nM=D+1\n@R1\nD=M\nM=D+1\nD=D+A"
+
+    result = apply_rules(parse(code), rules)
+
+    # The second window is left alone because D is read afterwards
+    assert [str(instruction) for instruction in result] == [
+        "@R0",
+        "M=M+1",
+        "@R1",
+        "D=M",
+        "M=D+1",
+        "D=D+A",
+    ]
+    assert [instruction.line for instruction in result][:3] == [1, 2, 4]
@@ -0,0 +1,115 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from pyasm.testscript import Column, Script, ScriptError, run_script, run_scripts
+
+rootPth = Path(__file__).parent
+
+
+@pytest.fixture
+def max_dir(tmp_path: Path) -> Path:
+    shutil.copy(rootPth.joinpath("asm_files/Max.asm"), tmp_path)
+    for name in ("Max.tst", "Max.cmp"):
+        shutil.copy(rootPth.joinpath("tst_files", name), tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "column, value, expected",
+    [
+        (Column("RAM[0]", "D", 2, 6, 2), -7, "      -7  "),
+        (Column("RAM[0]", "B", 1, 16, 1), 5, " 0000000000000101 "),
+        (Column("A", "X", 1, 4, 1), -1, " FFFF "),
+    ],
+)
+def test_column_format(column: Column, value: int, expected: str):
+    assert column.format(value) == expected
+    assert len(column.header()) == len(expected)
+
+
+def test_parse_nested_blocks(tmp_path: Path):
+    script = tmp_path.joinpath("Loop.tst")
+    script.write_text("/* setup\n*/ load X.asm,\nrepeat 2 {\n  ticktock; output;\n}\n")
+
+    statements = Script(script).statements
+
+    assert [s.words for s in statements] == [["load", "X.asm"], ["repeat", "2"]]
+    assert statements[1].line == 3
+    assert [s.words for s in statements[1].body] == [["ticktock"], ["output"]]
+
+
+def test_parse_unbalanced_braces(tmp_path: Path):
+    script = tmp_path.joinpath("Bad.tst")
+    script.write_text("repeat 2 {\nticktock;\n")
+
+    with pytest.raises(ScriptError) as err:
+        Script(script)
+
+    assert "Missing }" in str(err.value)
+
+
+def test_run_max(max_dir: Path):
+    result = run_script(max_dir.joinpath("Max.tst"))
+
+    assert result.passed
+    assert result.outputs == 3
+    assert result.cycles == 28
+    assert str(result).startswith("PASS Max.tst (3 outputs, 28 cycles")
+    compare = max_dir.joinpath("Max.cmp").read_text()
+    assert max_dir.joinpath("Max.out").read_text() == compare
+
+
+def test_run_reports_comparison_failure(max_dir: Path):
+    cmp = max_dir.joinpath("Max.cmp")
+    cmp.write_text(cmp.read_text().replace("23456  |\n", "12345  |\n"))
+
+    result = run_script(max_dir.joinpath("Max.tst"))
+
+    assert not result.passed
+    assert "Max.tst:23: Comparison failure at line 3" in result.message
+
+
+def test_compare_wildcards(max_dir: Path):
+    cmp = max_dir.joinpath("Max.cmp")
+    cmp.write_text(cmp.read_text().replace("|       5  |\n", "|       *  |\n"))
+
+    assert run_script(max_dir.joinpath("Max.tst")).passed
+
+
+def test_while_loop(max_dir: Path):
+    script = max_dir.joinpath("Until.tst")
+    script.write_text(
+        "load Max.asm, output-list time%D1.4.1 PC%D1.4.1 RAM[2]%D1.4.1;\n"
+        "set RAM[0] 9, set RAM[1] %X10;\n"
+        "while PC <> 14 {\n  ticktock;\n}\noutput;\n"
+    )
+
+    result = run_script(script)
+
+    assert result.passed
+    assert result.cycles == 12
+
+
+def test_missing_program(tmp_path: Path):
+    script = tmp_path.joinpath("NoLoad.tst")
+    script.write_text("set RAM[0] 1;\n")
+
+    result = run_script(script)
+
+    assert not result.passed
+    assert result.message == "NoLoad.tst:1: No program loaded"
+
+
+def test_run_scripts_in_parallel(max_dir: Path):
+    second = max_dir.joinpath("Again.tst")
+    text = max_dir.joinpath("Max.tst").read_text()
+    second.write_text(text.replace("Max.out", "Again.out"))
+
+    results = run_scripts([max_dir.joinpath("Max.tst"), second], jobs=2)
+
+    assert [(r.script, r.passed) for r in results] == [
+        ("Max.tst", True),
+        ("Again.tst", True),
+    ]
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.parser import Parser
+from pyasm.simulator import Simulator
+from pyasm.trace import TraceError, TraceWriter, read_trace, trace_bounds
+
+COUNTER = "@i\nM=M+1\nD=M\n@0\n0;JMP"
+
+
+def simulator_for(code: str) -> Simulator:
+    return Simulator.from_binary(Assembler(Parser(code)).assemble())
+
+
+@pytest.fixture
+def trace_pth(tmp_path: Path) -> Path:
+    pth = tmp_path.joinpath("counter.trc")
+    simulator = simulator_for(COUNTER)
+    with TraceWriter(pth, block_records=7) as tracer:
+        simulator.run(50, tracer=tracer)
+
+    return pth
+
+
+def test_trace_records_every_cycle(trace_pth: Path):
+    assert trace_bounds(trace_pth) == (0, 50)
+
+    records = list(read_trace(trace_pth))
+    assert [record.cycle for record in records] == list(range(50))
+    assert [record.pc for record in records[:6]] == [0, 1, 2, 3, 4, 0]
+
+    first, write = records[0], records[1]
+    assert (first.a, first.address) == (16, None)
+    assert (write.a, write.address, write.value) == (16, 16, 1)
+    assert records[2].d == 1
+
+
+def test_read_trace_range(trace_pth: Path):
+    records = list(read_trace(trace_pth, start=41, stop=46, block_records=2))
+
+    assert [record.cycle for record in records] == [41, 42, 43, 44, 45]
+    assert [record.pc for record in records] == [1, 2, 3, 4, 0]
+    assert records[0].value == 9
+
+
+def test_trace_must_be_contiguous(tmp_path: Path):
+    simulator = simulator_for(COUNTER)
+    simulator.run(3)
+
+    with TraceWriter(tmp_path.joinpath("t.trc")) as tracer:
+        with pytest.raises(ValueError):
+            simulator.run(3, tracer=tracer)
+
+
+def test_traced_run_matches_plain_run(tmp_path: Path):
+    traced = simulator_for(COUNTER)
+    with TraceWriter(tmp_path.joinpath("t.trc")) as tracer:
+        traced.run(30, tracer=tracer)
+
+    plain = simulator_for(COUNTER)
+    plain.run(30)
+    assert traced.snapshot() == plain.snapshot()
+
+
+def test_not_a_trace(tmp_path: Path):
+    pth = tmp_path.joinpath("bad.trc")
+    pth.write_bytes(b"nope")
+
+    with pytest.raises(TraceError):
+        list(read_trace(pth))
@@ -0,0 +1,169 @@
+from pathlib import Path
+
+import pytest
+
+from pyasm.assembler import Assembler
+from pyasm.optimizer import optimize
+from pyasm.parser import CommandType
+from pyasm.simulator import Simulator
+from pyasm.vm import Translator, VMError, translate_files, vm_files
+
+vmPth = Path(__file__).parent.joinpath("vm_files")
+
+
+def run(code: str, cycles: int = 10000, stack: int = 256) -> Simulator:
+    instructions = Translator("Test").translate(code)
+    sim = Simulator.from_binary(Assembler().assemble(instructions))
+    sim.memory[0] = stack
+    sim.run(cycles)
+    return sim
+
+
+def stack(sim: Simulator, base: int = 256):
+    return [sim.memory[addr] for addr in range(base, sim.memory[0])]
+
+
+@pytest.mark.parametrize(
+    "code,expected",
+    [
+        ("push constant 7\npush constant 8\nadd", [15]),
+        ("push constant 7\npush constant 8\nsub", [-1]),
+        ("push constant 12\npush constant 10\nand", [8]),
+        ("push constant 12\npush constant 10\nor", [14]),
+        ("push constant 5\nneg\npush constant 0\nnot", [-5, -1]),
+        ("push constant 3\npush constant 3\neq", [-1]),
+        ("push constant 3\npush constant 4\neq", [0]),
+        ("push constant 4\npush constant 3\ngt", [-1]),
+        ("push constant 3\npush constant 4\ngt", [0]),
+        ("push constant 3\npush constant 4\nlt", [-1]),
+        ("push constant 4\npush constant 4\nlt", [0]),
+        ("push constant 32767", [32767]),
+    ],
+)
+def test_arithmetic(code, expected):
+    assert stack(run(code)) == expected
+
+
+def test_memory_segments():
+    code = """
+    push constant 10
+    pop local 0
+    push constant 21
+    pop argument 2
+    push constant 3030
+    pop pointer 0
+    push constant 36
+    pop this 6
+    push constant 510
+    pop temp 6
+    push constant 42
+    pop static 3
+    push local 0
+    push argument 2
+    push this 6
+    push temp 6
+    push static 3
+    push pointer 0
+    """
+    instructions = Translator("Test").translate(code)
+    sim = Simulator.from_binary(Assembler().assemble(instructions))
+    for address, value in ((0, 256), (1, 300), (2, 400)):
+        sim.memory[address] = value
+    sim.run(10000)
+
+    assert sim.memory[300] == 10
+    assert sim.memory[402] == 21
+    assert sim.memory[3] == 3030
+    assert sim.memory[3036] == 36
+    assert sim.memory[11] == 510
+    assert stack(sim) == [10, 21, 36, 510, 42, 3030]
+
+
+def test_branching():
+    code = """
+    push constant 0
+    pop local 0
+    label LOOP
+    push local 0
+    push constant 1
+    add
+    pop local 0
+    push local 0
+    push constant 5
+    lt
+    if-goto LOOP
+    push local 0
+    """
+    instructions = Translator("Test").translate(code)
+    sim = Simulator.from_binary(Assembler().assemble(instructions))
+    sim.memory[0] = 256
+    sim.memory[1] = 300
+    sim.run(10000)
+
+    assert stack(sim) == [5]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_functions_with_bootstrap(jobs):
+    files = vm_files(vmPth)
+    assert [pth.name for pth in files] == ["Main.vm", "Sys.vm"]
+
+    instructions = translate_files(files, jobs=jobs)
+    sim = Simulator.from_binary(Assembler().assemble(instructions))
+    sim.run(100000)
+
+    # fib(10) lands in temp 1
+    assert sim.memory[6] == 55
+    assert sim.memory[4] == -5
+
+    assert translate_files(files, jobs=jobs) == instructions
+
+
+def test_optimized_translation_matches():
+    instructions = translate_files(vm_files(vmPth))
+    optimized = optimize(instructions, indirect_jumps=True)
+    plain = Simulator.from_binary(Assembler().assemble(instructions))
+    fast = Simulator.from_binary(Assembler().assemble(optimized))
+    plain.run(100000)
+    fast.run(100000)
+
+    assert optimize(instructions) == instructions
+    assert len(optimized) < len(instructions)
+    assert fast.memory[6] == plain.memory[6] == 55
+
+
+def test_instructions_keep_vm_lines():
+    instructions = Translator("Test").translate("\n// comment\npush constant 1\n\nneg")
+
+    assert instructions[0].command_type is CommandType.A_COMMAND
+    assert {i.line for i in instructions} == {3, 5}
+
+
+def test_labels_never_meet_generated_ones():
+    code = "label ret.1\nlabel cmp.2\ncall f 0\neq\ngoto cmp.2"
+    instructions = Translator("Test").translate(code)
+    labels = [i.symbol for i in instructions if i.command_type is CommandType.L_COMMAND]
+
+    assert len(set(labels)) == len(labels) == 4
+
+
+@pytest.mark.parametrize(
+    "code,message",
+    [
+        ("push constant", "Invalid command"),
+        ("push nowhere 1", "Unknown segment"),
+        ("pop constant 1", "Cannot pop"),
+        ("push temp 8", "out of range"),
+        ("push constant 40000", "out of range"),
+        ("push local x", "Invalid index"),
+        ("jump", "Invalid command"),
+        ("goto $cmp.1", "Invalid label"),
+        ("label 1st", "Invalid label"),
+    ],
+)
+def test_errors(code, message):
+    with pytest.raises(VMError) as err:
+        Translator("Bad").translate("\n" + code)
+
+    assert message in str(err.value)
+    assert "Bad.vm:2" in str(err.value)
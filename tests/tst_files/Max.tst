@@ -0,0 +1,23 @@
+// Max.tst, in the style of the nand2tetris project 6 scripts
+
+load Max.asm,
+output-file Max.out,
+compare-to Max.cmp,
+output-list RAM[0]%D2.6.2 RAM[1]%D2.6.2 RAM[2]%D2.6.2;
+
+set RAM[0] 3,   // Set test arguments
+set RAM[1] 5,
+set RAM[2] -1;
+repeat 14 {
+  ticktock;
+}
+output;
+
+set PC 0,
+set RAM[0] 23456,
+set RAM[1] 12345,
+set RAM[2] -1;
+repeat 14 {
+  ticktock;
+}
+output;